@@ -2,6 +2,9 @@
 ASGI config for app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+It serves the same sync views as the WSGI entry point; Django runs them in
+a thread. There are no async variants of the API views: with a sync ORM
+they were no faster than these (see the benchmark_asgi command).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
@@ -40,12 +40,14 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
-    'core',
+    'core.apps.CoreConfig',
     'user',
-    'recipe'
+    'recipe.apps.RecipeConfig',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,15 +85,49 @@ DATABASES = {
     'default': {
         # 'ENGINE': 'django.db.backends.sqlite3',
         # 'NAME': BASE_DIR / 'db.sqlite3',
-        'ENGINE':'django.db.backends.postgresql',
+        # Set DB_ENGINE=core.db.backends.postgresql_pool to keep
+        # connections in a per process pool, configured by POOL below.
+        'ENGINE': os.environ.get(
+            'DB_ENGINE', 'django.db.backends.postgresql'
+        ),
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # With the pooled engine, connections are returned to a per process
+        # pool at the end of a request. MAX_SIZE bounds the connections of
+        # one process, so keep workers * MAX_SIZE below the server's
+        # max_connections.
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 0)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'MAX_LIFETIME': 3600,
+            'MAX_IDLE': 600,
+            'CHECK_AFTER': 5,
+            'TIMEOUT': 10,
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# The recipe response cache must be shared by every worker process, so
+# point this at memcached or redis when running more than one.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+RECIPE_RESPONSE_CACHE_TIMEOUT = 300
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -134,5 +170,85 @@ MEDIA_URL = '/media/'
 STATIC_ROOT = '/vol/web/static'
 MEDIA_ROOT = '/vol/web/media'
 
+# Uploads are streamed to temporary files and hashed chunk by chunk, then
+# stored once per distinct content under their hash.
+
+FILE_UPLOAD_HANDLERS = ['core.uploads.HashingFileUploadHandler']
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+
+# Media is served by core.views.serve_media. Set MEDIA_SENDFILE_HEADER to
+# X-Sendfile (Apache, lighttpd) or X-Accel-Redirect (nginx, with an
+# internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT)
+# to have the web server send the file instead of a worker.
+
+MEDIA_SENDFILE_HEADER = os.environ.get('MEDIA_SENDFILE_HEADER', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 3600
+
+# Recipe images are resized in a background thread pool after upload.
+# Each rendition is bounded by the given width and height in pixels.
+
+RECIPE_IMAGE_WORKERS = 2
+RECIPE_IMAGE_RENDITIONS = {
+    'thumb': (160, 160),
+    'medium': (640, 640),
+    'full': (1600, 1600),
+}
+
+# Upper bounds of the price buckets of the recipe stats endpoint. Run
+# rebuild_recipe_stats after changing them.
+
+RECIPE_STATS_PRICE_BOUNDS = (5, 10, 20, 50, 100)
+
 
 AUTH_USER_MODEL = 'core.User'
+
+
+# /readyz reuses a database probe for this many seconds
+
+HEALTH_CHECK_MAX_AGE = 1.0
+
+
+# A sample of API requests is profiled: responses get a Server-Timing
+# header with total, view, db and serialize times, slow requests are logged
+# with their slowest queries and repeated queries are logged as likely N+1.
+
+REQUEST_PROFILING_PATHS = ('/api/',)
+REQUEST_PROFILING_SAMPLE_RATE = float(
+    os.environ.get('REQUEST_PROFILING_SAMPLE_RATE', '0.1')
+)
+REQUEST_PROFILING_SLOW_MS = 500
+REQUEST_PROFILING_DUPLICATES = 5
+REQUEST_PROFILING_HEADER = True
+
+
+# Prometheus metrics are served at /metrics. Each worker process writes its
+# values to METRICS_DIR, which all workers of a server must share and no
+# other deployment may use, and any worker answers for all of them. Left
+# empty, nothing is written and each process reports only itself. Set
+# METRICS_TOKEN to require "Authorization: Bearer <token>" on scrapes.
+
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Test runs write their metrics to a directory of their own.
+
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+
+# Responses are encoded with orjson when it is installed, falling back to
+# the standard library encoder otherwise.
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+
+# Token authentication cache
+
+TOKEN_CACHE_MAX_SIZE = 10000
+TOKEN_CACHE_TTL = 60
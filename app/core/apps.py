@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from core import signals  # noqa: F401
+        from core.profiling import install_query_recorder
+
+        connection_created.connect(install_query_recorder)
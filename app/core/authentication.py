@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from core.metrics import TOKEN_CACHE
+
+
+def _field_values(instance):
+    """Return the concrete field values of a model instance"""
+    return tuple(
+        getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+    )
+
+
+def _from_values(model, db, values):
+    """Build a fresh model instance from ``_field_values`` output"""
+    names = [field.attname for field in model._meta.concrete_fields]
+    return model.from_db(db, names, values)
+
+
+class TokenCache:
+    """Bounded LRU of token key -> user with a time to live.
+
+    Entries hold field values rather than model instances, so every hit
+    hands out fresh objects and requests never share mutable state.
+    """
+
+    def __init__(self, max_size, ttl, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return ``(user, token)`` for ``key`` or ``None`` on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        _, _, db, user_model, user_values, token_model, token_values = entry
+        user = _from_values(user_model, db, user_values)
+        token = _from_values(token_model, db, token_values)
+        token.user = user
+        return user, token
+
+    def generation(self):
+        """Return a counter that moves on every invalidation"""
+        return self._generation
+
+    def set(self, key, user, token, generation=None):
+        """Remember the user a token resolved to.
+
+        When ``generation`` is given and an invalidation happened since it
+        was read, the lookup may be stale and is not stored.
+        """
+        entry = (
+            self._clock() + self.ttl,
+            user.pk,
+            token._state.db,
+            type(user),
+            _field_values(user),
+            type(token),
+            _field_values(token),
+        )
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._remove(key)
+            self._entries[key] = entry
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Forget a single token"""
+        with self._lock:
+            self._generation += 1
+            self._remove(key)
+
+    def invalidate_user(self, user_id):
+        """Forget every token of a user"""
+        with self._lock:
+            self._generation += 1
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        """Forget every token and reset the counters"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Return the cache counters"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1]
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, 'TOKEN_CACHE_MAX_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 60),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches token lookups in process.
+
+    Entries are dropped when the token is deleted or the user is saved or
+    deleted in this process; other processes pick the change up once the
+    entry's TTL runs out.
+    """
+    cache = token_cache
+
+    def authenticate_credentials(self, key):
+        cached = self.cache.get(key)
+        if cached is not None:
+            TOKEN_CACHE.inc(result='hit')
+            return cached
+        TOKEN_CACHE.inc(result='miss')
+        generation = self.cache.generation()
+        user, token = super().authenticate_credentials(key)
+        self.cache.set(key, user, token, generation)
+        return user, token
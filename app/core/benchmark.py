@@ -0,0 +1,282 @@
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from core.models import Ingredient, Recipe, Tag
+
+ADJECTIVES = (
+    'Spicy', 'Creamy', 'Smoky', 'Crispy', 'Tangy', 'Sweet', 'Herby',
+    'Garlicky', 'Zesty', 'Rustic', 'Quick', 'Slow cooked', 'Roasted',
+    'Grilled', 'Baked', 'Stuffed', 'Classic', 'Lemony',
+)
+DISHES = (
+    'biryani', 'karahi', 'curry', 'pulao', 'soup', 'stew', 'salad',
+    'noodles', 'pasta', 'pie', 'tacos', 'risotto', 'kebabs', 'daal',
+    'omelette', 'pancakes', 'flatbread', 'casserole', 'stir fry', 'tart',
+)
+TAGS = (
+    'Vegan', 'Vegetarian', 'Breakfast', 'Lunch', 'Dinner', 'Dessert',
+    'Snack', 'Spicy', 'Quick', 'Gluten free', 'Dairy free', 'Low carb',
+    'High protein', 'Comfort food', 'Party', 'Kids', 'Budget', 'Healthy',
+    'Baking', 'Grilling', 'Slow cooker', 'One pot', 'Meal prep', 'Summer',
+    'Winter', 'Festive', 'Street food', 'Brunch', 'Picnic', 'Weeknight',
+)
+INGREDIENTS = (
+    'Salt', 'Pepper', 'Olive oil', 'Garlic', 'Onion', 'Tomato', 'Butter',
+    'Flour', 'Sugar', 'Eggs', 'Milk', 'Chicken', 'Beef', 'Lamb', 'Rice',
+    'Lentils', 'Chickpeas', 'Potato', 'Carrot', 'Ginger', 'Cumin',
+    'Coriander', 'Turmeric', 'Chilli', 'Yogurt', 'Cream', 'Cheese',
+    'Lemon', 'Lime', 'Spinach', 'Mushroom', 'Pepper flakes', 'Paprika',
+    'Cinnamon', 'Cardamom', 'Cloves', 'Basil', 'Parsley', 'Mint', 'Honey',
+    'Soy sauce', 'Vinegar', 'Peas', 'Corn', 'Beans', 'Tofu', 'Prawns',
+    'Salmon', 'Pasta', 'Bread', 'Oats', 'Almonds', 'Cashews', 'Coconut',
+    'Apple', 'Banana', 'Berries', 'Chocolate', 'Vanilla', 'Stock',
+)
+
+
+class Rollback(Exception):
+    """Raised to throw the benchmark writes away"""
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back"""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def percentile(timings, fraction):
+    """Return the nearest rank percentile of sorted ``timings``"""
+    index = max(0, min(len(timings) - 1, round(fraction * len(timings)) - 1))
+    return timings[index]
+
+
+def summarize(timings):
+    """Return summary statistics of timings in milliseconds"""
+    timings = sorted(timings)
+    return {
+        'runs': len(timings),
+        'min': timings[0],
+        'mean': statistics.mean(timings),
+        'median': statistics.median(timings),
+        'p50': percentile(timings, 0.5),
+        'p95': percentile(timings, 0.95),
+        'p99': percentile(timings, 0.99),
+        'max': timings[-1],
+    }
+
+
+def measure(func, repeat=5, warmup=1, before=None):
+    """Call ``func`` repeatedly and return its timings in milliseconds.
+
+    ``before`` runs ahead of every call without being timed.
+    """
+    for _ in range(warmup):
+        if before is not None:
+            before()
+        func()
+    timings = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarize(timings)
+
+
+def format_timings(name, timings):
+    """Return one aligned line describing ``measure`` output"""
+    return (
+        f'{name:<28} min {timings["min"]:8.2f} ms  '
+        f'median {timings["median"]:8.2f} ms  '
+        f'p95 {timings["p95"]:8.2f} ms'
+    )
+
+
+def get_host():
+    """Return a host name the application accepts requests for"""
+    for host in settings.ALLOWED_HOSTS:
+        if host and '*' not in host and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def names(base, count):
+    """Return ``count`` distinct names drawn from ``base``"""
+    return [
+        base[i % len(base)] + (f' {i // len(base) + 1}'
+                               if i >= len(base) else '')
+        for i in range(count)
+    ]
+
+
+class DataGenerator:
+    """Seeded generator of users with tags, ingredients and recipes.
+
+    Every call writes its rows with a handful of bulk INSERTs. Each user
+    gets ``tags`` tags and ``ingredients`` ingredients, and every recipe a
+    number of them within the per recipe ranges, picked with Zipf like
+    popularity so a few are on most recipes, as in real data.
+    """
+
+    def __init__(self, seed=0, tags=30, ingredients=60,
+                 tags_per_recipe=(1, 6), ingredients_per_recipe=(3, 12),
+                 password=None, batch_size=5000):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.tags_per_recipe = tags_per_recipe
+        self.ingredients_per_recipe = ingredients_per_recipe
+        self.tag_names = names(TAGS, tags)
+        self.ingredient_names = names(INGREDIENTS, ingredients)
+        self.tag_weights = self.popularity(len(self.tag_names))
+        self.ingredient_weights = self.popularity(
+            len(self.ingredient_names)
+        )
+        self.password = make_password(password)
+        self.totals = dict.fromkeys(
+            ('users', 'recipes', 'tags', 'ingredients', 'relations'), 0
+        )
+
+    def popularity(self, count):
+        """Return cumulative Zipf weights for ``count`` items"""
+        return list(accumulate(1 / rank for rank in range(1, count + 1)))
+
+    def pick(self, population, weights, size_range):
+        """Pick distinct items, favouring the popular ones"""
+        size = min(self.rng.randint(*size_range), len(population))
+        picked = set()
+        while len(picked) < size:
+            picked.update(self.rng.choices(
+                range(len(population)), cum_weights=weights,
+                k=size - len(picked)
+            ))
+        return sorted(picked)
+
+    def recipe_count(self, mean):
+        """Draw a long tailed number of recipes averaging ``mean``"""
+        if mean <= 0:
+            return 0
+        # A lognormal with sigma 1 has mean exp(mu + 1/2).
+        return int(self.rng.lognormvariate(0, 1) * mean / 1.6487)
+
+    def create_user(self, recipes, prefix='benchmark'):
+        """Create one user with exactly ``recipes`` recipes and return it"""
+        email = f'{prefix}-{time.time_ns()}@example.com'
+        user_id, = self.create_users([email], [recipes])
+        return get_user_model().objects.get(pk=user_id)
+
+    def create_users(self, emails, recipe_counts):
+        """Create users with their recipes and return the user ids.
+
+        User ``emails[i]`` gets ``recipe_counts[i]`` recipes.
+        """
+        User = get_user_model()
+        User.objects.bulk_create(
+            [User(email=email, name=email.split('@')[0],
+                  password=self.password) for email in emails],
+            batch_size=self.batch_size
+        )
+        wanted = dict(zip(emails, recipe_counts))
+        users = [
+            (user_id, wanted[email]) for user_id, email in
+            User.objects.filter(
+                email__in=emails
+            ).order_by('id').values_list('id', 'email')
+        ]
+        user_ids = [user_id for user_id, _ in users]
+        self.totals['users'] += len(user_ids)
+
+        tags = self.create_named(Tag, user_ids, self.tag_names)
+        ingredients = self.create_named(
+            Ingredient, user_ids, self.ingredient_names
+        )
+
+        recipes = []
+        relations = []
+        for user_id, count in users:
+            for _ in range(count):
+                tag_picks = self.pick(
+                    self.tag_names, self.tag_weights, self.tags_per_recipe
+                )
+                ingredient_picks = self.pick(
+                    self.ingredient_names, self.ingredient_weights,
+                    self.ingredients_per_recipe
+                )
+                recipes.append(Recipe(
+                    user_id=user_id,
+                    title=f'{self.rng.choice(ADJECTIVES)} '
+                          f'{self.rng.choice(DISHES)}',
+                    time_minutes=self.rng.choice((10, 15, 20, 30, 45, 60,
+                                                  90, 120)),
+                    price=Decimal(self.rng.randint(100, 9999)) / 100,
+                    # Laid out as refresh_search_terms stores them.
+                    search_terms=' '.join(
+                        sorted(self.tag_names[i] for i in tag_picks) +
+                        sorted(self.ingredient_names[i]
+                               for i in ingredient_picks)
+                    ),
+                ))
+                relations.append((
+                    [tags[user_id][i] for i in tag_picks],
+                    [ingredients[user_id][i] for i in ingredient_picks],
+                ))
+        Recipe.objects.bulk_create(recipes, batch_size=self.batch_size)
+        recipe_ids = Recipe.objects.filter(
+            user_id__in=user_ids
+        ).order_by('id').values_list('id', flat=True)
+        self.totals['recipes'] += len(recipes)
+
+        tag_rows = []
+        ingredient_rows = []
+        TagLink = Recipe.tags.through
+        IngredientLink = Recipe.ingredients.through
+        for recipe_id, (tag_ids, ingredient_ids) in zip(
+                recipe_ids.iterator(), relations):
+            tag_rows.extend(
+                TagLink(recipe_id=recipe_id, tag_id=tag_id)
+                for tag_id in tag_ids
+            )
+            ingredient_rows.extend(
+                IngredientLink(recipe_id=recipe_id, ingredient_id=pk)
+                for pk in ingredient_ids
+            )
+        TagLink.objects.bulk_create(tag_rows, batch_size=self.batch_size)
+        IngredientLink.objects.bulk_create(
+            ingredient_rows, batch_size=self.batch_size
+        )
+        self.totals['relations'] += len(tag_rows) + len(ingredient_rows)
+        return user_ids
+
+    def create_named(self, model, user_ids, names):
+        """Create the named objects of every user.
+
+        Returns the ids per user, in the order of ``names``.
+        """
+        model.objects.bulk_create(
+            [model(user_id=user_id, name=name)
+             for user_id in user_ids for name in names],
+            batch_size=self.batch_size
+        )
+        position = {name: index for index, name in enumerate(names)}
+        ids = {user_id: [None] * len(names) for user_id in user_ids}
+        rows = model.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', 'name', 'id')
+        for user_id, name, pk in rows.iterator():
+            ids[user_id][position[name]] = pk
+        self.totals[str(model._meta.verbose_name_plural)] += \
+            len(user_ids) * len(names)
+        return ids
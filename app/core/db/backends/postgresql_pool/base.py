@@ -0,0 +1,203 @@
+import atexit
+import os
+import threading
+
+import psycopg2
+import psycopg2.extras
+from psycopg2 import extensions
+
+from django.db import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+
+from core.db.pool import ConnectionPool
+
+from .creation import DatabaseCreation
+
+# Pools are per process, database alias and connection parameters. The pid
+# is part of the key so a forked worker never reuses sockets opened by its
+# parent, and the parameters so a connection to one database is never
+# handed out for another, as when the test runner switches to the test
+# database.
+_pools = {}
+_pools_lock = threading.Lock()
+
+POOL_DEFAULTS = {
+    'MIN_SIZE': 0,
+    'MAX_SIZE': 10,
+    'MAX_LIFETIME': 3600,
+    'MAX_IDLE': 600,
+    'CHECK_AFTER': 5,
+    'TIMEOUT': 10,
+}
+
+
+def _pool_key(alias, conn_params):
+    return (
+        os.getpid(), alias,
+        tuple(sorted((name, repr(value))
+                     for name, value in conn_params.items())),
+    )
+
+
+def _connect(conn_params, isolation_level):
+    """Open a connection set up like the stock backend sets up its own"""
+    connection = psycopg2.connect(**conn_params)
+    if isolation_level is not None and \
+            isolation_level != connection.isolation_level:
+        connection.set_session(isolation_level=isolation_level)
+    psycopg2.extras.register_default_jsonb(
+        conn_or_curs=connection, loads=lambda x: x
+    )
+    return connection
+
+
+def _check(connection):
+    """Return whether a pooled connection still answers"""
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def _reset(connection):
+    """Return a connection to a fresh session, or False when it cannot be.
+
+    Rolls back any open transaction, then drops session settings, temporary
+    tables, prepared statements, advisory locks and LISTENs, so the next
+    user of the connection starts where a new one would.
+    """
+    if connection.closed:
+        return False
+    try:
+        if connection.get_transaction_status() != \
+                extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        autocommit = connection.autocommit
+        # DISCARD ALL cannot run inside a transaction block.
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute('DISCARD ALL')
+        connection.autocommit = autocommit
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def close_pools(alias=None):
+    """Close the idle connections of this process's pools and drop them.
+
+    Limited to the pools of ``alias`` when given. Connections in use are
+    closed when they are given back.
+    """
+    pid = os.getpid()
+    with _pools_lock:
+        keys = [
+            key for key in _pools
+            if key[0] == pid and alias in (None, key[1])
+        ]
+        pools = [_pools.pop(key) for key in keys]
+    for pool in pools:
+        pool.close_all()
+
+
+atexit.register(close_pools)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend that keeps connections in a process wide pool.
+
+    Closing a connection, which Django does at the end of every request
+    unless CONN_MAX_AGE is set, resets its session and hands it back to the
+    pool instead. The pool is configured by the ``POOL`` key of the
+    database settings. Changing the connection settings, such as the
+    database name, drains the pool of the previous ones.
+    """
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = None
+
+    @property
+    def pooled(self):
+        # Connections without a database are short lived maintenance
+        # connections, and must not linger in a pool.
+        return self.alias != NO_DB_ALIAS
+
+    def get_pool(self, conn_params):
+        """Return the pool for ``conn_params``, creating it on first use"""
+        key = _pool_key(self.alias, conn_params)
+        stale = []
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                # Settings changed since the last connection, as when the
+                # test runner switches databases: drop the old pools.
+                for other in list(_pools):
+                    if other[:2] == key[:2]:
+                        stale.append(_pools.pop(other))
+                options = {
+                    **POOL_DEFAULTS, **self.settings_dict.get('POOL', {})
+                }
+                params = dict(conn_params)
+                isolation_level = self.settings_dict['OPTIONS'].get(
+                    'isolation_level'
+                )
+                pool = _pools[key] = ConnectionPool(
+                    connect=lambda: _connect(params, isolation_level),
+                    close=lambda connection: connection.close(),
+                    check=_check,
+                    min_size=options['MIN_SIZE'],
+                    max_size=options['MAX_SIZE'],
+                    max_lifetime=options['MAX_LIFETIME'],
+                    max_idle=options['MAX_IDLE'],
+                    check_after=options['CHECK_AFTER'],
+                    timeout=options['TIMEOUT'],
+                )
+        for old in stale:
+            old.close_all()
+        return pool
+
+    def get_new_connection(self, conn_params):
+        if not self.pooled:
+            return super().get_new_connection(conn_params)
+        pool = self.get_pool(conn_params)
+        pool.fill()
+        connection = pool.checkout()
+        self._pool = (_pool_key(self.alias, conn_params), pool)
+        # The parent sets this when it opens a connection, which only one
+        # wrapper per pooled connection gets to do.
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection = self.connection
+        key, pool = self._pool or (None, None)
+        self._pool = None
+        if pool is None or key[0] != os.getpid():
+            # Not pooled, or opened before the process forked.
+            with self.wrap_database_errors:
+                return connection.close()
+        if _pools.get(key) is not pool:
+            # The pool was drained while the connection was in use.
+            pool.checkin(connection, discard=True)
+            return
+        pool.checkin(connection, discard=not _reset(connection))
+
+    def pool_stats(self):
+        """Return the counters of this process's pool for the database"""
+        if not self.pooled:
+            return None
+        key = _pool_key(self.alias, self.get_connection_params())
+        pool = _pools.get(key)
+        return pool.stats() if pool is not None else None
@@ -0,0 +1,15 @@
+from django.db.backends.postgresql import creation
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """Drain the pools before dropping a test database.
+
+    PostgreSQL refuses to drop a database that sessions are connected to,
+    and idle pooled connections are still connected.
+    """
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        from .base import close_pools
+
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available in time"""
+
+
+class ConnectionPool:
+    """Thread safe pool of database connections.
+
+    ``connect`` opens a new connection and ``close`` closes one. Idle
+    connections are handed out most recently used first and are checked
+    with ``check`` when they sat idle for ``check_after`` seconds or more.
+    Connections older than ``max_lifetime`` are closed instead of reused,
+    and idle connections beyond ``min_size`` are closed after ``max_idle``
+    seconds. Checkouts wait up to ``timeout`` seconds once ``max_size``
+    connections are open.
+    """
+
+    def __init__(self, connect, close, check=None, min_size=0, max_size=10,
+                 max_lifetime=3600, max_idle=600, check_after=5, timeout=10,
+                 clock=time.monotonic):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError('Expected 0 <= min_size <= max_size and 1 <= '
+                             'max_size')
+        self._connect = connect
+        self._close = close
+        self._check = check
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.timeout = timeout
+        self._clock = clock
+        self._condition = threading.Condition()
+        # (connection, created, returned) of idle connections, oldest first
+        self._idle = deque()
+        self._created = {}
+        self._size = 0
+        self.connects = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.discards = 0
+
+    def fill(self):
+        """Open connections until ``min_size`` are open"""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            connection, created = self._open()
+            with self._condition:
+                self._idle.append((connection, created, self._clock()))
+                self._condition.notify()
+
+    def checkout(self):
+        """Return a connection, opening one or waiting when needed"""
+        deadline = self._clock() + self.timeout
+        waited = False
+        while True:
+            expired = []
+            with self._condition:
+                entry = self._take_idle(expired)
+                while entry is None and self._size >= self.max_size:
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        for connection in expired:
+                            self._quiet_close(connection)
+                        raise PoolTimeout(
+                            f'No connection available within {self.timeout}s'
+                        )
+                    if not waited:
+                        waited = True
+                        self.waits += 1
+                    started = self._clock()
+                    self._condition.wait(remaining)
+                    self.wait_time += self._clock() - started
+                    entry = self._take_idle(expired)
+                if entry is None:
+                    self._size += 1
+
+            for connection in expired:
+                self._quiet_close(connection)
+            if entry is None:
+                connection, created = self._open()
+            else:
+                connection, created, returned = entry
+                if (self._check is not None and
+                        self._clock() - returned >= self.check_after and
+                        not self._check(connection)):
+                    self._discard(connection)
+                    continue
+
+            with self._condition:
+                self._created[id(connection)] = created
+                self.checkouts += 1
+            return connection
+
+    def checkin(self, connection, discard=False):
+        """Give a connection back, closing it when ``discard`` is true"""
+        expired = []
+        with self._condition:
+            created = self._created.pop(id(connection))
+            now = self._clock()
+            if not discard and now - created < self.max_lifetime:
+                self._idle.append((connection, created, now))
+                self._condition.notify()
+                self._trim(now, expired)
+                connection = None
+        if connection is not None:
+            self._discard(connection)
+        for idle in expired:
+            self._quiet_close(idle)
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._condition:
+            idle = [entry[0] for entry in self._idle]
+            self._idle.clear()
+        for connection in idle:
+            self._discard(connection, count=False)
+
+    def stats(self):
+        """Return the pool counters"""
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._created),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_time': self.wait_time,
+                'timeouts': self.timeouts,
+                'discards': self.discards,
+            }
+
+    # The helpers below run with the lock held. They move connections to
+    # close into ``expired``, which callers close once the lock is released.
+
+    def _take_idle(self, expired):
+        """Pop the most recently used idle connection that has not expired"""
+        now = self._clock()
+        while self._idle:
+            connection, created, returned = self._idle.pop()
+            if now - created < self.max_lifetime:
+                return connection, created, returned
+            self._size -= 1
+            self.discards += 1
+            expired.append(connection)
+        return None
+
+    def _trim(self, now, expired):
+        """Remove idle connections unused for ``max_idle`` seconds"""
+        while (self._idle and self._size > self.min_size and
+               now - self._idle[0][2] >= self.max_idle):
+            expired.append(self._idle.popleft()[0])
+            self._size -= 1
+            self.discards += 1
+
+    def _quiet_close(self, connection):
+        try:
+            self._close(connection)
+        except Exception:
+            pass
+
+    def _open(self):
+        try:
+            connection = self._connect()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self.connects += 1
+        return connection, self._clock()
+
+    def _discard(self, connection, count=True):
+        with self._condition:
+            self._size -= 1
+            if count:
+                self.discards += 1
+            self._condition.notify()
+        self._quiet_close(connection)
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from django.db import connections
+
+_lock = threading.Lock()
+_last_check = {}
+
+
+def probe_database(alias='default'):
+    """Connect if needed and run a trivial query on a database.
+
+    Returns the round trip time of the query in seconds and raises the
+    database error when the database can not be reached.
+    """
+    connection = connections[alias]
+    connection.ensure_connection()
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    return time.perf_counter() - started
+
+
+def pool_state(alias='default'):
+    """Return the connection pool counters of a database, if it has one"""
+    pool_stats = getattr(connections[alias], 'pool_stats', None)
+    return pool_stats() if pool_stats is not None else None
+
+
+def check_database(alias='default', max_age=1.0):
+    """Return the readiness of a database as a JSON friendly dict.
+
+    Results are reused for ``max_age`` seconds, so probes hit every second
+    by several load balancers cost at most one query per interval.
+    """
+    with _lock:
+        check = _last_check.get(alias)
+        if check is not None and time.monotonic() - check[0] < max_age:
+            return check[1]
+    try:
+        latency = probe_database(alias)
+    except Exception as error:
+        connections[alias].close()
+        result = {'ok': False, 'error': error.__class__.__name__}
+    else:
+        result = {'ok': True, 'latency_ms': round(latency * 1000, 3)}
+    result['pool'] = pool_state(alias)
+    with _lock:
+        _last_check[alias] = (time.monotonic(), result)
+    return result
+
+
+def last_database_check(alias='default'):
+    """Return the latest readiness result without touching the database"""
+    with _lock:
+        check = _last_check.get(alias)
+    return check[1] if check is not None else None
+
+
+def reset():
+    """Forget every remembered check"""
+    with _lock:
+        _last_check.clear()
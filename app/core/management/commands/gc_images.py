@@ -0,0 +1,161 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe, StoredImage
+
+IMAGE_DIR = 'uploads/recipe'
+
+
+class Command(BaseCommand):
+    """Django command to delete recipe image files nothing refers to.
+
+    References and files are spooled into a temporary SQLite database and
+    diffed there, so memory use does not grow with the number of images.
+    Files modified within the grace period are kept: uploads touch a file
+    when they reuse it, and new uploads are written before they are
+    referenced.
+    """
+    help = 'Delete orphaned recipe images and renditions from storage.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report orphans without deleting them.'
+        )
+        parser.add_argument(
+            '--grace', type=float, default=24,
+            help='Keep files modified within this many hours.'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Run every this many seconds instead of once.'
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        while True:
+            self.collect(options)
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def collect(self, options):
+        """Run one collection pass"""
+        cutoff = time.time() - options['grace'] * 3600
+        self.deleted = self.freed = 0
+        with tempfile.TemporaryDirectory() as directory:
+            spool = sqlite3.connect(os.path.join(directory, 'gc.sqlite3'))
+            try:
+                spool.execute(
+                    'CREATE TABLE refs (name TEXT PRIMARY KEY) WITHOUT ROWID'
+                )
+                spool.execute(
+                    'CREATE TABLE files '
+                    '(name TEXT PRIMARY KEY, size INTEGER) WITHOUT ROWID'
+                )
+                spool.executemany(
+                    'INSERT OR IGNORE INTO refs VALUES (?)',
+                    ((name,) for name in self.iter_references())
+                )
+                spool.executemany(
+                    'INSERT INTO files VALUES (?, ?)',
+                    self.iter_files(cutoff)
+                )
+                orphans = spool.execute(
+                    'SELECT name, size FROM files WHERE NOT EXISTS '
+                    '(SELECT 1 FROM refs WHERE refs.name = files.name) '
+                    'ORDER BY name'
+                )
+                batch = []
+                for row in orphans:
+                    batch.append(row)
+                    if len(batch) >= options['batch_size']:
+                        self.delete_batch(batch, cutoff, options['dry_run'])
+                        batch = []
+                if batch:
+                    self.delete_batch(batch, cutoff, options['dry_run'])
+            finally:
+                spool.close()
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {self.deleted} orphaned files ({self.freed} bytes)'
+        ))
+
+    def iter_references(self):
+        """Yield every image and rendition name the database refers to"""
+        rows = Recipe.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).values_list('image', 'renditions')
+        for image, renditions in rows.iterator(chunk_size=2000):
+            yield image
+            for entry in (renditions or {}).values():
+                for key, value in entry.items():
+                    if key not in ('width', 'height'):
+                        yield value
+        names = StoredImage.objects.filter(
+            references__gt=0
+        ).values_list('name', flat=True)
+        yield from names.iterator(chunk_size=2000)
+
+    def iter_files(self, cutoff):
+        """Yield ``(name, size)`` of image files older than ``cutoff``"""
+        root = default_storage.path('')
+        for directory, _, files in os.walk(default_storage.path(IMAGE_DIR)):
+            for file_name in files:
+                path = os.path.join(directory, file_name)
+                try:
+                    file_stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if file_stat.st_mtime <= cutoff:
+                    name = os.path.relpath(path, root).replace(os.sep, '/')
+                    yield name, file_stat.st_size
+
+    def delete_batch(self, batch, cutoff, dry_run):
+        """Delete a batch of orphans that are still unreferenced"""
+        names = [name for name, _ in batch]
+        live = set(Recipe.objects.filter(
+            image__in=names
+        ).values_list('image', flat=True))
+        live.update(StoredImage.objects.filter(
+            name__in=names, references__gt=0
+        ).values_list('name', flat=True))
+
+        deleted = []
+        for name, size in batch:
+            path = default_storage.path(name)
+            try:
+                # Reused or rewritten since the walk.
+                if name in live or os.stat(path).st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            if self.verbosity > 1:
+                self.stdout.write(name)
+            if not dry_run:
+                default_storage.delete(name)
+                self.remove_empty_directories(os.path.dirname(path))
+            deleted.append(name)
+            self.freed += size
+
+        self.deleted += len(deleted)
+        if deleted and not dry_run:
+            StoredImage.objects.filter(
+                name__in=deleted, references=0
+            ).delete()
+
+    def remove_empty_directories(self, directory):
+        root = default_storage.path(IMAGE_DIR)
+        while directory != root and directory.startswith(root):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return
+            directory = os.path.dirname(directory)
@@ -1,19 +1,49 @@
 import time
+from django.core.management.base import BaseCommand, CommandError
 from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+
+from core.health import probe_database
 
 
 class Command(BaseCommand):
     """Django command to pause the execution until database is available."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Give up after this many seconds.'
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='Longest wait between attempts in seconds.'
+        )
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        deadline = time.monotonic() + options['timeout']
+        delay = 0.1
+        while True:
             try:
-                db_conn = connections['default']
+                latency = probe_database(options['database'])
+                break
             except OperationalError:
-                self.stdout.write('Database is unavailable. waiting 1 second...')
-                time.sleep(1)
+                # Drop a half open connection so the next attempt
+                # reconnects from scratch.
+                connections[options['database']].close()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f'Database unavailable after {options["timeout"]}s.'
+                    )
+                wait = min(delay, remaining)
+                self.stdout.write(
+                    f'Database is unavailable. waiting {wait:g} seconds...'
+                )
+                time.sleep(wait)
+                delay = min(delay * 2, options['max_delay'])
 
-        self.stdout.write(self.style.SUCCESS('Database is available!'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Database is available! ({latency * 1000:.1f} ms)'
+        ))
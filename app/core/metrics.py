@@ -0,0 +1,424 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (
+    16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2,
+    16 * 1024 ** 2, 64 * 1024 ** 2,
+)
+
+
+class Metric:
+    """A named family of samples, one per combination of label values"""
+    type = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'{self.name} takes the labels {self.labelnames}, '
+                f'got {tuple(labels)}.'
+            )
+        return (self.name, tuple(str(labels[name])
+                                 for name in self.labelnames))
+
+
+class Counter(Metric):
+    """A value that only goes up"""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            values = self.registry.values
+            values[key] = values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A per process value that is set at collection time.
+
+    Only processes that are still alive contribute to the exported sum.
+    """
+    type = 'gauge'
+
+    def __init__(self, registry, name, documentation, labelnames=(),
+                 collect=None):
+        super().__init__(registry, name, documentation, labelnames)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.registry.values[key] = value
+
+
+class Histogram(Metric):
+    """Observations counted in cumulative buckets, with their sum"""
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # Values hold the count per bucket (the last one is +Inf), then
+        # the sum of all observations.
+        index = bisect_left(self.buckets, value)
+        with self.registry.lock:
+            values = self.registry.values.get(key)
+            if values is None:
+                values = self.registry.values[key] = \
+                    [0] * (len(self.buckets) + 1) + [0.0]
+            values[index] += 1
+            values[-1] += value
+
+
+class Registry:
+    """Metrics of this process, shared with other workers through files.
+
+    With a ``directory``, every process writes its values to its own JSON
+    file there at most every ``flush_interval`` seconds and when it exits.
+    Exporting reads all the files and adds the values up, so any worker
+    can answer a scrape for the whole server. The counters of stopped
+    processes are folded into one compacted file and their files removed,
+    so counters never go backwards and the directory does not grow as
+    workers are recycled. Without a directory nothing is written and each
+    process exports its own values only.
+    """
+    COMPACTED = 'compacted.json'
+    LOCK = '.lock'
+
+    def __init__(self, directory, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.metrics = {}
+        self.values = {}
+        self.lock = threading.Lock()
+        self._flushed = 0.0
+        self._pid = None
+        self._started = None
+        self._name = None
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Duplicate metric {metric.name}.')
+        self.metrics[metric.name] = metric
+
+    def _own_name(self):
+        # A forked worker inherits the parent's values; it starts from
+        # scratch under its own file instead.
+        pid = os.getpid()
+        if pid != self._pid:
+            if self._pid is not None:
+                self.values.clear()
+            self._pid = pid
+            self._started = _process_start(pid)
+            self._name = f'{pid}-{uuid.uuid4().hex}.json'
+        return self._name
+
+    def collect(self):
+        """Refresh the gauges that read their value on collection"""
+        for metric in list(self.metrics.values()):
+            if isinstance(metric, Gauge) and metric.collect is not None:
+                for labels, value in metric.collect():
+                    metric.set(value, **labels)
+
+    def snapshot(self):
+        self.collect()
+        with self.lock:
+            name = self._own_name()
+            values = [
+                [name, list(labels), value]
+                for (name, labels), value in self.values.items()
+            ]
+        return name, {
+            'pid': self._pid, 'started': self._started, 'values': values,
+        }
+
+    def flush(self):
+        """Write this process's values to its file"""
+        if not self.directory:
+            return
+        name, data = self.snapshot()
+        os.makedirs(self.directory, exist_ok=True)
+        _write_json(self.directory, name, data)
+        self._flushed = time.monotonic()
+
+    def maybe_flush(self):
+        """Flush if the last flush is older than the flush interval"""
+        if time.monotonic() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    @contextmanager
+    def _locked(self, operation):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, self.LOCK), 'a') as lock:
+            fcntl.flock(lock, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.directory, name)) as data:
+                return json.load(data)
+        except (OSError, ValueError):
+            return None
+
+    def _process_files(self):
+        return sorted(
+            os.path.basename(path) for path in
+            glob.glob(os.path.join(self.directory, '*-*.json'))
+        )
+
+    def compact(self):
+        """Fold the files of stopped processes into the compacted file.
+
+        Only counters and histograms are kept; gauges of stopped processes
+        no longer count. The names of folded files are recorded with the
+        totals, so a file that could not be removed is never added twice.
+        """
+        if not self.directory:
+            return
+        with self._locked(fcntl.LOCK_EX):
+            compacted = self._read(self.COMPACTED) or \
+                {'pid': None, 'values': [], 'folded': []}
+            folded = set(compacted['folded'])
+            dead = []
+            for name in self._process_files():
+                if name in folded:
+                    dead.append(name)
+                    continue
+                process = self._read(name)
+                if process is None or _is_alive(process):
+                    continue
+                dead.append(name)
+                folded.add(name)
+                compacted['values'] = [
+                    [metric, list(labels), value]
+                    for (metric, labels), value in self._add_up(
+                        [compacted, process], gauges=False
+                    ).items()
+                ]
+            if not dead:
+                return
+            compacted['folded'] = sorted(folded)
+            _write_json(self.directory, self.COMPACTED, compacted)
+            for name in dead:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+            # Names of removed files are not needed any more.
+            remaining = set(self._process_files())
+            compacted['folded'] = sorted(folded & remaining)
+            _write_json(self.directory, self.COMPACTED, compacted)
+
+    def aggregate(self):
+        """Return the values of every process added up"""
+        name, own = self.snapshot()
+        if not self.directory:
+            return self._add_up([own], own=own)
+        self.compact()
+        with self._locked(fcntl.LOCK_SH):
+            compacted = self._read(self.COMPACTED)
+            processes = [own]
+            if compacted is not None:
+                processes.append(compacted)
+            folded = set(compacted['folded']) if compacted else set()
+            for other in self._process_files():
+                if other == name or other in folded:
+                    continue
+                process = self._read(other)
+                if process is not None:
+                    processes.append(process)
+        return self._add_up(processes, own=own)
+
+    def _add_up(self, processes, own=None, gauges=True):
+        totals = {}
+        for process in processes:
+            alive = gauges and (process is own or _is_alive(process))
+            for name, labels, value in process['values']:
+                metric = self.metrics.get(name)
+                if metric is None or (metric.type == 'gauge' and not alive):
+                    continue
+                key = (name, tuple(labels))
+                if isinstance(value, list):
+                    total = totals.setdefault(key, [0] * len(value))
+                    if len(total) != len(value):
+                        continue
+                    for index, item in enumerate(value):
+                        total[index] += item
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def export(self):
+        """Return the metrics of all processes in Prometheus text format"""
+        totals = self.aggregate()
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            samples = sorted(
+                (labels, value) for (name, labels), value in totals.items()
+                if name == metric.name
+            )
+            for labels, value in samples:
+                pairs = list(zip(metric.labelnames, labels))
+                if metric.type == 'histogram':
+                    lines.extend(_histogram_lines(metric, pairs, value))
+                else:
+                    lines.append(
+                        f'{metric.name}{_labels(pairs)} {_number(value)}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Forget the values of this process"""
+        with self.lock:
+            self.values.clear()
+
+
+def _write_json(directory, name, data):
+    """Replace ``name`` in ``directory`` with ``data`` atomically"""
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'w') as output:
+        json.dump(data, output)
+    os.replace(temporary, os.path.join(directory, name))
+
+
+def _histogram_lines(metric, pairs, values):
+    cumulative = 0
+    bounds = [_number(bound) for bound in metric.buckets] + ['+Inf']
+    for bound, count in zip(bounds, values):
+        cumulative += count
+        yield (
+            f'{metric.name}_bucket{_labels(pairs + [("le", bound)])} '
+            f'{cumulative}'
+        )
+    yield f'{metric.name}_sum{_labels(pairs)} {_number(values[-1])}'
+    yield f'{metric.name}_count{_labels(pairs)} {cumulative}'
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = ','.join(
+        '{}="{}"'.format(name, value.replace('\\', r'\\')
+                         .replace('\n', r'\n').replace('"', r'\"'))
+        for name, value in pairs
+    )
+    return '{' + escaped + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _process_start(pid):
+    """Return when process ``pid`` started, or None where unknown.
+
+    The start time in clock ticks since boot, qualified by the boot id, as
+    Linux reports them; together with the pid it names one process even
+    after its pid is reused.
+    """
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as boot:
+            boot_id = boot.read().strip()
+        with open(f'/proc/{pid}/stat') as stat:
+            # The command name may hold spaces and brackets; the fields
+            # after it are fixed, and the start time is the 20th.
+            fields = stat.read().rpartition(')')[2].split()
+        return f'{boot_id}:{fields[19]}'
+    except (OSError, IndexError):
+        return None
+
+
+def _is_alive(process):
+    """Return whether the process that wrote ``process`` still runs"""
+    pid = process['pid']
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    started = process.get('started')
+    # A different start time means the pid was reused by a new process.
+    return started is None or _process_start(pid) in (started, None)
+
+
+def _pool_stats():
+    from django.db import connections
+
+    samples = []
+    for alias in connections:
+        pool_stats = getattr(connections[alias], 'pool_stats', None)
+        stats = pool_stats() if pool_stats is not None else None
+        for state, value in (stats or {}).items():
+            if isinstance(value, (int, float)):
+                samples.append(({'database': alias, 'state': state}, value))
+    return samples
+
+
+registry = Registry(
+    getattr(settings, 'METRICS_DIR', None) or None,
+    getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0),
+)
+atexit.register(registry.flush)
+
+REQUESTS = Counter(
+    registry, 'http_requests_total', 'HTTP requests by route and status.',
+    ('route', 'method', 'status')
+)
+LATENCY = Histogram(
+    registry, 'http_request_duration_seconds',
+    'Time to produce a response.', ('route', 'method')
+)
+QUERIES = Histogram(
+    registry, 'http_request_queries', 'Database queries per request.',
+    ('route',), buckets=QUERY_BUCKETS
+)
+RESPONSE_CACHE = Counter(
+    registry, 'recipe_response_cache_total',
+    'Cacheable recipe reads by outcome.', ('result',)
+)
+TOKEN_CACHE = Counter(
+    registry, 'token_cache_lookups_total',
+    'Token authentication cache lookups by outcome.', ('result',)
+)
+DB_POOL = Gauge(
+    registry, 'db_pool_connections',
+    'Database pool counters of running processes.', ('database', 'state'),
+    collect=_pool_stats
+)
+UPLOAD_SIZE = Histogram(
+    registry, 'upload_size_bytes', 'Size of uploaded files.',
+    buckets=SIZE_BUCKETS
+)
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import random
+import time
+
+from django.conf import settings
+
+from core.metrics import LATENCY, QUERIES, REQUESTS, registry
+from core.profiling import count_queries, finish_profile, start_profile
+
+logger = logging.getLogger(__name__)
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+def _async_check(middleware, get_response):
+    """Return whether ``middleware`` wraps an async handler.
+
+    If so, it is marked as a coroutine function like MiddlewareMixin
+    does, so Django awaits it directly. A sync middleware at the top of
+    the chain would otherwise run every ASGI request on the one thread
+    Django keeps for thread sensitive code, one request at a time.
+    """
+    if not asyncio.iscoroutinefunction(get_response):
+        return False
+    middleware._is_coroutine = asyncio.coroutines._is_coroutine
+    return True
+
+
+class MetricsMiddleware:
+    """Record the count, latency and queries of every request by route.
+
+    Routes are URL pattern names such as ``recipe:recipe-list``, so the
+    number of label values stays bounded whatever URLs clients send.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = _async_check(self, get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with count_queries() as queries:
+            response = self.get_response(request)
+        return self.record(request, response, started, queries)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with count_queries() as queries:
+            response = await self.get_response(request)
+        return self.record(request, response, started, queries)
+
+    def record(self, request, response, started, queries):
+        duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match is not None else 'unmatched'
+        method = request.method if request.method in METHODS else 'other'
+        REQUESTS.inc(route=route, method=method,
+                     status=response.status_code)
+        LATENCY.observe(duration, route=route, method=method)
+        QUERIES.observe(queries.count, route=route)
+        registry.maybe_flush()
+        return response
+
+
+class ProfilingMiddleware:
+    """Measure the SQL, serializer and view time of sampled requests.
+
+    Requests under ``REQUEST_PROFILING_PATHS`` are profiled with
+    probability ``REQUEST_PROFILING_SAMPLE_RATE``; other requests only pay
+    for one random number. Profiled responses carry a ``Server-Timing``
+    header, slow ones are logged with their slowest queries and statements
+    repeated ``REQUEST_PROFILING_DUPLICATES`` times are logged as likely
+    N+1 queries.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = _async_check(self, get_response)
+        self.paths = tuple(getattr(
+            settings, 'REQUEST_PROFILING_PATHS', ('/api/',)
+        ))
+        self.sample_rate = getattr(
+            settings, 'REQUEST_PROFILING_SAMPLE_RATE', 1.0
+        )
+        self.slow = getattr(settings, 'REQUEST_PROFILING_SLOW_MS', 500) / 1000
+        self.duplicates = getattr(
+            settings, 'REQUEST_PROFILING_DUPLICATES', 5
+        )
+        self.header = getattr(settings, 'REQUEST_PROFILING_HEADER', True)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.sampled(request):
+            return self.get_response(request)
+
+        token = start_profile()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile = finish_profile(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.sampled(request):
+            return await self.get_response(request)
+
+        token = start_profile()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile = finish_profile(token)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        total = time.perf_counter() - profile.started
+        view = getattr(request, '_profile_view_started', None)
+        timings = {
+            'total': total,
+            'view': time.perf_counter() - view if view else 0.0,
+            'db': profile.db_time,
+            'serialize': profile.sections['serialize'],
+        }
+        if self.header:
+            response['Server-Timing'] = server_timing(
+                timings, len(profile.queries)
+            )
+        self.report(request, response, profile, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._profile_view_started = time.perf_counter()
+
+    def sampled(self, request):
+        if not request.path.startswith(self.paths):
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def report(self, request, response, profile, timings):
+        for sql, count in profile.duplicate_queries(self.duplicates):
+            logger.warning(
+                'Possible N+1: %s %s ran the same query %d times: %s',
+                request.method, request.path, count, sql
+            )
+        if timings['total'] >= self.slow:
+            worst = ''.join(
+                f'\n  {duration * 1000:.1f} ms  {sql}'
+                for sql, duration in profile.slowest_queries(3)
+            )
+            logger.warning(
+                'Slow request: %s %s %d took %.0f ms, %d queries in '
+                '%.0f ms%s',
+                request.method, request.path, response.status_code,
+                timings['total'] * 1000, len(profile.queries),
+                timings['db'] * 1000, worst
+            )
+
+
+def server_timing(timings, queries):
+    """Format timings in seconds as a ``Server-Timing`` header value"""
+    return ', '.join(
+        f'{name};dur={duration * 1000:.1f}' +
+        (f';desc="{queries} queries"' if name == 'db' else '')
+        for name, duration in timings.items()
+    )
@@ -0,0 +1,42 @@
+# Generated by Django 3.1.14 on 2026-10-17 03:42
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Fold tags and ingredients sharing a name into the oldest one"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, relation in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, relation).through
+        column = f'{model_name.lower()}_id'
+        duplicates = (
+            model.objects
+            .values('user', 'name')
+            .annotate(keep=Min('id'), count=Count('id'))
+            .filter(count__gt=1)
+        )
+        for duplicate in duplicates.iterator():
+            keep = duplicate['keep']
+            extra = model.objects.filter(
+                user=duplicate['user'],
+                name=duplicate['name']
+            ).exclude(id=keep).values_list('id', flat=True)
+            for extra_id in extra:
+                linked = through.objects.filter(**{column: keep})
+                through.objects.filter(**{column: extra_id}).exclude(
+                    recipe_id__in=linked.values('recipe_id')
+                ).update(**{column: keep})
+            model.objects.filter(id__in=list(extra)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 3.1.14 on 2026-10-17 03:47
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# PostgreSQL 12+ keeps the weighted search vector up to date itself as a
+# stored generated column, so title changes never need an extra write.
+CREATE_SEARCH_VECTOR = """
+ALTER TABLE core_recipe ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(search_terms, '')), 'B')
+    ) STORED;
+CREATE INDEX core_recipe_search_vector_idx
+    ON core_recipe USING gin (search_vector);
+"""
+
+DROP_SEARCH_VECTOR = """
+DROP INDEX IF EXISTS core_recipe_search_vector_idx;
+ALTER TABLE core_recipe DROP COLUMN IF EXISTS search_vector;
+"""
+
+
+def fill_search_terms(apps, schema_editor):
+    """Store the tag and ingredient names of existing recipes"""
+    Recipe = apps.get_model('core', 'Recipe')
+    ids = list(Recipe.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), 1000):
+        chunk = ids[start:start + 1000]
+        names = defaultdict(list)
+        relations = (('tags', 'tag'), ('ingredients', 'ingredient'))
+        for relation, target in relations:
+            through = getattr(Recipe, relation).through
+            rows = through.objects.filter(recipe_id__in=chunk).order_by(
+                f'{target}__name'
+            ).values_list('recipe_id', f'{target}__name')
+            for recipe_id, name in rows:
+                names[recipe_id].append(name)
+        Recipe.objects.bulk_update(
+            [Recipe(id=pk, search_terms=' '.join(names[pk])) for pk in chunk],
+            ['search_terms']
+        )
+
+
+def create_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH_VECTOR)
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_VECTOR)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_unique_names_per_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_terms',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(create_search_vector, drop_search_vector),
+        migrations.RunPython(fill_search_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.1.14 on 2026-10-17 03:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The auto-created through tables are only indexed on (recipe_id, tag_id),
+# which serves the recipe -> tags direction. Filtering recipes by tag and
+# assigned_only go the other way, and the reverse composite index answers
+# them from the index alone. (user, name) on tags and ingredients is
+# already covered by the unique constraints from 0003. The (user, id) index
+# on recipes also serves every lookup by user alone, so the foreign key
+# index on user_id is dropped.
+THROUGH_INDEXES = (
+    ('core_recipe_tags', 'tag_id'),
+    ('core_recipe_ingredients', 'ingredient_id'),
+)
+
+
+def reverse_index_operations():
+    for table, column in THROUGH_INDEXES:
+        name = f'{table}_{column}_recipe_idx'
+        yield migrations.RunSQL(
+            f'CREATE INDEX {name} ON {table} ({column}, recipe_id);',
+            f'DROP INDEX {name};',
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0004_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['user', 'id'],
+                name='core_recipe_user_id_idx'
+            ),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='user',
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        *reverse_index_operations(),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.1.14 on 2026-10-17 03:54
+
+from django.db import migrations, models
+
+
+def count_references(apps, schema_editor):
+    """Count the recipes using each image stored so far"""
+    Recipe = apps.get_model('core', 'Recipe')
+    StoredImage = apps.get_model('core', 'StoredImage')
+    counts = Recipe.objects.exclude(image='').exclude(
+        image__isnull=True
+    ).values('image').annotate(references=models.Count('id'))
+    StoredImage.objects.bulk_create(
+        [
+            StoredImage(name=row['image'], references=row['references'])
+            for row in counts.order_by('image').iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('references', models.PositiveIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.1.14 on 2026-10-17 04:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_stored_images'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_stats', serialize=False, to='core.user')),
+                ('recipe_count', models.PositiveIntegerField(default=0)),
+                ('time_minutes_total', models.BigIntegerField(default=0)),
+                ('time_minutes', models.JSONField(default=dict)),
+                ('price_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('price_buckets', models.JSONField(default=list)),
+                ('tags', models.JSONField(default=dict)),
+                ('ingredients', models.JSONField(default=dict)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,16 +1,18 @@
-import uuid
 import os
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                         PermissionsMixin
 from django.conf import settings
 
 
 def recipe_image_file_path(instance, file_name):
-    """Generate file path for new recipe image"""
-    ext = file_name.split('.')[-1]
-    file_name = f'{uuid.uuid4()}.{ext}'
-    return os.path.join('uploads/recipe/', file_name)
+    """Generate file path for new recipe image.
+
+    ContentAddressedStorage names files in this directory after the hash
+    of their content, so only the directory and extension are kept.
+    """
+    ext = file_name.split('.')[-1].lower()
+    return os.path.join('uploads/recipe/', f'image.{ext}')
 
 
 class MyUserManager(BaseUserManager):
@@ -55,6 +57,14 @@ class Tag(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -67,15 +77,26 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_name_per_user'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
 class Recipe(models.Model):
     """Recipe Object"""
+    # Lookups by user are served by the (user, id) index below, which
+    # makes a separate index on the foreign key redundant.
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     title = models.CharField(max_length=255)
     time_minutes = models.IntegerField()
@@ -84,6 +105,67 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # Resized copies of the image, written by recipe.images once an upload
+    # has been processed; empty while processing is pending.
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # Names of the tags and ingredients, kept up to date by recipe.signals
+    # and indexed for full-text search together with the title.
+    search_terms = models.TextField(blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            # Every recipe query is scoped to a user and walks the primary
+            # key, for keyset pagination and exports alike.
+            models.Index(
+                fields=['user', 'id'],
+                name='core_recipe_user_id_idx'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # recipe.signals locks the row before the save and counts the
+        # change after it, which must happen in one transaction.
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
+
+
+class StoredImage(models.Model):
+    """An image file and the number of recipes using it"""
+    name = models.CharField(max_length=255, unique=True)
+    references = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+class UserRecipeStats(models.Model):
+    """Running totals of a user's recipes, kept by recipe.stats"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recipe_stats'
+    )
+    recipe_count = models.PositiveIntegerField(default=0)
+    time_minutes_total = models.BigIntegerField(default=0)
+    # Number of recipes per preparation time, keyed by minutes.
+    time_minutes = models.JSONField(default=dict)
+    price_total = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0
+    )
+    # Number of recipes per price bucket, see RECIPE_STATS_PRICE_BOUNDS.
+    price_buckets = models.JSONField(default=list)
+    # Number of recipes per tag and ingredient, keyed by id.
+    tags = models.JSONField(default=dict)
+    ingredients = models.JSONField(default=dict)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Recipe stats of {self.user_id}'
@@ -0,0 +1,136 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('request_profile', default=None)
+_counter = ContextVar('query_counter', default=None)
+
+
+class RequestProfile:
+    """Costs accumulated while handling one request, in seconds"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.db_time = 0.0
+        self.sections = Counter()
+        self._depth = Counter()
+
+    def add_query(self, sql, duration):
+        self.queries.append((sql, duration))
+        self.db_time += duration
+
+    def duplicate_queries(self, threshold):
+        """Return ``(sql, count)`` of statements run ``threshold`` times"""
+        counts = Counter(sql for sql, _ in self.queries)
+        return [
+            (sql, count) for sql, count in counts.most_common()
+            if count >= threshold
+        ]
+
+    def slowest_queries(self, count):
+        """Return the ``count`` slowest ``(sql, duration)`` pairs"""
+        return sorted(self.queries, key=lambda query: -query[1])[:count]
+
+
+class QueryCounter:
+    """Number and total time in seconds of the queries in a block"""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+
+@contextmanager
+def count_queries():
+    """Count the queries run in the block, in any thread it hands to"""
+    counter = QueryCounter()
+    token = _counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _counter.reset(token)
+
+
+def start_profile():
+    """Begin profiling the current request, returning a reset token"""
+    return _current.set(RequestProfile())
+
+
+def finish_profile(token):
+    """Stop profiling and return the profile of the request"""
+    profile = _current.get()
+    _current.reset(token)
+    return profile
+
+
+def current_profile():
+    """Return the profile of the current request, if it is sampled"""
+    return _current.get()
+
+
+@contextmanager
+def timed(section):
+    """Add the time spent in the block to a section of the profile.
+
+    Nested blocks of the same section only count once, so a serializer
+    calling other serializers is not double counted.
+    """
+    profile = _current.get()
+    if profile is None or profile._depth[section]:
+        yield
+        return
+    profile._depth[section] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.sections[section] += time.perf_counter() - started
+        profile._depth[section] -= 1
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper timing queries of profiled requests"""
+    profile = _current.get()
+    counter = _counter.get()
+    if profile is None and counter is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        if profile is not None:
+            profile.add_query(sql, duration)
+        if counter is not None:
+            counter.count += 1
+            counter.time += duration
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Add ``record_query`` to every new database connection.
+
+    The wrapper stays installed and costs two context variable lookups per
+    query when nothing is measured. Profiles live in a context
+    variable, which asgiref copies into the threads it runs sync views in,
+    so queries count under ASGI too.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class ProfiledSerializerMixin:
+    """Count the time a serializer spends converting data as 'serialize'.
+
+    Querysets are evaluated while serializing, so this includes the time
+    of the queries that load the objects.
+    """
+
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+    def to_internal_value(self, data):
+        with timed('serialize'):
+            return super().to_internal_value(data)
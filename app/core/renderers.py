@@ -0,0 +1,44 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON renderer that encodes with orjson when it is installed.
+
+    Compact responses decode to the same data as ``JSONRenderer`` output:
+    types orjson does not know, and dates and times, go through the REST
+    framework encoder, so strings, integers, dates and times come out
+    byte for byte the same. Floats, and decimals the encoder turns into
+    floats, that need an exponent are spelled differently, ``1e16`` for
+    ``1e+16`` and ``0.000025`` for ``2.5e-05``. NaN and infinities become
+    null instead of failing. Indented output, ASCII
+    only output, data orjson rejects and installs without orjson use the
+    standard library encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or \
+                not self.compact or self.get_indent(
+                    accepted_media_type, renderer_context or {}
+                ) is not None:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME |
+                orjson.OPT_NON_STR_KEYS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        # Like JSONRenderer, escape the separators JavaScript rejects.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028') \
+            .replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.authentication import token_cache
+from core.models import Recipe, StoredImage
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_cached_token(sender, instance, using, **kwargs):
+    """Drop a token from the authentication cache when it changes.
+
+    The token is dropped at once and again when the transaction commits,
+    so a lookup that read the old row in between can not stay cached.
+    """
+    key = instance.key
+    token_cache.invalidate(key)
+    transaction.on_commit(lambda: token_cache.invalidate(key), using=using)
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, using, **kwargs):
+    """Drop the tokens of a user who was changed, deactivated or deleted.
+
+    Dropped again on commit, like ``invalidate_cached_token``.
+    """
+    user_id = instance.pk
+    token_cache.invalidate_user(user_id)
+    transaction.on_commit(
+        lambda: token_cache.invalidate_user(user_id), using=using
+    )
+
+
+def add_image_reference(name):
+    """Count one more recipe using the image ``name``"""
+    StoredImage.objects.get_or_create(name=name)
+    StoredImage.objects.filter(name=name).update(
+        references=F('references') + 1
+    )
+
+
+def drop_image_reference(name):
+    """Count one recipe less using the image ``name``.
+
+    Unused files stay in storage until the garbage collector removes them,
+    as an upload of the same content may be about to reference them again.
+    """
+    StoredImage.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+
+
+def _image_name(value):
+    """Return the stored name of an image field value"""
+    if isinstance(value, str):
+        return value or None
+    if getattr(value, '_committed', False):
+        return value.name or None
+    return None
+
+
+@receiver(pre_save, sender=Recipe)
+def read_stored_image(sender, instance, update_fields, **kwargs):
+    """Read the image stored for a recipe about to be saved, under a lock.
+
+    Recipe.save runs in a transaction, so the lock holds until the
+    reference count is moved, and of two concurrent saves the second
+    reads the image the first stored rather than the one it loaded.
+    """
+    instance.__dict__.pop('_stored_image', None)
+    # The image is missing from __dict__ when the field was deferred.
+    if 'image' not in instance.__dict__ or instance._state.adding:
+        return
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    instance._stored_image = Recipe.objects.select_for_update().filter(
+        pk=instance.pk
+    ).values_list('image', flat=True).first() or None
+
+
+@receiver(post_save, sender=Recipe)
+def count_image_references(sender, instance, **kwargs):
+    """Move the image reference of a recipe whose image changed"""
+    previous = instance.__dict__.pop('_stored_image', None)
+    if 'image' not in instance.__dict__:
+        return
+    current = _image_name(instance.__dict__['image'])
+    if current == previous:
+        return
+    if current:
+        add_image_reference(current)
+    if previous:
+        drop_image_reference(previous)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image_reference(sender, instance, **kwargs):
+    """Drop the image reference of a deleted recipe"""
+    name = _image_name(instance.__dict__.get('image'))
+    if name:
+        drop_image_reference(name)
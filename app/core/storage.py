@@ -0,0 +1,82 @@
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from core.uploads import content_hash
+
+# Names derived from a file's content: recipe images stored under their
+# hash and the renditions generated from them.
+CONTENT_ADDRESSED = re.compile(
+    r'^uploads/recipe/(?:[0-9a-f]{2}/[0-9a-f]{64}|renditions/[0-9a-f]{64}/\w+)'
+    r'\.\w+$'
+)
+
+
+def is_content_addressed(name):
+    """Return whether ``name`` is determined by the file content"""
+    return bool(CONTENT_ADDRESSED.match(name.replace(os.sep, '/')))
+
+
+def content_addressed_name(directory, extension, digest):
+    """Return the name a file with hash ``digest`` is stored under"""
+    return f'{directory}/{digest[:2]}/{digest}.{extension.lower()}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage that stores identical content once.
+
+    Files saved into ``hashed_directories`` are named after the SHA-256 of
+    their content. Saving a content addressed name that already exists
+    keeps the existing file and only refreshes its modification time,
+    which marks it as recently used for garbage collection. Other names
+    behave as usual.
+    """
+    hashed_directories = ('uploads/recipe',)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        directory, base = posixpath.split(name.replace(os.sep, '/'))
+        if directory in self.hashed_directories and '.' in base:
+            if not hasattr(content, 'chunks'):
+                content = File(content, name)
+            name = content_addressed_name(
+                directory, base.rsplit('.', 1)[1], content_hash(content)
+            )
+        return super().save(name, content, max_length)
+
+    def get_available_name(self, name, max_length=None):
+        if is_content_addressed(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if not is_content_addressed(name):
+            return super()._save(name, content)
+
+        path = self.path(name)
+        if os.path.exists(path):
+            os.utime(path)
+            return name
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write next to the target and rename, so concurrent uploads of
+        # the same content never expose a partial file.
+        fd, temporary = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as stored:
+                for chunk in content.chunks():
+                    stored.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
@@ -0,0 +1,25 @@
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+
+from core.metrics import registry
+
+
+class TestRunner(DiscoverRunner):
+    """Test runner that keeps test metrics out of METRICS_DIR.
+
+    Requests made by the tests are counted like any others, so the run
+    gets a temporary metrics directory of its own, removed at the end,
+    and writes nothing once it is over.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.metrics_dir = tempfile.mkdtemp(prefix='recipe-test-metrics-')
+        registry.directory = self.metrics_dir
+
+    def teardown_test_environment(self, **kwargs):
+        registry.directory = None
+        shutil.rmtree(self.metrics_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
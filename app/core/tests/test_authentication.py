@@ -0,0 +1,172 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import CachedTokenAuthentication, TokenCache, \
+    token_cache
+
+ME_URL = reverse('user:me')
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='usman@gmail.com',
+            password='123456'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def test_entries_expire(self):
+        """Test cached tokens are forgotten after the TTL"""
+        clock = FakeClock()
+        cache = TokenCache(max_size=10, ttl=30, clock=clock)
+        cache.set(self.token.key, self.user, self.token)
+
+        clock.now = 29
+        self.assertIsNotNone(cache.get(self.token.key))
+        clock.now = 30
+        self.assertIsNone(cache.get(self.token.key))
+
+    def test_least_recently_used_evicted(self):
+        """Test the cache stays within its size bound"""
+        cache = TokenCache(max_size=2, ttl=30)
+        cache.set('a', self.user, self.token)
+        cache.set('b', self.user, self.token)
+        cache.get('a')
+        cache.set('c', self.user, self.token)
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['size'], 2)
+
+    def test_hits_return_fresh_instances(self):
+        """Test requests do not share the cached user object"""
+        cache = TokenCache(max_size=10, ttl=30)
+        cache.set(self.token.key, self.user, self.token)
+
+        user1, token1 = cache.get(self.token.key)
+        user2, _ = cache.get(self.token.key)
+
+        self.assertIsNot(user1, user2)
+        self.assertEqual(user1.pk, self.user.pk)
+        self.assertEqual(user1.email, self.user.email)
+        self.assertEqual(token1.key, self.token.key)
+        self.assertIs(token1.user, user1)
+
+    def test_stale_lookup_not_stored(self):
+        """Test an invalidation during a lookup prevents caching it"""
+        cache = TokenCache(max_size=10, ttl=30)
+        generation = cache.generation()
+        cache.invalidate_user(self.user.pk)
+        cache.set(self.token.key, self.user, self.token, generation)
+
+        self.assertIsNone(cache.get(self.token.key))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='usman@gmail.com',
+            password='123456'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_second_lookup_hits_cache(self):
+        """Test a cached token is resolved without queries"""
+        self.auth.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(token.key, self.token.key)
+        stats = token_cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_token_deletion_invalidates(self):
+        """Test a deleted token stops authenticating"""
+        self.auth.authenticate_credentials(self.token.key)
+        self.token.delete()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_user_deactivation_invalidates(self):
+        """Test a deactivated user stops authenticating"""
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_password_change_invalidates(self):
+        """Test changing the password drops the cached tokens"""
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.set_password('654321')
+        self.user.save()
+
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_api_requests_use_cache(self):
+        """Test the user endpoint authenticates through the cache"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+        client.get(ME_URL)
+        with self.assertNumQueries(0):
+            result = client.get(ME_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data['email'], self.user.email)
+
+
+class CommitInvalidationTests(TransactionTestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='usman@gmail.com',
+            password='123456'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def test_token_evicted_on_commit(self):
+        """Test a lookup racing a token deletion is not left cached"""
+        key = self.token.key
+        with transaction.atomic():
+            Token.objects.get(key=key).delete()
+            # A concurrent lookup still reads the committed row.
+            token_cache.set(key, self.user, self.token)
+            self.assertIsNotNone(token_cache.get(key))
+
+        self.assertIsNone(token_cache.get(key))
+
+    def test_user_evicted_on_commit(self):
+        """Test a lookup racing a deactivation is not left cached"""
+        with transaction.atomic():
+            self.user.is_active = False
+            self.user.save()
+            token_cache.set(self.token.key, self.user, self.token)
+            self.assertIsNotNone(token_cache.get(self.token.key))
+
+        self.assertIsNone(token_cache.get(self.token.key))
@@ -1,6 +1,6 @@
 from unittest.mock import patch
 
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
 from django.db.utils import OperationalError
 from django.test import TestCase
 
@@ -9,15 +9,41 @@ class CommandTests(TestCase):
 
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available"""
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.return_value = True
+        with patch('core.management.commands.wait_for_db.probe_database') \
+                as probe:
+            probe.return_value = 0.001
             call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+            self.assertEqual(probe.call_count, 1)
 
+    def test_wait_for_db_probes_connection(self):
+        """Test waiting for db runs a query on the database"""
+        with patch('django.db.backends.utils.CursorWrapper.execute') as ex:
+            call_command('wait_for_db')
+            ex.assert_called_once_with('SELECT 1')
+
+    @patch('core.management.commands.wait_for_db.connections')
     @patch('time.sleep', return_value=True)
-    def test_wait_for_db(self, ts):
+    def test_wait_for_db(self, ts, connections):
         """Test waiting for db."""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
+        with patch('core.management.commands.wait_for_db.probe_database') \
+                as probe:
+            probe.side_effect = [OperationalError] * 5 + [0.001]
             call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+            self.assertEqual(probe.call_count, 6)
+            self.assertEqual(
+                [call.args[0] for call in ts.call_args_list],
+                [0.1, 0.2, 0.4, 0.8, 1.6]
+            )
+            self.assertEqual(connections['default'].close.call_count, 5)
+
+    @patch('core.management.commands.wait_for_db.connections')
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, ts, connections):
+        """Test waiting for db gives up after the timeout"""
+        with patch('core.management.commands.wait_for_db.probe_database') \
+                as probe, patch('time.monotonic') as monotonic:
+            probe.side_effect = OperationalError
+            monotonic.side_effect = [0, 1, 2, 11]
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=10)
+            self.assertEqual(probe.call_count, 3)
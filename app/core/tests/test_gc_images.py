@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import Recipe, StoredImage
+
+
+class GcImagesTests(TestCase):
+    """Test garbage collection of recipe images"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+
+    def sample_recipe(self, content):
+        """Create a recipe with an image"""
+        return Recipe.objects.create(
+            user=self.user,
+            title='Biryani',
+            time_minutes=10,
+            price=5,
+            image=SimpleUploadedFile('photo.jpg', content)
+        )
+
+    def age(self, *names):
+        """Make files look older than the grace period"""
+        for name in names:
+            os.utime(default_storage.path(name), (0, 0))
+
+    def gc_images(self, **options):
+        out = StringIO()
+        call_command('gc_images', stdout=out, **options)
+        return out.getvalue()
+
+    def test_deletes_orphans_only(self):
+        """Test unreferenced files are deleted and referenced ones kept"""
+        kept = self.sample_recipe(b'kept')
+        rendition = default_storage.save(
+            'uploads/recipe/renditions/' + 'a' * 64 + '/thumb.jpeg',
+            ContentFile(b'thumb')
+        )
+        Recipe.objects.filter(pk=kept.pk).update(renditions={
+            'thumb': {'width': 1, 'height': 1, 'jpeg': rendition},
+        })
+        orphan = self.sample_recipe(b'orphan')
+        orphan_name = orphan.image.name
+        orphan.delete()
+        stale_rendition = default_storage.save(
+            'uploads/recipe/renditions/' + 'b' * 64 + '/thumb.jpeg',
+            ContentFile(b'stale')
+        )
+        self.age(kept.image.name, rendition, orphan_name, stale_rendition)
+
+        output = self.gc_images()
+
+        self.assertIn('Deleted 2 orphaned files (11 bytes)', output)
+        self.assertTrue(default_storage.exists(kept.image.name))
+        self.assertTrue(default_storage.exists(rendition))
+        self.assertFalse(default_storage.exists(orphan_name))
+        self.assertFalse(default_storage.exists(stale_rendition))
+        self.assertFalse(
+            os.path.exists(os.path.dirname(default_storage.path(orphan_name)))
+        )
+        self.assertFalse(StoredImage.objects.filter(name=orphan_name).exists())
+
+    def test_dry_run(self):
+        """Test a dry run reports orphans without deleting them"""
+        orphan = self.sample_recipe(b'orphan')
+        name = orphan.image.name
+        orphan.delete()
+        self.age(name)
+
+        output = self.gc_images(dry_run=True, verbosity=2)
+
+        self.assertIn(name, output)
+        self.assertIn('Would delete 1 orphaned files', output)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_recent_files_are_kept(self):
+        """Test files within the grace period are not deleted"""
+        orphan = self.sample_recipe(b'orphan')
+        name = orphan.image.name
+        orphan.delete()
+
+        self.gc_images()
+
+        self.assertTrue(default_storage.exists(name))
+
+    def test_reused_files_are_kept(self):
+        """Test files an upload referenced again are not deleted"""
+        orphan = self.sample_recipe(b'orphan')
+        name = orphan.image.name
+        orphan.delete()
+        self.age(name)
+        self.sample_recipe(b'orphan')
+        self.age(name)
+
+        self.gc_images(batch_size=1)
+
+        self.assertTrue(default_storage.exists(name))
+
+    @patch('time.sleep', side_effect=KeyboardInterrupt)
+    def test_interval(self, sleep):
+        """Test the scheduled mode sleeps between passes"""
+        with self.assertRaises(KeyboardInterrupt):
+            self.gc_images(interval=60)
+
+        sleep.assert_called_once_with(60)
@@ -0,0 +1,59 @@
+from unittest.mock import patch
+
+from django.db.utils import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+
+from core import health
+
+
+class HealthTests(TestCase):
+    """Test the health and readiness endpoints"""
+
+    def setUp(self):
+        health.reset()
+        self.addCleanup(health.reset)
+
+    def test_readyz(self):
+        """Test readiness reports the database round trip"""
+        result = self.client.get(reverse('readyz'))
+
+        self.assertEqual(result.status_code, 200)
+        data = result.json()
+        self.assertEqual(data['status'], 'ok')
+        self.assertTrue(data['database']['ok'])
+        self.assertGreaterEqual(data['database']['latency_ms'], 0)
+        self.assertIsNone(data['database']['pool'])
+        self.assertIn('no-cache', result['Cache-Control'])
+
+    @patch('core.health.connections')
+    def test_readyz_database_down(self, connections):
+        """Test readiness fails when the database does not answer"""
+        connections.__getitem__.return_value.ensure_connection.side_effect = \
+            OperationalError
+        connections.__getitem__.return_value.pool_stats = None
+
+        result = self.client.get(reverse('readyz'))
+
+        self.assertEqual(result.status_code, 503)
+        self.assertEqual(result.json()['database'], {
+            'ok': False, 'error': 'OperationalError', 'pool': None,
+        })
+
+    def test_readyz_reuses_recent_probe(self):
+        """Test probes within the max age share one query"""
+        with patch('core.health.probe_database', return_value=0.001) as probe:
+            self.client.get(reverse('readyz'))
+            self.client.get(reverse('readyz'))
+
+        self.assertEqual(probe.call_count, 1)
+
+    def test_healthz(self):
+        """Test liveness does not query the database"""
+        with self.assertNumQueries(0):
+            result = self.client.get(reverse('healthz'))
+        self.assertEqual(result.json(), {'status': 'ok', 'database': None})
+
+        self.client.get(reverse('readyz'))
+        result = self.client.get(reverse('healthz'))
+        self.assertTrue(result.json()['database']['ok'])
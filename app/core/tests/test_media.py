@@ -0,0 +1,138 @@
+import hashlib
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+
+class MediaTests(TestCase):
+    """Test serving uploaded media"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        self.content = bytes(range(256)) * 4
+        self.name = default_storage.save(
+            'uploads/recipe/photo.jpg', ContentFile(self.content)
+        )
+        self.url = f'/media/{self.name}'
+
+    def test_serve_content_addressed_file(self):
+        """Test hashed files are served with immutable caching"""
+        digest = hashlib.sha256(self.content).hexdigest()
+
+        result = self.client.get(self.url)
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(b''.join(result.streaming_content), self.content)
+        self.assertEqual(result['Content-Type'], 'image/jpeg')
+        self.assertEqual(result['Content-Length'], str(len(self.content)))
+        self.assertEqual(result['ETag'], f'"{self.name}"')
+        self.assertIn(digest, self.name)
+        self.assertIn('immutable', result['Cache-Control'])
+        self.assertIn('max-age=31536000', result['Cache-Control'])
+        self.assertEqual(result['Accept-Ranges'], 'bytes')
+
+    def test_serve_other_file(self):
+        """Test other files get a short cache lifetime"""
+        name = default_storage.save('notes.txt', ContentFile(b'notes'))
+
+        result = self.client.get(f'/media/{name}')
+
+        self.assertEqual(result.status_code, 200)
+        self.assertIn('max-age=3600', result['Cache-Control'])
+        self.assertNotIn('immutable', result['Cache-Control'])
+
+    def test_conditional_requests(self):
+        """Test matching validators are answered with 304"""
+        first = self.client.get(self.url)
+
+        result = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(result.status_code, 304)
+        self.assertEqual(result.content, b'')
+
+        result = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+        )
+        self.assertEqual(result.status_code, 304)
+
+    def test_range_requests(self):
+        """Test byte ranges are served as partial content"""
+        result = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(result.status_code, 206)
+        self.assertEqual(b''.join(result.streaming_content),
+                         self.content[10:20])
+        self.assertEqual(
+            result['Content-Range'], f'bytes 10-19/{len(self.content)}'
+        )
+        self.assertEqual(result['Content-Length'], '10')
+
+        result = self.client.get(self.url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(result.streaming_content),
+                         self.content[-4:])
+
+        result = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(result.status_code, 416)
+        self.assertEqual(
+            result['Content-Range'], f'bytes */{len(self.content)}'
+        )
+
+    def test_suffix_range_of_empty_file(self):
+        """Test a suffix range of an empty file is unsatisfiable"""
+        name = default_storage.save('empty.txt', ContentFile(b''))
+
+        result = self.client.get(f'/media/{name}', HTTP_RANGE='bytes=-4')
+
+        self.assertEqual(result.status_code, 416)
+        self.assertEqual(result['Content-Range'], 'bytes */0')
+
+    def test_stale_if_range_returns_full_file(self):
+        """Test a range is ignored when If-Range does not match"""
+        result = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"'
+        )
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(b''.join(result.streaming_content), self.content)
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect')
+    def test_accel_redirect(self):
+        """Test nginx is asked to send the file"""
+        result = self.client.get(self.url)
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.content, b'')
+        self.assertEqual(
+            result['X-Accel-Redirect'], f'/protected-media/{self.name}'
+        )
+        self.assertEqual(result['Content-Type'], 'image/jpeg')
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Sendfile')
+    def test_sendfile(self):
+        """Test the web server is given the file path"""
+        result = self.client.get(self.url)
+
+        self.assertEqual(
+            result['X-Sendfile'], default_storage.path(self.name)
+        )
+
+    def test_missing_and_unsafe_paths(self):
+        """Test missing files, directories and traversal are not found"""
+        for url in ('/media/missing.jpg', '/media/uploads/recipe/',
+                    '/media/../settings.py', '/media/%2e%2e/app/settings.py'):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_only_safe_methods(self):
+        """Test media can not be posted to"""
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+        result = self.client.head(self.url)
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result['Content-Length'], str(len(self.content)))
@@ -0,0 +1,285 @@
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import token_cache
+from core.metrics import Counter, Gauge, Histogram, Registry, registry
+from core.middleware import MetricsMiddleware
+from core.tests.urls import slow_view
+
+METRICS_URL = reverse('metrics')
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class RegistryTests(TestCase):
+    """Test collecting and exporting metrics"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.registry = Registry(self.directory)
+        self.requests = Counter(
+            self.registry, 'requests_total', 'Requests.', ('route',)
+        )
+        self.latency = Histogram(
+            self.registry, 'latency_seconds', 'Latency.', buckets=(0.1, 1)
+        )
+        self.workers = Gauge(self.registry, 'workers', 'Workers.')
+
+    def write_process(self, pid, values):
+        path = os.path.join(self.directory, f'{pid}-other.json')
+        with open(path, 'w') as output:
+            json.dump({'pid': pid, 'values': values}, output)
+
+    def test_export(self):
+        """Test counters and histograms in Prometheus text format"""
+        self.requests.inc(route='recipe:recipe-list')
+        self.requests.inc(2, route='recipe:recipe-list')
+        self.latency.observe(0.05)
+        self.latency.observe(0.5)
+        self.latency.observe(3)
+
+        lines = self.registry.export().splitlines()
+
+        self.assertIn('# TYPE requests_total counter', lines)
+        self.assertIn('requests_total{route="recipe:recipe-list"} 3', lines)
+        self.assertIn('# TYPE latency_seconds histogram', lines)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{le="1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn('latency_seconds_sum 3.55', lines)
+        self.assertIn('latency_seconds_count 3', lines)
+
+    def test_labels_escaped(self):
+        """Test label values can not break the format"""
+        self.requests.inc(route='a"b\\c\nd')
+
+        self.assertIn(
+            'requests_total{route="a\\"b\\\\c\\nd"} 1',
+            self.registry.export()
+        )
+
+    def test_wrong_labels(self):
+        """Test using labels a metric does not declare fails"""
+        with self.assertRaises(ValueError):
+            self.requests.inc(status=200)
+
+    def test_processes_added_up(self):
+        """Test values flushed by other processes are included"""
+        self.requests.inc(route='user:token')
+        self.latency.observe(0.05)
+        self.write_process(dead_pid(), [
+            ['requests_total', ['user:token'], 4],
+            ['latency_seconds', [], [0, 1, 0, 0.5]],
+            ['workers', [], 1],
+        ])
+        self.write_process(os.getppid(), [['workers', [], 2]])
+
+        lines = self.registry.export().splitlines()
+
+        self.assertIn('requests_total{route="user:token"} 5', lines)
+        self.assertIn('latency_seconds_count 2', lines)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', lines)
+        # Gauges of stopped processes are left out.
+        self.assertIn('workers 2', lines)
+
+    def test_flush(self):
+        """Test flushing writes this process's values to its own file"""
+        self.requests.inc(route='user:me')
+
+        self.registry.flush()
+        self.registry.flush()
+
+        files = [name for name in os.listdir(self.directory)
+                 if name.endswith('.json')]
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].startswith(f'{os.getpid()}-'))
+        self.assertIn(
+            'requests_total{route="user:me"} 1', self.registry.export()
+        )
+
+    def test_stopped_processes_compacted(self):
+        """Test files of stopped processes are folded into one"""
+        pid = dead_pid()
+        self.write_process(pid, [
+            ['requests_total', ['user:token'], 4],
+            ['workers', [], 1],
+        ])
+        path = os.path.join(self.directory, f'{pid}-second.json')
+        with open(path, 'w') as output:
+            json.dump({'pid': pid, 'values': [
+                ['requests_total', ['user:token'], 1],
+            ]}, output)
+
+        for _ in range(2):
+            lines = self.registry.export().splitlines()
+
+            self.assertIn('requests_total{route="user:token"} 5', lines)
+            self.assertNotIn('workers 1', lines)
+        self.assertEqual(
+            [name for name in os.listdir(self.directory)
+             if name.endswith('.json')],
+            [Registry.COMPACTED]
+        )
+
+    @skipUnless(os.path.exists('/proc/self/stat'), 'needs /proc')
+    def test_reused_pid_compacted(self):
+        """Test a file whose pid now belongs to another process is folded"""
+        path = os.path.join(self.directory, f'{os.getpid()}-old.json')
+        with open(path, 'w') as output:
+            json.dump({'pid': os.getpid(), 'started': 'earlier', 'values': [
+                ['requests_total', ['user:token'], 2],
+                ['workers', [], 1],
+            ]}, output)
+        self.workers.set(1)
+
+        lines = self.registry.export().splitlines()
+
+        self.assertIn('requests_total{route="user:token"} 2', lines)
+        self.assertIn('workers 1', lines)
+        self.assertFalse(os.path.exists(path))
+
+    def test_folded_file_not_counted_twice(self):
+        """Test a folded file left behind is removed, not added again"""
+        name = f'{dead_pid()}-other.json'
+        with open(os.path.join(self.directory, Registry.COMPACTED),
+                  'w') as output:
+            json.dump({'pid': None, 'folded': [name], 'values': [
+                ['requests_total', ['user:token'], 4],
+            ]}, output)
+        with open(os.path.join(self.directory, name), 'w') as output:
+            json.dump({'pid': 1, 'values': [
+                ['requests_total', ['user:token'], 4],
+            ]}, output)
+
+        self.assertIn(
+            'requests_total{route="user:token"} 4', self.registry.export()
+        )
+        self.assertFalse(
+            os.path.exists(os.path.join(self.directory, name))
+        )
+
+    def test_without_directory(self):
+        """Test nothing is written when no directory is configured"""
+        registry = Registry(None)
+        requests = Counter(registry, 'requests_total', 'Requests.')
+        requests.inc()
+
+        registry.flush()
+
+        self.assertIn('requests_total 1', registry.export())
+
+
+class MetricsEndpointTests(TestCase):
+    """Test the metrics endpoint and middleware"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        patcher = patch.object(registry, 'directory', directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_requests_by_route(self):
+        """Test requests are counted under their route name"""
+        self.client.get(reverse('recipe:tag-list'))
+        self.client.get(reverse('recipe:tag-list'))
+        self.client.get('/no-such-page/')
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        self.assertIn(
+            'http_requests_total{route="recipe:tag-list",method="GET",'
+            'status="200"} 2', body
+        )
+        self.assertIn(
+            'http_requests_total{route="unmatched",method="GET",'
+            'status="404"} 1', body
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{route="recipe:tag-list",'
+            'method="GET"} 2', body
+        )
+        self.assertIn(
+            'http_request_queries_count{route="recipe:tag-list"} 2', body
+        )
+
+    def test_token_cache_lookups(self):
+        """Test token cache lookups are exported as counters"""
+        token_cache.clear()
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        client.get(reverse('recipe:tag-list'))
+        client.get(reverse('recipe:tag-list'))
+
+        body = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn('# TYPE token_cache_lookups_total counter', body)
+        self.assertIn('token_cache_lookups_total{result="miss"} 1', body)
+        self.assertIn('token_cache_lookups_total{result="hit"} 1', body)
+
+    def test_response_cache_outcomes(self):
+        """Test response cache hits and misses are counted"""
+        url = reverse('recipe:recipe-list')
+        self.client.get(url)
+        self.client.get(url)
+
+        body = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn('recipe_response_cache_total{result="hit"} 1', body)
+        self.assertIn('recipe_response_cache_total{result="miss"} 1', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_required(self):
+        """Test scrapes need the bearer token when one is set"""
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 401)
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer secret'
+        )
+
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(ROOT_URLCONF='core.tests.urls')
+    async def test_asgi_requests(self):
+        """Test requests are counted when served over ASGI"""
+        self.assertTrue(
+            asyncio.iscoroutinefunction(MetricsMiddleware(slow_view))
+        )
+        client = AsyncClient()
+
+        await asyncio.gather(*(client.get('/api/slow/') for _ in range(3)))
+
+        self.assertIn(
+            'http_requests_total{route="slow",method="GET",status="200"} 3',
+            registry.export()
+        )
@@ -0,0 +1,135 @@
+import asyncio
+import re
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, \
+    TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.middleware import ProfilingMiddleware
+from core.models import Tag
+from core.profiling import current_profile, finish_profile, \
+    start_profile, timed
+from core.tests.urls import Probe
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def timing_names(header):
+    return [entry.split(';')[0] for entry in header.split(', ')]
+
+
+@override_settings(REQUEST_PROFILING_SAMPLE_RATE=1.0)
+class ProfilingMiddlewareTests(TestCase):
+    """Test the request profiling middleware"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.factory = RequestFactory()
+
+    def test_server_timing_header(self):
+        """Test API responses report their costs"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL)
+
+        header = res['Server-Timing']
+        self.assertEqual(
+            timing_names(header), ['total', 'view', 'db', 'serialize']
+        )
+        queries = int(re.search(r'desc="(\d+) queries"', header).group(1))
+        self.assertGreater(queries, 0)
+
+    def test_other_paths_not_profiled(self):
+        """Test requests outside the API are not profiled"""
+        res = self.client.get(reverse('healthz'))
+
+        self.assertFalse(res.has_header('Server-Timing'))
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        """Test requests outside the sample are not profiled"""
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(res.has_header('Server-Timing'))
+
+    def test_repeated_queries_logged(self):
+        """Test the same query run again and again is flagged as N+1"""
+        def view(request):
+            for _ in range(5):
+                list(Tag.objects.filter(user=self.user))
+            return HttpResponse()
+        middleware = ProfilingMiddleware(view)
+
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            middleware(self.factory.get('/api/recipe/tags/'))
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('N+1', logs.output[0])
+        self.assertIn('5 times', logs.output[0])
+
+    @override_settings(REQUEST_PROFILING_SLOW_MS=0)
+    def test_slow_request_logged(self):
+        """Test slow requests are logged with their slowest queries"""
+        def view(request):
+            list(Tag.objects.all())
+            return HttpResponse()
+        middleware = ProfilingMiddleware(view)
+
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            middleware(self.factory.get('/api/recipe/tags/'))
+
+        self.assertIn('Slow request', logs.output[0])
+        self.assertIn('core_tag', logs.output[0])
+
+    def test_nested_sections_counted_once(self):
+        """Test nested timed blocks do not double count"""
+        token = start_profile()
+        try:
+            with timed('serialize'):
+                with timed('serialize'):
+                    pass
+            profile = current_profile()
+            outer = profile.sections['serialize']
+            with timed('serialize'):
+                pass
+        finally:
+            finish_profile(token)
+
+        self.assertGreater(outer, 0)
+        self.assertGreater(profile.sections['serialize'], outer)
+        self.assertIsNone(current_profile())
+
+
+@override_settings(
+    ROOT_URLCONF='core.tests.urls', REQUEST_PROFILING_SAMPLE_RATE=1.0
+)
+class AsgiProfilingTests(SimpleTestCase):
+    """Test the profiling middleware under ASGI"""
+
+    def setUp(self):
+        Probe.reset()
+
+    async def test_requests_overlap(self):
+        """Test async views are not run one request at a time"""
+        client = AsyncClient()
+
+        responses = await asyncio.gather(
+            *(client.get('/api/slow/') for _ in range(5))
+        )
+
+        self.assertEqual(Probe.peak, 5)
+        for res in responses:
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(
+                timing_names(res['Server-Timing']),
+                ['total', 'view', 'db', 'serialize']
+            )
+        self.assertIsNone(current_profile())
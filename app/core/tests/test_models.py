@@ -1,4 +1,4 @@
-from unittest.mock import patch
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -49,6 +49,17 @@ class ModelTests(TestCase):
         )
         self.assertEqual(str(tag), tag.name)
 
+    def test_tag_name_unique_per_user(self):
+        """Test a user can not have two tags with the same name"""
+        user = sample_user()
+        models.Tag.objects.create(user=user, name='Vegan')
+        models.Tag.objects.create(
+            user=sample_user('usman1@gmail.com'), name='Vegan'
+        )
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Vegan')
+
     def test_ingredient_str(self):
         """Test the ingredient string presentation"""
         ingredient = models.Ingredient.objects.create(
@@ -66,12 +77,9 @@ class ModelTests(TestCase):
         )
         self.assertEqual(str(recipe), recipe.title)
 
-    @patch('uuid.uuid4')
-    def test_recipe_file_name_uuid(self, mock_my_uuid):
+    def test_recipe_file_name(self):
         """Test that image is saved in correct location"""
-        uuid = 'test-uuid'
-        mock_my_uuid.return_value = uuid
-        file_path = models.recipe_image_file_path(None, 'myimage.jpg')
+        file_path = models.recipe_image_file_path(None, 'myimage.JPG')
 
-        exp_path = f'uploads/recipe/{uuid}.jpg'
-        self.assertEqual(file_path, exp_path) 
+        exp_path = 'uploads/recipe/image.jpg'
+        self.assertEqual(file_path, exp_path)
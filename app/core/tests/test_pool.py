@@ -0,0 +1,263 @@
+import threading
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Stands in for a database connection"""
+
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+    """Clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the database connection pool"""
+
+    def setUp(self):
+        self.opened = []
+        self.clock = FakeClock()
+
+    def connect(self):
+        connection = FakeConnection(len(self.opened))
+        self.opened.append(connection)
+        return connection
+
+    def make_pool(self, **kwargs):
+        return ConnectionPool(
+            self.connect,
+            lambda connection: connection.close(),
+            check=lambda connection: connection.healthy,
+            clock=self.clock,
+            **kwargs
+        )
+
+    def test_reuses_connections(self):
+        """Test returned connections are handed out again"""
+        pool = self.make_pool()
+
+        first = pool.checkout()
+        pool.checkin(first)
+        second = pool.checkout()
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.opened), 1)
+        stats = pool.stats()
+        self.assertEqual(stats['connects'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_fill_opens_min_size(self):
+        """Test the pool opens its minimum size up front"""
+        pool = self.make_pool(min_size=3, max_size=5)
+
+        pool.fill()
+        pool.fill()
+
+        self.assertEqual(len(self.opened), 3)
+        self.assertEqual(pool.stats()['idle'], 3)
+
+    def test_health_check_after_idle(self):
+        """Test idle connections are checked and broken ones replaced"""
+        pool = self.make_pool(check_after=5)
+        connection = pool.checkout()
+        pool.checkin(connection)
+        connection.healthy = False
+
+        self.assertIs(pool.checkout(), connection)
+        pool.checkin(connection)
+
+        self.clock.now += 5
+        replacement = pool.checkout()
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['discards'], 1)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_max_lifetime(self):
+        """Test connections are closed once they reach their lifetime"""
+        pool = self.make_pool(max_lifetime=60, check_after=1000)
+        first = pool.checkout()
+        pool.checkin(first)
+        second = pool.checkout()
+        self.clock.now += 30
+        pool.checkin(second)
+        self.clock.now += 30
+
+        third = pool.checkout()
+
+        self.assertIsNot(third, first)
+        self.assertTrue(first.closed)
+        self.clock.now += 60
+        pool.checkin(third)
+        self.assertTrue(third.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_trims_idle_connections(self):
+        """Test idle connections beyond the minimum are closed"""
+        pool = self.make_pool(min_size=1, max_idle=10)
+        first = pool.checkout()
+        second = pool.checkout()
+        pool.checkin(first)
+        self.clock.now += 10
+
+        pool.checkin(second)
+
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_discard_on_checkin(self):
+        """Test broken connections are not returned to the pool"""
+        pool = self.make_pool()
+        connection = pool.checkout()
+
+        pool.checkin(connection, discard=True)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+        self.assertEqual(pool.stats()['discards'], 1)
+
+    def test_timeout_when_exhausted(self):
+        """Test checkouts fail once the pool stays exhausted"""
+        pool = ConnectionPool(
+            self.connect, lambda connection: connection.close(),
+            max_size=1, timeout=0.01
+        )
+        pool.checkout()
+
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertEqual(stats['timeouts'], 1)
+
+    def test_waiters_get_returned_connections(self):
+        """Test a waiting checkout receives the next returned connection"""
+        pool = ConnectionPool(
+            self.connect, lambda connection: connection.close(),
+            max_size=1, timeout=5
+        )
+        connection = pool.checkout()
+        received = []
+        waiter = threading.Thread(
+            target=lambda: received.append(pool.checkout())
+        )
+        waiter.start()
+        while pool.stats()['waits'] == 0:
+            pass
+
+        pool.checkin(connection)
+        waiter.join(5)
+
+        self.assertEqual(received, [connection])
+        self.assertEqual(len(self.opened), 1)
+
+    def test_failed_connect_frees_slot(self):
+        """Test a failing connect does not leak pool capacity"""
+        def connect():
+            raise OSError('refused')
+        pool = ConnectionPool(connect, lambda connection: None, max_size=1)
+
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                pool.checkout()
+
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL')
+class PooledBackendTests(TransactionTestCase):
+    """Test the pooled PostgreSQL backend against a server"""
+    alias = 'pool_test'
+
+    def make_wrapper(self, **settings):
+        from core.db.backends.postgresql_pool import base
+
+        wrapper = base.DatabaseWrapper({
+            **connection.settings_dict,
+            'ENGINE': 'core.db.backends.postgresql_pool',
+            **settings,
+        }, alias=self.alias)
+        self.addCleanup(base.close_pools, self.alias)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def fetch(self, wrapper, sql):
+        with wrapper.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchone()[0]
+
+    def test_reuses_sessions(self):
+        """Test a closed connection is handed out again"""
+        wrapper = self.make_wrapper()
+        backend = self.fetch(wrapper, 'SELECT pg_backend_pid()')
+        wrapper.close()
+
+        self.assertEqual(self.fetch(wrapper, 'SELECT pg_backend_pid()'),
+                         backend)
+        self.assertEqual(wrapper.pool_stats()['connects'], 1)
+
+    def test_resets_sessions(self):
+        """Test session state does not leak to the next user"""
+        wrapper = self.make_wrapper()
+        with wrapper.cursor() as cursor:
+            cursor.execute('SET statement_timeout = 1234')
+            cursor.execute('CREATE TEMPORARY TABLE pool_scratch (id int)')
+        wrapper.close()
+
+        self.assertNotEqual(
+            self.fetch(wrapper, 'SHOW statement_timeout'), '1234ms'
+        )
+        self.assertIsNone(
+            self.fetch(wrapper, "SELECT to_regclass('pool_scratch')")
+        )
+
+    def test_database_change(self):
+        """Test a connection is never reused for another database"""
+        wrapper = self.make_wrapper()
+        self.fetch(wrapper, 'SELECT 1')
+        wrapper.close()
+
+        wrapper.settings_dict['NAME'] = 'postgres'
+
+        self.assertEqual(
+            self.fetch(wrapper, 'SELECT current_database()'), 'postgres'
+        )
+
+    def test_drop_database_after_close(self):
+        """Test the test runner can drop a database pooled sessions used"""
+        name = f'{connection.settings_dict["NAME"]}_pool'
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{name}"')
+            cursor.execute(f'CREATE DATABASE "{name}"')
+        wrapper = self.make_wrapper(NAME=name)
+        self.fetch(wrapper, 'SELECT 1')
+        wrapper.close()
+
+        wrapper.creation._destroy_test_db(name, verbosity=0)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT count(*) FROM pg_database WHERE datname = %s', [name]
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
@@ -0,0 +1,77 @@
+import datetime
+import decimal
+import json
+import uuid
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.renderers import FastJSONRenderer
+
+DATA = {
+    'id': 1,
+    'title': 'Nihari \u2028 \u2029 é',
+    'price': decimal.Decimal('5.50'),
+    'ratio': 0.1,
+    'created': datetime.datetime(2020, 5, 1, 12, 30,
+                                 tzinfo=datetime.timezone.utc),
+    'day': datetime.date(2020, 5, 1),
+    'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'label': gettext_lazy('Recipe'),
+    'tags': [1, 2, None, True],
+    'nested': {'empty': {}, 'list': []},
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test the orjson renderer matches the standard JSON renderer"""
+
+    def test_same_bytes(self):
+        """Test compact output of strings, dates and decimals is identical"""
+        self.assertEqual(
+            FastJSONRenderer().render(DATA), JSONRenderer().render(DATA)
+        )
+
+    def test_float_spelling(self):
+        """Test floats only differ in how exponents are written"""
+        data = {'values': [
+            0.1, 1.5, 100.0, 1 / 3, 1e16, 2.5e-05, decimal.Decimal('1E+16'),
+        ]}
+
+        fast = FastJSONRenderer().render(data)
+
+        self.assertEqual(fast, b'{"values":[0.1,1.5,100.0,'
+                               b'0.3333333333333333,1e16,0.000025,1e16]}')
+        self.assertEqual(json.loads(fast), json.loads(
+            JSONRenderer().render(data)
+        ))
+
+    def test_indented(self):
+        """Test indented output is left to the standard encoder"""
+        media_type = 'application/json; indent=2'
+
+        self.assertEqual(
+            FastJSONRenderer().render(DATA, media_type),
+            JSONRenderer().render(DATA, media_type)
+        )
+
+    def test_integer_out_of_range(self):
+        """Test data orjson rejects falls back to the standard encoder"""
+        data = {'big': 2 ** 70}
+
+        self.assertEqual(FastJSONRenderer().render(data), b'{"big":%d}'
+                         % 2 ** 70)
+
+    def test_without_orjson(self):
+        """Test the renderer works when orjson is not installed"""
+        with patch.object(renderers, 'orjson', None):
+            self.assertEqual(
+                FastJSONRenderer().render(DATA), JSONRenderer().render(DATA)
+            )
+
+    def test_none(self):
+        """Test no data renders as an empty body"""
+        self.assertEqual(FastJSONRenderer().render(None), b'')
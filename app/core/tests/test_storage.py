@@ -0,0 +1,130 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from core.models import Recipe, StoredImage
+from core.storage import ContentAddressedStorage
+from core.uploads import HashingFileUploadHandler, content_hash
+
+
+class StorageTests(TestCase):
+    """Test content addressed storage of recipe images"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.storage = ContentAddressedStorage()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+
+    def sample_recipe(self, content=b'image content', title='Biryani'):
+        """Create a recipe with an image"""
+        return Recipe.objects.create(
+            user=self.user,
+            title=title,
+            time_minutes=10,
+            price=5,
+            image=SimpleUploadedFile('photo.jpg', content)
+        )
+
+    def references(self, name):
+        return StoredImage.objects.get(name=name).references
+
+    def test_identical_content_is_stored_once(self):
+        """Test saving the same content twice keeps one file"""
+        digest = hashlib.sha256(b'content').hexdigest()
+        name = f'uploads/recipe/{digest[:2]}/{digest}.jpg'
+        path = self.storage.path(name)
+
+        saved = self.storage.save(
+            'uploads/recipe/photo.JPG', ContentFile(b'content')
+        )
+        self.assertEqual(saved, name)
+        os.utime(path, (0, 0))
+        saved = self.storage.save(
+            'uploads/recipe/other.jpg', ContentFile(b'content')
+        )
+        self.assertEqual(saved, name)
+
+        self.assertEqual(os.listdir(os.path.dirname(path)), [f'{digest}.jpg'])
+        self.assertGreater(os.path.getmtime(path), 0)
+
+    def test_other_names_are_not_overwritten(self):
+        """Test names not derived from content keep Django's renaming"""
+        first = self.storage.save('notes.txt', ContentFile(b'one'))
+        second = self.storage.save('notes.txt', ContentFile(b'two'))
+
+        self.assertNotEqual(first, second)
+
+    def test_upload_handler_hashes_chunks(self):
+        """Test the upload handler hashes the streamed content"""
+        handler = HashingFileUploadHandler()
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', 10)
+        handler.receive_data_chunk(b'image ', 0)
+        handler.receive_data_chunk(b'content', 6)
+
+        upload = handler.file_complete(13)
+
+        self.assertEqual(
+            upload.content_hash,
+            hashlib.sha256(b'image content').hexdigest()
+        )
+        self.assertEqual(content_hash(upload), upload.content_hash)
+        upload.close()
+
+    def test_recipes_share_identical_images(self):
+        """Test recipes with the same image reference one file"""
+        first = self.sample_recipe()
+        second = self.sample_recipe(title='Karahi')
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.references(first.image.name), 2)
+
+    def test_references_follow_image_changes(self):
+        """Test replacing and deleting images updates reference counts"""
+        recipe = self.sample_recipe()
+        old_name = recipe.image.name
+        recipe = Recipe.objects.get(pk=recipe.pk)
+
+        recipe.image = SimpleUploadedFile('new.jpg', b'new content')
+        recipe.save()
+        self.assertEqual(self.references(old_name), 0)
+        self.assertEqual(self.references(recipe.image.name), 1)
+
+        recipe.title = 'Renamed'
+        recipe.save()
+        self.assertEqual(self.references(recipe.image.name), 1)
+
+        Recipe.objects.only('title').get(pk=recipe.pk).save()
+        self.assertEqual(self.references(recipe.image.name), 1)
+
+        Recipe.objects.filter(pk=recipe.pk).delete()
+        self.assertEqual(self.references(recipe.image.name), 0)
+        self.assertTrue(self.storage.exists(recipe.image.name))
+
+    def test_interleaved_image_changes(self):
+        """Test a save counts from the stored image, not the loaded one"""
+        recipe = self.sample_recipe()
+        old_name = recipe.image.name
+        first = Recipe.objects.get(pk=recipe.pk)
+        second = Recipe.objects.get(pk=recipe.pk)
+
+        first.image = SimpleUploadedFile('first.jpg', b'first content')
+        first.save()
+        second.image = SimpleUploadedFile('second.jpg', b'second content')
+        second.save()
+
+        self.assertEqual(self.references(old_name), 0)
+        self.assertEqual(self.references(first.image.name), 0)
+        self.assertEqual(self.references(second.image.name), 1)
@@ -0,0 +1,30 @@
+import asyncio
+
+from django.http import HttpResponse
+from django.urls import path
+
+
+class Probe:
+    """Number of requests inside ``slow_view``, and the most at once"""
+    active = 0
+    peak = 0
+
+    @classmethod
+    def reset(cls):
+        cls.active = cls.peak = 0
+
+
+async def slow_view(request):
+    Probe.active += 1
+    Probe.peak = max(Probe.peak, Probe.active)
+    try:
+        await asyncio.sleep(0.1)
+    finally:
+        Probe.active -= 1
+    return HttpResponse()
+
+
+# Under /api/ so the request is profiled too.
+urlpatterns = [
+    path('api/slow/', slow_view, name='slow'),
+]
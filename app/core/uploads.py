@@ -0,0 +1,45 @@
+import hashlib
+
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+from core.metrics import UPLOAD_SIZE
+
+
+def content_hash(file):
+    """Return the SHA-256 hex digest of a file's content.
+
+    Uploads that went through ``HashingFileUploadHandler`` already carry
+    their digest; anything else is read once in chunks.
+    """
+    digest = getattr(file, 'content_hash', None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        position = file.tell() if hasattr(file, 'tell') else None
+        for chunk in file.chunks():
+            hasher.update(chunk)
+        if position is not None:
+            file.seek(position)
+        digest = file.content_hash = hasher.hexdigest()
+    return digest
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """Stream uploads to a temporary file, hashing them on the way.
+
+    Every chunk goes straight to disk, so an upload never holds more than
+    one chunk in memory however large it is.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.content_hash = self.hasher.hexdigest()
+        UPLOAD_SIZE.observe(file_size)
+        return file
@@ -0,0 +1,217 @@
+import hmac
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, \
+    JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, \
+    patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+
+from core.health import check_database, last_database_check
+from core.metrics import registry
+from core.storage import is_content_addressed
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def _parse_range(header, size):
+    """Return ``(start, end)`` of a single byte range, inclusive.
+
+    Returns ``None`` for headers that should be ignored, such as multiple
+    ranges, and raises ``ValueError`` when the range is unsatisfiable.
+    """
+    match = RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        # An empty file has no last bytes to send.
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as media_file:
+        media_file.seek(start)
+        while length > 0:
+            chunk = media_file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _sendfile_response(name, path, content_type):
+    header = getattr(settings, 'MEDIA_SENDFILE_HEADER', '')
+    if not header:
+        return None
+    response = HttpResponse(content_type=content_type)
+    if header.lower() == 'x-accel-redirect':
+        prefix = getattr(
+            settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/'
+        )
+        response[header] = prefix + name
+    else:
+        response[header] = path
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve an uploaded file with conditional and range request support.
+
+    When MEDIA_SENDFILE_HEADER is set the body is left to the web server
+    (X-Sendfile or nginx X-Accel-Redirect) and the worker only checks the
+    file and sets the headers. Content addressed files never change, so
+    they are cached as immutable.
+    """
+    name = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = default_storage.path(name)
+        file_stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('File not found.')
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404('File not found.')
+
+    size = file_stat.st_size
+    last_modified = int(file_stat.st_mtime)
+    immutable = is_content_addressed(name)
+    if immutable:
+        # The name identifies the content, whichever server stores it.
+        etag = f'"{name}"'
+    else:
+        etag = f'"{file_stat.st_mtime_ns:x}-{size:x}"'
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        content_type, encoding = mimetypes.guess_type(full_path)
+        content_type = content_type or 'application/octet-stream'
+        response = _serve(request, name, full_path, size, content_type,
+                          etag, last_modified)
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['X-Content-Type-Options'] = 'nosniff'
+    if immutable:
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    else:
+        patch_cache_control(
+            response, public=True,
+            max_age=getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)
+        )
+    return response
+
+
+def _serve(request, name, path, size, content_type, etag, last_modified):
+    response = _sendfile_response(name, path, content_type)
+    if response is not None:
+        # The web server answers range requests itself.
+        return response
+
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and \
+            _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = _parse_range(request.META['HTTP_RANGE'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = str(size)
+        return response
+
+    if byte_range is None:
+        return FileResponse(open(path, 'rb'), content_type=content_type)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        _read_range(path, start, length), status=206,
+        content_type=content_type
+    )
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    return response
+
+
+@never_cache
+@require_safe
+def healthz(request):
+    """Report that the process is serving requests.
+
+    Never touches the database; the latest readiness result is included
+    for information only.
+    """
+    return JsonResponse({
+        'status': 'ok',
+        'database': last_database_check(),
+    })
+
+
+@never_cache
+@require_safe
+def readyz(request):
+    """Report whether the database answers, with its round trip time"""
+    database = check_database(
+        max_age=getattr(settings, 'HEALTH_CHECK_MAX_AGE', 1.0)
+    )
+    return JsonResponse(
+        {'status': 'ok' if database['ok'] else 'unavailable',
+         'database': database},
+        status=200 if database['ok'] else 503
+    )
+
+
+@never_cache
+@require_safe
+def metrics(request):
+    """Export the metrics of every worker in Prometheus text format"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        supplied = request.META.get('HTTP_AUTHORIZATION', '')
+        if not hmac.compare_digest(supplied, f'Bearer {token}'):
+            return HttpResponse(status=401)
+    return HttpResponse(
+        registry.export(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
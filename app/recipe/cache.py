@@ -0,0 +1,103 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.metrics import RESPONSE_CACHE
+
+VERSION_KEY = 'recipe:version:{user_id}'
+RESPONSE_KEY = 'recipe:response:{digest}'
+
+
+def get_user_version(user_id):
+    """Return the current cache version of a user's recipe data"""
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump_user_version(user_id):
+    # Versions are random rather than counters, so a version key that was
+    # evicted and recreated can never match responses cached before.
+    cache.set(VERSION_KEY.format(user_id=user_id), uuid.uuid4().hex, None)
+
+
+def invalidate_user_responses(user_id):
+    """Make every cached response of a user stale.
+
+    The version moves at once and again when the surrounding transaction
+    commits, so a read that raced the write can not stay cached under the
+    new version.
+    """
+    _bump_user_version(user_id)
+    transaction.on_commit(lambda: _bump_user_version(user_id))
+
+
+class CachedResponseMixin:
+    """Serve read actions from a per user, versioned response cache.
+
+    Responses are keyed by user, cache version, action, URL kwargs and query
+    string. The ETag is derived from the same key, so a matching
+    ``If-None-Match`` is answered with 304 from the version alone.
+    """
+    response_cache_timeout = getattr(
+        settings, 'RECIPE_RESPONSE_CACHE_TIMEOUT', 300
+    )
+
+    def get_response_cache_digest(self, request, version):
+        """Return a digest identifying this request's representation"""
+        params = sorted(request.query_params.lists())
+        parts = [
+            str(request.user.pk),
+            version,
+            self.basename,
+            self.action,
+            repr(sorted(self.kwargs.items())),
+            repr(params),
+            request.get_host(),
+            request.accepted_renderer.format,
+        ]
+        return hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """Return the cached response for ``handler`` or compute it"""
+        version = get_user_version(request.user.pk)
+        digest = self.get_response_cache_digest(request, version)
+        etag = f'"{digest}"'
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            if etag in etags or '*' in etags:
+                RESPONSE_CACHE.inc(result='not_modified')
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                return self._finish_cached_response(response, etag)
+
+        key = RESPONSE_KEY.format(digest=digest)
+        data = cache.get(key)
+        if data is None:
+            RESPONSE_CACHE.inc(result='miss')
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(key, response.data, self.response_cache_timeout)
+        else:
+            RESPONSE_CACHE.inc(result='hit')
+            response = Response(data)
+        return self._finish_cached_response(response, etag)
+
+    def _finish_cached_response(self, response, etag):
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
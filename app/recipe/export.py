@@ -0,0 +1,75 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from recipe.serializers import RecipeDetailSerializer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Content negotiation target for newline delimited JSON exports.
+
+    Exports are streamed by the view, so this renderer only exists to let
+    clients ask for the format with ``Accept`` or ``?format=ndjson``.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data).encode(self.charset)
+
+
+def dumps(record):
+    """Encode a record the same way the JSON API responses are encoded"""
+    return json.dumps(
+        record,
+        cls=JSONEncoder,
+        ensure_ascii=False,
+        separators=(',', ':')
+    )
+
+
+def iter_chunks(queryset, chunk_size):
+    """Yield lists of objects walking the primary key in fixed size chunks.
+
+    Each chunk is a separate keyset query, so prefetches on the queryset run
+    once per chunk and only one chunk is held in memory at a time.
+    """
+    queryset = queryset.order_by('id')
+    last_id = None
+    while True:
+        page = queryset
+        if last_id is not None:
+            page = page.filter(id__gt=last_id)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1].id
+
+
+def iter_records(queryset, chunk_size):
+    """Yield serialized recipes with their tags and ingredients resolved"""
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield from RecipeDetailSerializer(chunk, many=True).data
+
+
+def stream_ndjson(records):
+    """Yield one JSON document per line"""
+    for record in records:
+        yield dumps(record) + '\n'
+
+
+def stream_json(records):
+    """Yield a single JSON array without building it in memory"""
+    yield '['
+    separator = ''
+    for record in records:
+        yield separator + dumps(record)
+        separator = ','
+    yield ']'
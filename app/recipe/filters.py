@@ -0,0 +1,61 @@
+from django.db.models import Count, Exists, OuterRef
+from rest_framework import serializers
+
+from core.models import Recipe
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_CHOICES = (MATCH_ANY, MATCH_ALL)
+
+
+def parse_ids(value, param):
+    """Return the distinct ids in a comma separated query parameter"""
+    try:
+        ids = {int(str_id) for str_id in value.split(',')}
+    except ValueError:
+        raise serializers.ValidationError(
+            {param: ['Expected a comma separated list of ids.']}
+        )
+    return sorted(ids)
+
+
+def parse_match(value):
+    """Return the match mode of a query, ANY when not given"""
+    if value is None:
+        return MATCH_ANY
+    if value not in MATCH_CHOICES:
+        raise serializers.ValidationError(
+            {'match': [f'Expected one of: {", ".join(MATCH_CHOICES)}.']}
+        )
+    return value
+
+
+def filter_by_related(queryset, relation, ids, match=MATCH_ANY):
+    """Keep recipes related to any or all of ``ids`` through ``relation``.
+
+    Both modes are a semi-join on the through table, so a recipe is
+    returned once however many of the ids it carries, and the recipe rows
+    never need a DISTINCT. ALL groups the through rows of the requested ids
+    by recipe and keeps the recipes that have every one of them.
+    """
+    field = Recipe._meta.get_field(relation)
+    through = field.remote_field.through
+    target = f'{field.m2m_reverse_field_name()}_id'
+    matches = through.objects.filter(**{f'{target}__in': ids})
+    if match == MATCH_ALL:
+        # (recipe, target) pairs are unique, so the count is the number of
+        # requested ids the recipe carries.
+        matches = matches.values('recipe_id').annotate(
+            matched=Count(target)
+        ).filter(matched=len(ids))
+    return queryset.filter(id__in=matches.values('recipe_id'))
+
+
+def filter_assigned(queryset):
+    """Keep tags or ingredients that are assigned to at least one recipe"""
+    relation = queryset.model._meta.get_field('recipe')
+    through = relation.through
+    target = relation.field.m2m_reverse_field_name()
+    return queryset.filter(
+        Exists(through.objects.filter(**{target: OuterRef('pk')}))
+    )
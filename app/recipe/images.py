@@ -0,0 +1,146 @@
+import atexit
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+from core.models import Recipe
+from recipe.cache import invalidate_user_responses
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = getattr(settings, 'RECIPE_IMAGE_RENDITIONS', {
+    'thumb': (160, 160),
+    'medium': (640, 640),
+    'full': (1600, 1600),
+})
+RENDITION_DIR = 'uploads/recipe/renditions'
+
+# (extension, Pillow format, save options). Images are saved without their
+# EXIF, XMP and ICC data, which strips camera metadata from the renditions.
+FORMATS = (
+    ('jpeg', 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+)
+EXTENSIONS = tuple(extension for extension, _, _ in FORMATS)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the thread pool that processes uploaded images"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'RECIPE_IMAGE_WORKERS', 2),
+                thread_name_prefix='recipe-images'
+            )
+            atexit.register(shutdown_executor)
+        return _executor
+
+
+def shutdown_executor():
+    """Finish the queued image jobs before the process exits.
+
+    Jobs of a process that is killed are lost all the same; the
+    generate_renditions command catches up on them.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def output_formats():
+    """Return the formats this Pillow build can write"""
+    return [
+        output for output in FORMATS
+        if output[0] != 'webp' or features.check('webp')
+    ]
+
+
+def rendition_name(image_name, rendition, extension):
+    """Return the storage name of one rendition of an image"""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{RENDITION_DIR}/{stem}/{rendition}.{extension}'
+
+
+def _load_rgb(storage, image_name):
+    with storage.open(image_name) as image_file:
+        with Image.open(image_file) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                return background
+            return image.convert('RGB')
+
+
+def create_renditions(storage, image_name):
+    """Write every rendition of an image and return their descriptions.
+
+    Images are never upscaled, so a small upload yields renditions of its
+    own size that are still re-encoded without metadata.
+    """
+    image = _load_rgb(storage, image_name)
+    renditions = {}
+    for rendition, size in RENDITIONS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        entry = {'width': resized.width, 'height': resized.height}
+        for extension, image_format, options in output_formats():
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, **options)
+            entry[extension] = storage.save(
+                rendition_name(image_name, rendition, extension),
+                ContentFile(buffer.getvalue())
+            )
+        renditions[rendition] = entry
+    return renditions
+
+
+def process_recipe_image(recipe_id, user_id, image_name):
+    """Create the renditions of a recipe image and store them.
+
+    The renditions are only recorded while the recipe still has the same
+    image. Their names derive from the image content, so recipes sharing an
+    image share its renditions, and unused ones are left to the storage
+    garbage collection.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    renditions = create_renditions(storage, image_name)
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=image_name
+    ).update(renditions=renditions)
+    if updated:
+        invalidate_user_responses(user_id)
+    return renditions if updated else None
+
+
+def _process_in_worker(recipe_id, user_id, image_name):
+    try:
+        process_recipe_image(recipe_id, user_id, image_name)
+    except Exception:
+        logger.exception('Processing image %s failed', image_name)
+    finally:
+        # Worker threads get their own connection; don't leave it open
+        # between jobs.
+        connection.close()
+
+
+def schedule_renditions(recipe):
+    """Process a recipe's image in the background once it is committed"""
+    args = (recipe.pk, recipe.user_id, recipe.image.name)
+    transaction.on_commit(
+        lambda: get_executor().submit(_process_in_worker, *args)
+    )
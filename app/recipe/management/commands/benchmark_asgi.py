@@ -0,0 +1,175 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from rest_framework.authtoken.models import Token
+
+from core.benchmark import DataGenerator, get_host
+from recipe.cache import invalidate_user_responses
+
+MODES = ('wsgi', 'asgi')
+PATH = '/api/recipe/recipes/'
+
+
+class PeakThreads:
+    """Track the highest number of live threads while active"""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _watch(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, threading.active_count())
+
+
+class Command(BaseCommand):
+    """Django command to compare the WSGI and ASGI recipe read paths.
+
+    Requests are driven in process against the real handlers: WSGI with
+    one thread per concurrent connection, ASGI with one coroutine per
+    connection. Both serve the same sync views. The benchmark user and
+    data are deleted afterwards.
+    """
+    help = 'Benchmark recipe list throughput over WSGI and ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument(
+            '--mode', choices=MODES, action='append',
+            help='Mode to run, may be repeated. Defaults to all.'
+        )
+
+    def handle(self, *args, **options):
+        user, token = self.create_data(options['recipes'])
+        try:
+            for mode in options['mode'] or MODES:
+                self.run_mode(mode, user, token, options)
+        finally:
+            user.delete()
+
+    def create_data(self, count):
+        user = DataGenerator(
+            tags=1, ingredients=0, tags_per_recipe=(1, 1),
+            ingredients_per_recipe=(0, 0)
+        ).create_user(count)
+        token = Token.objects.create(user=user)
+        return user, token.key
+
+    def run_mode(self, mode, user, token, options):
+        # Start from a cold response cache, so every distinct page size is
+        # rendered from the database once.
+        invalidate_user_responses(user.pk)
+        paths = [
+            f'{PATH}?page_size={size % options["page_size"] + 1}'
+            for size in range(options['requests'])
+        ]
+        tracemalloc.start()
+        started = time.perf_counter()
+        with PeakThreads() as threads:
+            if mode == 'wsgi':
+                statuses = self.run_wsgi(paths, token, options)
+            else:
+                statuses = asyncio.run(self.run_asgi(paths, token, options))
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        failed = sum(1 for status in statuses if status != 200)
+        self.stdout.write(
+            f'{mode:<4} {len(paths) / elapsed:8.1f} req/s  '
+            f'peak heap {peak / options["concurrency"] / 1024:8.1f} KiB '
+            f'per connection  threads {threads.peak:4d}  errors {failed}'
+        )
+
+    def run_wsgi(self, paths, token, options):
+        handler = WSGIHandler()
+        host = get_host()
+
+        def request(path):
+            url = urlsplit(path)
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': url.path,
+                'QUERY_STRING': url.query,
+                'SERVER_NAME': host,
+                'SERVER_PORT': '80',
+                'HTTP_HOST': host,
+                'HTTP_AUTHORIZATION': f'Token {token}',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.input': BytesIO(),
+                'wsgi.errors': BytesIO(),
+                'wsgi.url_scheme': 'http',
+                'wsgi.version': (1, 0),
+                'wsgi.multithread': True,
+                'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            statuses = []
+            body = handler(
+                environ, lambda status, headers: statuses.append(status)
+            )
+            b''.join(body)
+            body.close()
+            return int(statuses[0].split()[0])
+
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            return list(executor.map(request, paths))
+
+    async def run_asgi(self, paths, token, options):
+        handler = ASGIHandler()
+        host = get_host().encode()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def request(path):
+            url = urlsplit(path)
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': url.path,
+                'raw_path': url.path.encode(),
+                'query_string': url.query.encode(),
+                'root_path': '',
+                'headers': [
+                    (b'host', host),
+                    (b'authorization', f'Token {token}'.encode()),
+                ],
+                'server': (host.decode(), 80),
+                'client': ('127.0.0.1', 0),
+            }
+            statuses = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            async with semaphore:
+                await handler(scope, receive, send)
+            return statuses[0]
+
+        return await asyncio.gather(*(request(path) for path in paths))
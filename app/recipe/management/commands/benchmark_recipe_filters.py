@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+
+from core.benchmark import DataGenerator, format_timings, measure, \
+    rolled_back
+from core.models import Recipe, Tag
+from recipe.filters import MATCH_ALL, MATCH_ANY, filter_by_related
+
+
+class Command(BaseCommand):
+    """Django command to time the recipe tag filters on generated data.
+
+    The data is created in a transaction that is rolled back at the end,
+    so the command can be pointed at any database.
+    """
+    help = 'Benchmark filtering recipes by tags with match=any and all.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--min-tags', type=int, default=10)
+        parser.add_argument('--max-tags', type=int, default=50)
+        parser.add_argument('--filter-size', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run(options)
+
+    def run(self, options):
+        generator = DataGenerator(
+            seed=options['seed'],
+            tags=options['tags'],
+            ingredients=0,
+            tags_per_recipe=(options['min_tags'], options['max_tags']),
+            ingredients_per_recipe=(0, 0),
+        )
+        user = generator.create_user(options['recipes'])
+        tag_ids = list(
+            Tag.objects.filter(user=user).values_list('id', flat=True)
+        )
+        filter_ids = generator.rng.sample(tag_ids, options['filter_size'])
+        recipes = Recipe.objects.filter(user=user)
+
+        self.stdout.write(
+            f'{options["recipes"]} recipes with {options["min_tags"]}-'
+            f'{options["max_tags"]} of {options["tags"]} tags, '
+            f'filtering on {len(filter_ids)} tags'
+        )
+        cases = {
+            'join (before)': recipes.filter(tags__id__in=filter_ids),
+            'match=any': filter_by_related(
+                recipes, 'tags', filter_ids, MATCH_ANY
+            ),
+            'match=all': filter_by_related(
+                recipes, 'tags', filter_ids, MATCH_ALL
+            ),
+        }
+        for name, queryset in cases.items():
+            ids = list(queryset.values_list('id', flat=True))
+            timings = measure(
+                lambda: list(queryset.values_list('id', flat=True)),
+                repeat=options['repeat']
+            )
+            self.stdout.write(
+                f'{format_timings(name, timings)}  '
+                f'rows {len(ids)} (distinct {len(set(ids))})'
+            )
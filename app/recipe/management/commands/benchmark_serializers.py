@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmark import DataGenerator, format_timings, measure, \
+    rolled_back
+from core.models import Recipe
+from core.renderers import FastJSONRenderer
+from recipe.rows import RowSerializer, ordered_prefetch
+from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
+
+
+class Command(BaseCommand):
+    """Django command to compare the serializer and row read paths.
+
+    Each case loads recipes from the database and renders them to JSON,
+    once through the model serializers and the standard JSON renderer and
+    once through the row serializer and the orjson renderer. The outputs
+    must be identical. The data is rolled back at the end.
+    """
+    help = 'Benchmark rendering recipe lists with and without the row path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, action='append',
+            help='Recipes per response, may be repeated. '
+                 'Defaults to 1000 and 10000.'
+        )
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run(options)
+
+    def run(self, options):
+        sizes = options['rows'] or [1000, 10000]
+        tags = options['tags_per_recipe']
+        ingredients = options['ingredients_per_recipe']
+        user = DataGenerator(
+            seed=options['seed'],
+            tags=50,
+            ingredients=100,
+            tags_per_recipe=(tags, tags),
+            ingredients_per_recipe=(ingredients, ingredients),
+        ).create_user(max(sizes))
+        recipes = Recipe.objects.filter(user=user).order_by('id')
+
+        for size in sizes:
+            for name, serializer_class in (
+                    ('list', RecipeSerializer),
+                    ('detail', RecipeDetailSerializer)):
+                page = recipes[:size]
+                rows = RowSerializer.compile(serializer_class())
+
+                def slow():
+                    instances = list(page.prefetch_related(
+                        *ordered_prefetch(Recipe, ('tags', 'ingredients'))
+                    ))
+                    return JSONRenderer().render(
+                        serializer_class(instances, many=True).data
+                    )
+
+                def fast():
+                    return FastJSONRenderer().render(
+                        rows.serialize(rows.queryset(page))
+                    )
+
+                if slow() != fast():
+                    raise CommandError(
+                        f'{name} output differs between the paths.'
+                    )
+                before = measure(slow, repeat=options['repeat'])
+                after = measure(fast, repeat=options['repeat'])
+                self.stdout.write(format_timings(
+                    f'{name} {size} serializer', before
+                ))
+                self.stdout.write(format_timings(
+                    f'{name} {size} rows', after
+                ))
+                self.stdout.write(
+                    f'{name} {size} speedup '
+                    f'{before["median"] / after["median"]:.1f}x'
+                )
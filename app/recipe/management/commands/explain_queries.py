@@ -0,0 +1,79 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipe.views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+# Full table scans in SQLite and PostgreSQL plans
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?\w+$|\bSeq Scan on ', re.M)
+
+# (name, viewset, action, query parameters, indexes the plan must use).
+# The (user, name) unique constraints are only checked through FULL_SCAN,
+# as SQLite names their indexes itself.
+CASES = (
+    ('tag list', TagViewSet, 'list', {}, []),
+    ('tag list assigned_only', TagViewSet, 'list', {'assigned_only': 1},
+     ['core_recipe_tags_tag_id_recipe_idx']),
+    ('ingredient list', IngredientViewSet, 'list', {}, []),
+    ('ingredient list assigned_only', IngredientViewSet, 'list',
+     {'assigned_only': 1},
+     ['core_recipe_ingredients_ingredient_id_recipe_idx']),
+    ('recipe list', RecipeViewSet, 'list', {}, ['core_recipe_user_id_idx']),
+    ('recipe list tags any', RecipeViewSet, 'list',
+     {'tags': '1,2,3', 'match': 'any'},
+     ['core_recipe_user_id_idx', 'core_recipe_tags_tag_id_recipe_idx']),
+    ('recipe list tags all', RecipeViewSet, 'list',
+     {'tags': '1,2,3', 'match': 'all'},
+     ['core_recipe_user_id_idx', 'core_recipe_tags_tag_id_recipe_idx']),
+    ('recipe list ingredients all', RecipeViewSet, 'list',
+     {'ingredients': '1,2,3', 'match': 'all'},
+     ['core_recipe_user_id_idx',
+      'core_recipe_ingredients_ingredient_id_recipe_idx']),
+)
+
+
+def get_queryset(viewset, action, params, user):
+    """Return the queryset ``viewset`` runs for ``action`` and ``params``"""
+    request = Request(APIRequestFactory().get('/', params))
+    request.user = user
+    view = viewset(request=request, action=action, kwargs={},
+                   format_kwarg=None)
+    return view.get_queryset()
+
+
+class Command(BaseCommand):
+    """Django command to print the query plans of the API endpoints.
+
+    Plans come from the database the command runs against, so run it on
+    production sized data: planners skip indexes on near empty tables.
+    """
+    help = 'Show the EXPLAIN output of the queries the API endpoints run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, default=1)
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Fail when a plan scans a table or misses an expected index.'
+        )
+
+    def handle(self, *args, **options):
+        user = get_user_model()(pk=options['user_id'])
+        failures = []
+        for name, viewset, action, params, indexes in CASES:
+            queryset = get_queryset(viewset, action, params, user)
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            missing = [index for index in indexes if index not in plan]
+            missing.extend(FULL_SCAN.findall(plan))
+            if missing:
+                failures.append(f'{name}: {", ".join(missing)}')
+
+        if options['check'] and failures:
+            raise CommandError(
+                'Plans scanning tables or missing indexes:\n' +
+                '\n'.join(failures)
+            )
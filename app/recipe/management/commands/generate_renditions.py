@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe import images
+
+
+class Command(BaseCommand):
+    """Django command to create the renditions of recipe images.
+
+    Uploads are processed in an in-process pool, so jobs queued or running
+    when a worker stops are lost and their recipes keep no renditions.
+    ``--missing`` processes only those recipes, which makes the command
+    safe to run after every deploy.
+    """
+    help = 'Create the resized renditions of recipe images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Only process recipes whose image has no renditions.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).order_by('pk')
+        if options['missing']:
+            recipes = recipes.filter(renditions={})
+        done = failed = 0
+        rows = recipes.values_list('pk', 'user_id', 'image').iterator()
+        for recipe_id, user_id, image_name in rows:
+            try:
+                images.process_recipe_image(recipe_id, user_id, image_name)
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'{image_name}: {exc}')
+            else:
+                done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Created the renditions of {done} recipes, {failed} failed.'
+        ))
@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import stats
+
+
+class Command(BaseCommand):
+    """Django command to recompute the recipe statistics of users.
+
+    The statistics are kept up to date as recipes change, so this is only
+    needed after changing RECIPE_STATS_PRICE_BOUNDS, after writing recipes
+    around the application, or to fill them in for every user at once
+    instead of on first read.
+    """
+    help = 'Rebuild the per user recipe statistics from the recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email', action='append',
+            help='Rebuild only this user, may be repeated.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=stats.REBUILD_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        if options['email']:
+            users = users.filter(email__in=options['email'])
+            missing = set(options['email']).difference(
+                users.values_list('email', flat=True)
+            )
+            if missing:
+                raise CommandError(
+                    f'Unknown users: {", ".join(sorted(missing))}'
+                )
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        user_ids = list(users.values_list('pk', flat=True))
+        stats.rebuild_stats(user_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the recipe statistics of {len(user_ids)} users.'
+        ))
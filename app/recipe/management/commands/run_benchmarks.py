@@ -0,0 +1,170 @@
+import json
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.benchmark import format_timings, get_host, measure, \
+    rolled_back
+from core.models import Ingredient, Recipe, Tag
+from recipe.cache import invalidate_user_responses
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the recipe endpoints end to end.
+
+    Requests go through the full middleware, authentication and serializer
+    stack as the user with the most recipes, normally one created by
+    ``seed_data``. Everything runs in a transaction that is rolled back, so
+    created recipes disappear again; uploaded image files stay behind for
+    ``gc_images`` to collect.
+    """
+    help = 'Benchmark the recipe API and report latency, throughput and ' \
+        'query counts as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='User to run the requests as.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--output', help='Write the JSON report here.')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['email'])
+        with rolled_back():
+            report = self.run(user, options)
+
+        for name, result in report['endpoints'].items():
+            self.stderr.write(
+                f'{format_timings(name, result)}  '
+                f'{result["throughput"]:8.1f} req/s  '
+                f'{result["queries"]:3d} queries'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+        else:
+            json.dump(report, self.stdout, indent=2)
+            self.stdout.write('')
+
+    def get_user(self, email):
+        users = get_user_model().objects.all()
+        if email:
+            user = users.filter(email=email).first()
+        else:
+            user = users.annotate(
+                recipe_count=Count('recipe')
+            ).order_by('-recipe_count', 'id').first()
+        if user is None:
+            raise CommandError('No user to benchmark, run seed_data first.')
+        return user
+
+    def run(self, user, options):
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient(SERVER_NAME=get_host())
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        recipes = Recipe.objects.filter(user=user)
+        recipe_count = recipes.count()
+        recipe = recipes.order_by('id').first()
+        if recipe is None:
+            raise CommandError(f'{user.email} has no recipes.')
+        tags = list(Tag.objects.filter(user=user).annotate(
+            uses=Count('recipe')
+        ).order_by('-uses', 'id').values_list('id', flat=True)[:2])
+        ingredients = list(Ingredient.objects.filter(
+            user=user
+        ).order_by('id').values_list('id', flat=True)[:5])
+
+        list_url = reverse('recipe:recipe-list')
+        detail_url = reverse('recipe:recipe-detail', args=[recipe.pk])
+        upload_url = reverse('recipe:recipe-upload-image', args=[recipe.pk])
+        tag_filter = ','.join(map(str, tags))
+        payload = {
+            'title': 'Benchmark recipe',
+            'time_minutes': 30,
+            'price': '7.50',
+            'tags': tags,
+            'ingredients': ingredients,
+        }
+        images = ImageFactory()
+
+        def cold():
+            invalidate_user_responses(user.pk)
+
+        cases = (
+            ('list', lambda: client.get(list_url), 200, cold),
+            ('list (cached)', lambda: client.get(list_url), 200, None),
+            ('list page', lambda: client.get(
+                list_url, {'page_size': options['page_size']}
+            ), 200, cold),
+            ('filter any', lambda: client.get(
+                list_url, {'tags': tag_filter}
+            ), 200, cold),
+            ('filter all', lambda: client.get(
+                list_url, {'tags': tag_filter, 'match': 'all'}
+            ), 200, cold),
+            ('retrieve', lambda: client.get(detail_url), 200, cold),
+            ('create', lambda: client.post(
+                list_url, payload, format='json'
+            ), 201, None),
+            ('upload_image', lambda: client.post(
+                upload_url, {'image': images.current}, format='multipart'
+            ), 200, images.next),
+        )
+
+        endpoints = {}
+        for name, request, expected, before in cases:
+            self.check_status(name, request, expected, before)
+            timings = measure(
+                request, repeat=options['repeat'],
+                warmup=options['warmup'], before=before
+            )
+            if before is not None:
+                before()
+            with CaptureQueriesContext(connection) as queries:
+                request()
+            timings['throughput'] = 1000 / timings['mean']
+            timings['queries'] = len(queries)
+            endpoints[name] = timings
+
+        return {
+            'database': connection.vendor,
+            'user': user.email,
+            'recipes': recipe_count,
+            'repeat': options['repeat'],
+            'endpoints': endpoints,
+        }
+
+    def check_status(self, name, request, expected, before):
+        if before is not None:
+            before()
+        response = request()
+        if response.status_code != expected:
+            raise CommandError(
+                f'{name} returned {response.status_code}, '
+                f'expected {expected}.'
+            )
+
+
+class ImageFactory:
+    """Prepare a distinct JPEG upload per request, outside the timing"""
+
+    def __init__(self):
+        self.count = 0
+        self.next()
+
+    def next(self):
+        self.count += 1
+        color = (self.count % 256, self.count // 256 % 256, 128)
+        self.current = BytesIO()
+        Image.new('RGB', (800, 600), color).save(self.current, 'JPEG')
+        self.current.name = f'benchmark-{self.count}.jpg'
+        self.current.seek(0)
@@ -0,0 +1,96 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.benchmark import DataGenerator
+from recipe.stats import rebuild_stats
+
+
+def parse_range(value):
+    """Parse ``a-b`` or ``a`` into an inclusive ``(a, b)`` tuple"""
+    try:
+        low, _, high = value.partition('-')
+        low, high = int(low), int(high or low)
+    except ValueError:
+        raise CommandError(f'Expected a range like 2-8, got {value!r}.')
+    if not 0 <= low <= high:
+        raise CommandError(f'Expected a range like 2-8, got {value!r}.')
+    return low, high
+
+
+class Command(BaseCommand):
+    """Django command to generate large amounts of realistic recipe data.
+
+    Users come in batches; every batch is written with a handful of bulk
+    INSERTs in one transaction, so millions of rows take minutes. Recipe
+    counts per user follow a long tailed distribution and tags and
+    ingredients are picked with Zipf like popularity, so a few are on most
+    recipes, as in real data.
+    """
+    help = 'Seed the database with generated users, recipes, tags and ' \
+        'ingredients.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument(
+            '--recipes', type=int, default=100,
+            help='Average number of recipes per user.'
+        )
+        parser.add_argument('--tags', type=int, default=30,
+                            help='Tags per user.')
+        parser.add_argument('--ingredients', type=int, default=60,
+                            help='Ingredients per user.')
+        parser.add_argument('--tags-per-recipe', default='1-6')
+        parser.add_argument('--ingredients-per-recipe', default='3-12')
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--users-per-batch', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.generator = DataGenerator(
+            seed=options['seed'],
+            tags=options['tags'],
+            ingredients=options['ingredients'],
+            tags_per_recipe=parse_range(options['tags_per_recipe']),
+            ingredients_per_recipe=parse_range(
+                options['ingredients_per_recipe']
+            ),
+            password=options['password'],
+            batch_size=options['batch_size'],
+        )
+        totals = self.generator.totals
+
+        started = time.perf_counter()
+        first = get_user_model().objects.filter(
+            email__startswith=f'{options["prefix"]}-'
+        ).count()
+        step = options['users_per_batch']
+        for start in range(first, first + options['users'], step):
+            count = min(step, first + options['users'] - start)
+            with transaction.atomic():
+                self.seed_users(options, start, count)
+            self.stdout.write(
+                f'{totals["users"]} users, {totals["recipes"]} recipes'
+            )
+
+        elapsed = time.perf_counter() - started
+        rows = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {rows} rows in {elapsed:.1f}s '
+            f'({rows / elapsed:.0f} rows/s): ' +
+            ', '.join(f'{count} {name}' for name, count in totals.items())
+        ))
+
+    def seed_users(self, options, start, count):
+        emails = [
+            f'{options["prefix"]}-{number}@example.com'
+            for number in range(start, start + count)
+        ]
+        user_ids = self.generator.create_users(emails, [
+            self.generator.recipe_count(options['recipes']) for _ in emails
+        ])
+        rebuild_stats(user_ids)
@@ -0,0 +1,34 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    """Keyset pagination that only kicks in when a page size is requested.
+
+    Without a ``page_size`` query parameter the endpoint keeps returning a
+    plain list, so existing clients are unaffected. Cursors encode the last
+    seen value of the first ordering column, which keeps every page an
+    index range scan no matter how deep into the results it is.
+    """
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class RecipeCursorPagination(OptionalCursorPagination):
+    """Paginate recipes on their primary key"""
+    ordering = 'id'
+
+
+class RecipeSearchCursorPagination(OptionalCursorPagination):
+    """Paginate search results by relevance, then primary key.
+
+    ``search_key`` is unique and ordered like (rank, id), see
+    recipe.search, so the cursor never has to skip ties by offset.
+    """
+    ordering = '-search_key'
+
+
+class RecipeAttrCursorPagination(OptionalCursorPagination):
+    """Paginate tags and ingredients in the order the API lists them"""
+    # Names are unique per user, so the name alone is a stable cursor.
+    ordering = '-name'
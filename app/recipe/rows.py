@@ -0,0 +1,239 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import fields as drf_fields, relations, serializers
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+
+from core.profiling import ProfiledSerializerMixin, timed
+
+ROW_BATCH_SIZE = 1000
+
+# Fields whose representation depends on nothing but the column value.
+PLAIN_FIELDS = (
+    drf_fields.BooleanField, drf_fields.CharField, drf_fields.DateField,
+    drf_fields.DateTimeField, drf_fields.DecimalField, drf_fields.EmailField,
+    drf_fields.FloatField, drf_fields.IntegerField, drf_fields.SlugField,
+    drf_fields.URLField, drf_fields.UUIDField,
+)
+
+
+def _column_field(field):
+    """Whether ``field`` converts a column value without the instance.
+
+    Besides the plain fields, custom fields opt in with ``plain_column``.
+    """
+    return type(field) in PLAIN_FIELDS or getattr(field, 'plain_column', False)
+
+
+def ordered_prefetch(model, names):
+    """Return prefetches of ``names`` ordering the related rows by key.
+
+    The row path reads relations in the same order, so both produce
+    identical output.
+    """
+    opts = model._meta
+    return [
+        Prefetch(name, queryset=opts.get_field(
+            name
+        ).related_model._default_manager.order_by('pk'))
+        for name in names
+    ]
+
+
+def _stock(cls, base, allowed=()):
+    """Whether ``cls`` converts instances exactly like ``base`` does"""
+    return all(
+        klass in allowed or 'to_representation' not in vars(klass)
+        for klass in cls.__mro__[:cls.__mro__.index(base)]
+    )
+
+
+def _plain_columns(serializer):
+    """Return ``(name, source, field)`` for a serializer of plain fields"""
+    if not _stock(type(serializer), serializers.Serializer,
+                  (ProfiledSerializerMixin,)):
+        return None
+    columns = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if not _column_field(field) or len(field.source_attrs) != 1:
+            return None
+        columns.append((name, field.source, field))
+    return columns
+
+
+class RowSerializer:
+    """Serialize recipes from ``values()`` rows instead of model instances.
+
+    Compiled from a regular serializer whose fields still convert every
+    value, so the output is the same, without building model instances or
+    walking each serializer field per object. Relations come from one
+    query on the through table per batch of rows. Only serializers of
+    plain model fields, primary key relations and nested serializers of
+    plain fields compile; ``compile`` returns None for anything else.
+    """
+
+    def __init__(self, model, layout):
+        self.model = model
+        self.layout = layout
+
+    @classmethod
+    def compile(cls, serializer):
+        if not _stock(type(serializer), serializers.Serializer,
+                      (ProfiledSerializerMixin,)):
+            return None
+        model = serializer.Meta.model
+        opts = model._meta
+        layout = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if len(field.source_attrs) != 1:
+                return None
+            try:
+                model_field = opts.get_field(field.source)
+            except FieldDoesNotExist:
+                return None
+            if model_field.many_to_many and model_field.concrete:
+                spec = cls._relation_spec(field, model_field)
+                if spec is None:
+                    return None
+                layout.append((name, 'relation', spec))
+            elif _column_field(field) and model_field.concrete \
+                    and not model_field.is_relation:
+                layout.append((name, 'column', (field.source, field)))
+            else:
+                return None
+        return cls(model, layout)
+
+    @staticmethod
+    def _relation_spec(field, model_field):
+        through = model_field.remote_field.through
+        source = f'{model_field.m2m_field_name()}_id'
+        target = model_field.m2m_reverse_field_name()
+        if isinstance(field, relations.ManyRelatedField):
+            child = field.child_relation
+            if not isinstance(child, relations.PrimaryKeyRelatedField) or \
+                    child.pk_field is not None or not _stock(
+                        type(child), relations.PrimaryKeyRelatedField):
+                return None
+            return through, source, target, None
+        if isinstance(field, serializers.ListSerializer) and _stock(
+                type(field), serializers.ListSerializer,
+                (ProfiledSerializerMixin,)):
+            columns = _plain_columns(field.child)
+            if columns is None:
+                return None
+            return through, source, target, columns
+        return None
+
+    def columns(self):
+        """Return the model columns the rows need"""
+        columns = [self.model._meta.pk.attname]
+        for _, kind, spec in self.layout:
+            if kind == 'column' and spec[0] not in columns:
+                columns.append(spec[0])
+        return columns
+
+    def queryset(self, queryset, extra=()):
+        """Return ``queryset`` as rows carrying the needed columns"""
+        columns = self.columns()
+        columns.extend(name for name in extra if name not in columns)
+        return queryset.prefetch_related(None).values(*columns)
+
+    def serialize(self, rows):
+        """Return the representation of every row in ``rows``"""
+        rows = list(rows)
+        pk = self.model._meta.pk.attname
+        related = {
+            name: self._load_relation(spec, [row[pk] for row in rows])
+            for name, kind, spec in self.layout if kind == 'relation'
+        }
+        data = []
+        for row in rows:
+            item = {}
+            for name, kind, spec in self.layout:
+                if kind == 'column':
+                    value = row[spec[0]]
+                    item[name] = None if value is None else \
+                        spec[1].to_representation(value)
+                else:
+                    item[name] = related[name].get(row[pk], [])
+            data.append(item)
+        return data
+
+    def _load_relation(self, spec, ids):
+        through, source, target, columns = spec
+        values = [f'{target}_id']
+        if columns is not None:
+            values = [f'{target}__{column}' for _, column, _ in columns]
+        grouped = {}
+        for start in range(0, len(ids), ROW_BATCH_SIZE):
+            rows = through.objects.filter(**{
+                f'{source}__in': ids[start:start + ROW_BATCH_SIZE]
+            }).order_by(source, f'{target}_id').values_list(source, *values)
+            for row in rows:
+                if columns is None:
+                    value = row[1]
+                else:
+                    value = {
+                        name: None if item is None else
+                        field.to_representation(item)
+                        for (name, _, field), item in zip(columns, row[1:])
+                    }
+                grouped.setdefault(row[0], []).append(value)
+        return grouped
+
+
+def _paginator_ordering(view):
+    ordering = getattr(view.paginator, 'ordering', None) or ()
+    if isinstance(ordering, str):
+        ordering = (ordering,)
+    return [name.lstrip('-') for name in ordering]
+
+
+class RowListMixin:
+    """List from ``values()`` rows when the serializer compiles"""
+
+    def get_row_serializer(self):
+        return RowSerializer.compile(self.get_serializer())
+
+    def list(self, request, *args, **kwargs):
+        rows = self.get_row_serializer()
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+        queryset = rows.queryset(
+            self.filter_queryset(self.get_queryset()),
+            _paginator_ordering(self)
+        )
+        page = self.paginate_queryset(queryset)
+        with timed('serialize'):
+            data = rows.serialize(queryset if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+class RowRetrieveMixin(RowListMixin):
+    """Retrieve from a ``values()`` row when the serializer compiles.
+
+    Object level permissions need the model instance, so views that
+    define any keep the regular path.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        rows = self.get_row_serializer()
+        if rows is None or any(
+                type(permission).has_object_permission is not
+                BasePermission.has_object_permission
+                for permission in self.get_permissions()):
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            rows.queryset(self.filter_queryset(self.get_queryset())),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        with timed('serialize'):
+            return Response(rows.serialize([row])[0])
@@ -0,0 +1,104 @@
+from collections import defaultdict
+from functools import reduce
+from operator import add
+
+from django.db import connection
+from django.db.models import BigIntegerField, BooleanField, Case, \
+    ExpressionWrapper, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from core.models import Recipe
+
+REFRESH_BATCH_SIZE = 1000
+SEARCH_CONFIG = 'english'
+# ``search_key`` packs the rank above the recipe id into one unique value,
+# so results ordered by it descending come by rank, then by id, and can be
+# paginated with a single column keyset. Ranks are kept to RANK_SCALE
+# steps; recipe ids fit in the lower 32 bits.
+RANK_SCALE = 1000000
+ID_SPAN = 2 ** 32
+
+
+def refresh_search_terms(recipe_ids):
+    """Recompute the stored tag and ingredient names of some recipes.
+
+    Works set based: per batch of recipes one query per relation and a
+    single UPDATE, however many recipes are touched.
+    """
+    recipe_ids = sorted(set(recipe_ids))
+    for start in range(0, len(recipe_ids), REFRESH_BATCH_SIZE):
+        batch = recipe_ids[start:start + REFRESH_BATCH_SIZE]
+        names = defaultdict(list)
+        for relation in ('tags', 'ingredients'):
+            field = Recipe._meta.get_field(relation)
+            target = f'{field.m2m_reverse_field_name()}__name'
+            rows = field.remote_field.through.objects.filter(
+                recipe_id__in=batch
+            ).order_by(target).values_list('recipe_id', target)
+            for recipe_id, name in rows:
+                names[recipe_id].append(name)
+        Recipe.objects.bulk_update(
+            [
+                Recipe(id=recipe_id, search_terms=' '.join(names[recipe_id]))
+                for recipe_id in batch
+            ],
+            ['search_terms']
+        )
+
+
+def search_recipes(queryset, text):
+    """Filter recipes matching ``text`` and order them by relevance.
+
+    Results carry ``search_rank`` and the ``search_key`` they are ordered
+    by, most relevant first.
+
+    PostgreSQL uses the GIN indexed ``search_vector`` column, weighting
+    title matches above tag and ingredient names. Other databases fall back
+    to substring matching with the same weighting, which is fine for local
+    development but does not use an index.
+    """
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(queryset, text)
+    return _search_fallback(queryset, text)
+
+
+def _search_postgresql(queryset, text):
+    query = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+    table = f'"{Recipe._meta.db_table}"'
+    vector = f'{table}."search_vector"'
+    return queryset.filter(
+        RawSQL(f'{vector} @@ {query}', [text], output_field=BooleanField())
+    ).annotate(
+        search_rank=RawSQL(
+            f'ts_rank({vector}, {query})', [text], output_field=FloatField()
+        ),
+        search_key=RawSQL(
+            f'round(ts_rank({vector}, {query}) * {RANK_SCALE})::bigint'
+            f' * {ID_SPAN} - {table}."id"',
+            [text], output_field=BigIntegerField()
+        ),
+    ).order_by('-search_key')
+
+
+def _search_fallback(queryset, text):
+    terms = text.split()
+    if not terms:
+        return queryset.none()
+    for term in terms:
+        queryset = queryset.filter(
+            Q(title__icontains=term) | Q(search_terms__icontains=term)
+        )
+    rank = reduce(add, [
+        Case(
+            When(title__icontains=term, then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField()
+        )
+        for term in terms
+    ])
+    return queryset.annotate(search_rank=rank).annotate(
+        search_key=ExpressionWrapper(
+            F('search_rank') * ID_SPAN - F('id'),
+            output_field=BigIntegerField()
+        )
+    ).order_by('-search_key')
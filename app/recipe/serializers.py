@@ -1,8 +1,87 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection
+from django.db.models import prefetch_related_objects
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 from core.models import Tag, Ingredient, Recipe
+from core.profiling import ProfiledSerializerMixin
+from recipe.images import EXTENSIONS, schedule_renditions
+from recipe.rows import ordered_prefetch
+from recipe.search import refresh_search_terms
+from recipe.sparse import SparseFieldsMixin
+from recipe.stats import STATS_FIELDS, apply_deltas, recipe_contributions, \
+    subtract, suspend_stats
 
+RECIPE_RELATIONS = ('tags', 'ingredients')
+BULK_BATCH_SIZE = 1000
 
-class TagSerializer(serializers.ModelSerializer):
+
+class NameListSerializer(serializers.Serializer):
+    """Serializer for a list of tag or ingredient names"""
+    names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=BULK_BATCH_SIZE
+    )
+
+
+class UserOwnedManyRelatedField(serializers.ManyRelatedField):
+    """List of primary keys resolved together in a single query"""
+    default_error_messages = {
+        'does_not_exist': _(
+            'Invalid pks {pk_values} - objects do not exist.'
+        ),
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        queryset = self.child_relation.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        for item in data:
+            try:
+                pks.append(pk_field.to_python(item))
+            except (TypeError, ValueError, DjangoValidationError):
+                self.child_relation.fail(
+                    'incorrect_type', data_type=type(item).__name__
+                )
+
+        objects = queryset.in_bulk(pks)
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+        if missing:
+            self.fail(
+                'does_not_exist',
+                pk_values=', '.join(f'"{pk}"' for pk in missing)
+            )
+        return [objects[pk] for pk in pks]
+
+
+class UserOwnedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key relation limited to objects of the requesting user"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None:
+            return queryset
+        return queryset.filter(user=request.user)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return UserOwnedManyRelatedField(**list_kwargs)
+
+
+class TagSerializer(ProfiledSerializerMixin, SparseFieldsMixin,
+                    serializers.ModelSerializer):
     """Serializer for tag objects"""
 
     class Meta:
@@ -11,7 +90,8 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(ProfiledSerializerMixin, SparseFieldsMixin,
+                           serializers.ModelSerializer):
     """Serializer for ingredient objects"""
 
     class Meta:
@@ -20,21 +100,205 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+def _bulk_insert_recipes(recipes):
+    """Insert recipes in batches and return them with primary keys set"""
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Recipe.objects.bulk_create(recipes, batch_size=BULK_BATCH_SIZE)
+    # Backends that cannot return the new ids need a round trip per row.
+    for recipe in recipes:
+        recipe.save()
+    return recipes
+
+
+def _relation_columns(name):
+    """Return the through model and its recipe and target id columns"""
+    field = Recipe._meta.get_field(name)
+    return (
+        field.remote_field.through,
+        f'{field.m2m_field_name()}_id',
+        f'{field.m2m_reverse_field_name()}_id',
+    )
+
+
+def _write_relations(recipes, name, related, existing):
+    """Write the through rows of one relation for many recipes at once.
+
+    ``related`` holds the wanted related objects for each recipe, or
+    ``None`` to leave that recipe untouched. For ``existing`` recipes the
+    current rows are read in one query and only the difference is written,
+    with one DELETE for the rows that went away and one INSERT for new ones.
+    """
+    through, source, target = _relation_columns(name)
+    touched = [
+        (recipe, objs) for recipe, objs in zip(recipes, related)
+        if objs is not None
+    ]
+    if not touched:
+        return
+    missing = dict.fromkeys(
+        (recipe.pk, obj.pk) for recipe, objs in touched for obj in objs
+    )
+    stale = []
+    if existing:
+        current = through.objects.filter(**{
+            f'{source}__in': [recipe.pk for recipe, _ in touched]
+        }).values_list('pk', source, target)
+        for pk, recipe_id, target_id in current:
+            if (recipe_id, target_id) in missing:
+                del missing[(recipe_id, target_id)]
+            else:
+                stale.append(pk)
+    if stale:
+        through.objects.filter(pk__in=stale).delete()
+    if missing:
+        through.objects.bulk_create(
+            [
+                through(**{source: recipe_id, target: target_id})
+                for recipe_id, target_id in missing
+            ],
+            batch_size=BULK_BATCH_SIZE
+        )
+
+
+class RecipeListSerializer(ProfiledSerializerMixin,
+                           serializers.ListSerializer):
+    """Create and update many recipes with set based writes"""
+
+    def _pop_relations(self, validated_data):
+        return {
+            name: [attrs.pop(name, None) for attrs in validated_data]
+            for name in RECIPE_RELATIONS
+        }
+
+    def create(self, validated_data):
+        """Insert all recipes and their relations in batches"""
+        relations = self._pop_relations(validated_data)
+        with suspend_stats():
+            recipes = _bulk_insert_recipes(
+                [Recipe(**attrs) for attrs in validated_data]
+            )
+        for name, related in relations.items():
+            _write_relations(recipes, name, related, existing=False)
+        refresh_search_terms(recipe.pk for recipe in recipes)
+        apply_deltas(recipe_contributions(recipe.pk for recipe in recipes))
+        prefetch_related_objects(
+            recipes, *ordered_prefetch(Recipe, RECIPE_RELATIONS)
+        )
+        return recipes
+
+    def update(self, instances, validated_data):
+        """Apply the changes to ``instances``, matched by position"""
+        relations = self._pop_relations(validated_data)
+        fields = set()
+        for instance, attrs in zip(instances, validated_data):
+            for attr, value in attrs.items():
+                setattr(instance, attr, value)
+            fields.update(attrs)
+        # Only the columns and relations that changed are read back for the
+        # statistics, before and after the write.
+        counted = [
+            name for name, related in relations.items()
+            if any(value is not None for value in related)
+        ]
+        recount = bool(counted or fields.intersection(STATS_FIELDS))
+        if recount:
+            ids = [instance.pk for instance in instances]
+            before = recipe_contributions(ids, counted, lock=True)
+        if fields:
+            Recipe.objects.bulk_update(
+                instances, fields, batch_size=BULK_BATCH_SIZE
+            )
+        for name, related in relations.items():
+            _write_relations(instances, name, related, existing=True)
+        if recount:
+            apply_deltas(subtract(recipe_contributions(ids, counted), before))
+        if counted:
+            refresh_search_terms(instance.pk for instance in instances)
+        prefetch_related_objects(
+            instances, *ordered_prefetch(Recipe, RECIPE_RELATIONS)
+        )
+        return instances
+
+
+class RenditionsField(serializers.Field):
+    """Read only field listing the URLs of a recipe's image renditions"""
+    # The URLs depend on nothing but the column and the request, so the row
+    # read path can convert the column with this field.
+    plain_column = True
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        storage = Recipe._meta.get_field('image').storage
+        request = self.context.get('request')
+        representation = {}
+        for rendition, entry in value.items():
+            representation[rendition] = item = {
+                'width': entry['width'],
+                'height': entry['height'],
+            }
+            for extension in EXTENSIONS:
+                if extension in entry:
+                    url = storage.url(entry[extension])
+                    if request is not None:
+                        url = request.build_absolute_uri(url)
+                    item[extension] = url
+        return representation
+
+
+class RecipeSerializer(ProfiledSerializerMixin, SparseFieldsMixin,
+                       serializers.ModelSerializer):
     """Serializer for recipe objects"""
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = UserOwnedPrimaryKeyRelatedField(
         many=True,
         queryset=Ingredient.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserOwnedPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
+    renditions = RenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'title', 'price', 'time_minutes', 'link', 'ingredients', 'tags')
+        fields = (
+            'id', 'title', 'price', 'time_minutes', 'link', 'ingredients',
+            'tags', 'renditions',
+        )
         read_only_fields = ('id',)
+        list_serializer_class = RecipeListSerializer
+
+    def update(self, instance, validated_data):
+        """Update a recipe, writing only the relation rows that changed"""
+        relations = {
+            name: validated_data.pop(name)
+            for name in RECIPE_RELATIONS if name in validated_data
+        }
+        instance = super().update(instance, validated_data)
+        for name, objs in relations.items():
+            self._sync_relation(instance, name, objs)
+        return instance
+
+    def _sync_relation(self, instance, name, objs):
+        """Add and remove the difference between current and ``objs``"""
+        cache = getattr(instance, '_prefetched_objects_cache', {})
+        if name in cache:
+            current = {obj.pk for obj in cache[name]}
+        else:
+            through, source, target = _relation_columns(name)
+            current = set(through.objects.filter(
+                **{source: instance.pk}
+            ).values_list(target, flat=True))
+        wanted = {obj.pk: obj for obj in objs}
+        manager = getattr(instance, name)
+        removed = current.difference(wanted)
+        if removed:
+            manager.remove(*removed)
+        added = [obj for pk, obj in wanted.items() if pk not in current]
+        if added:
+            manager.add(*added)
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -43,10 +307,20 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(ProfiledSerializerMixin,
+                            serializers.ModelSerializer):
     """Serializer for uploading images to recipes"""
+    renditions = RenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
+        fields = ('id', 'image', 'renditions')
         read_only_fields = ('id',)
+
+    def update(self, instance, validated_data):
+        """Store the upload and resize it off the request"""
+        instance.renditions = {}
+        instance = super().update(instance, validated_data)
+        if instance.image:
+            schedule_renditions(instance)
+        return instance
@@ -0,0 +1,210 @@
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, \
+    post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.cache import invalidate_user_responses
+from recipe.search import refresh_search_terms
+from recipe.stats import STATS_FIELDS, StatsDelta, apply_deltas, \
+    forget_related, lock_recipes, recipe_contributions, stats_suspended, \
+    subtract
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def expire_cached_responses(sender, instance, **kwargs):
+    """Expire the cached API responses of the owner of a changed object"""
+    invalidate_user_responses(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def start_cache_version(sender, instance, created, **kwargs):
+    """Give new users a fresh cache version.
+
+    Some backends reuse primary keys after a rollback, and a new user must
+    never see responses cached for an earlier user with the same id.
+    """
+    if created:
+        invalidate_user_responses(instance.pk)
+
+
+def _linked_recipe_ids(instance):
+    """Return the ids of the recipes a tag or ingredient is assigned to"""
+    return list(instance.recipe_set.values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_search_terms(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    """Keep the searchable names of recipes in line with their relations"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_search_terms([instance.pk])
+    elif action == 'pre_clear':
+        instance._search_recipe_ids = _linked_recipe_ids(instance)
+    elif action == 'post_clear':
+        refresh_search_terms(instance.__dict__.pop('_search_recipe_ids', ()))
+    elif action in ('post_add', 'post_remove'):
+        refresh_search_terms(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def rename_search_terms(sender, instance, created, update_fields, **kwargs):
+    """Pick up the new name of a renamed tag or ingredient"""
+    if created or (update_fields is not None and 'name' not in update_fields):
+        return
+    refresh_search_terms(_linked_recipe_ids(instance))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def collect_search_terms(sender, instance, **kwargs):
+    """Remember the recipes of a tag or ingredient about to be deleted"""
+    instance._search_recipe_ids = _linked_recipe_ids(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def drop_search_terms(sender, instance, **kwargs):
+    """Remove the name of a deleted tag or ingredient from its recipes"""
+    refresh_search_terms(instance.__dict__.pop('_search_recipe_ids', ()))
+
+
+def _recipe_snapshot(instance):
+    price = Recipe._meta.get_field('price').to_python(instance.price)
+    return instance.user_id, instance.time_minutes, price
+
+
+@receiver(pre_save, sender=Recipe)
+def lock_saved_recipe(sender, instance, raw, update_fields, **kwargs):
+    """Read the stored values of a recipe about to change, under a lock.
+
+    Recipe.save runs in a transaction, so the row stays locked until the
+    change is counted, and of two concurrent updates the second counts
+    from what the first stored rather than from what it loaded.
+    """
+    instance.__dict__.pop('_stats_previous', None)
+    if raw or stats_suspended() or instance._state.adding:
+        return
+    if update_fields is not None and \
+            not set(update_fields).intersection(STATS_FIELDS):
+        return
+    instance._stats_previous = Recipe.objects.select_for_update().filter(
+        pk=instance.pk
+    ).values_list('user_id', 'time_minutes', 'price').first()
+
+
+@receiver(post_save, sender=Recipe)
+def count_saved_recipe(sender, instance, created, raw, **kwargs):
+    """Add a new recipe, or the change to an existing one, to the stats"""
+    previous = instance.__dict__.pop('_stats_previous', None)
+    if raw or stats_suspended() or (not created and previous is None):
+        return
+    current = _recipe_snapshot(instance)
+    if previous == current:
+        return
+    if previous is not None and previous[0] != current[0]:
+        # The tags and ingredients move over with the recipe.
+        moved = recipe_contributions([instance.pk]).get(
+            current[0], StatsDelta()
+        )
+        left = StatsDelta()
+        left.related = moved.related
+        left.add_recipe(*previous[1:])
+        deltas = subtract({current[0]: moved}, {previous[0]: left})
+    else:
+        delta = StatsDelta()
+        if previous is not None:
+            delta.add_recipe(*previous[1:], sign=-1)
+        delta.add_recipe(*current[1:])
+        deltas = {current[0]: delta}
+    apply_deltas(deltas)
+
+
+def _related_pairs(sender, instance, reverse, pk_set):
+    """Return the (user, related id) links an m2m change touches.
+
+    The recipes are locked first, so a concurrent removal of the same
+    links waits and then finds them gone instead of counting them again.
+    """
+    source = 'tag_id' if sender is Recipe.tags.through else 'ingredient_id'
+    links = sender.objects.all()
+    if reverse:
+        links = links.filter(**{source: instance.pk})
+        if pk_set is not None:
+            links = links.filter(recipe_id__in=pk_set)
+        lock_recipes(links.values('recipe_id'))
+    else:
+        lock_recipes([instance.pk])
+        links = links.filter(recipe_id=instance.pk)
+        if pk_set is not None:
+            links = links.filter(**{f'{source}__in': pk_set})
+    return list(links.values_list('recipe__user_id', source))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def count_related(sender, instance, action, reverse, pk_set, **kwargs):
+    """Count tags and ingredients added to or removed from recipes"""
+    if stats_suspended():
+        return
+    relation = 'tags' if sender is Recipe.tags.through else 'ingredients'
+    if action in ('pre_remove', 'pre_clear'):
+        instance._stats_removed = _related_pairs(
+            sender, instance, reverse, pk_set
+        )
+        return
+    if action in ('post_remove', 'post_clear'):
+        pairs = instance.__dict__.pop('_stats_removed', ())
+        sign = -1
+    elif action == 'post_add' and pk_set:
+        if reverse:
+            pairs = [
+                (user_id, instance.pk) for user_id in
+                Recipe.objects.filter(pk__in=pk_set).values_list(
+                    'user_id', flat=True
+                )
+            ]
+        else:
+            pairs = [(instance.user_id, pk) for pk in pk_set]
+        sign = 1
+    else:
+        return
+    deltas = {}
+    for user_id, related_id in pairs:
+        deltas.setdefault(user_id, StatsDelta()).add_related(
+            relation, related_id, sign
+        )
+    apply_deltas(deltas)
+
+
+@receiver(pre_delete, sender=Recipe)
+def collect_recipe_stats(sender, instance, **kwargs):
+    """Remember what a recipe about to be deleted adds to the stats"""
+    if not stats_suspended():
+        instance._stats_removed = recipe_contributions(
+            [instance.pk], lock=True
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def discount_deleted_recipe(sender, instance, **kwargs):
+    """Take a deleted recipe out of its owner's statistics"""
+    removed = instance.__dict__.pop('_stats_removed', None)
+    if removed and not stats_suspended():
+        apply_deltas(subtract({}, removed))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def forget_deleted_related(sender, instance, **kwargs):
+    """Drop a deleted tag or ingredient from its owner's statistics"""
+    if not stats_suspended():
+        relation = 'tags' if sender is Tag else 'ingredients'
+        forget_related(instance.user_id, relation, instance.pk)
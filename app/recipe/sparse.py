@@ -0,0 +1,106 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+from recipe.rows import ordered_prefetch
+
+FIELDS_PARAM = 'fields'
+
+
+def parse_fields(value, available):
+    """Return the field names of a comma separated ``fields`` parameter"""
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    if not names:
+        raise serializers.ValidationError(
+            {FIELDS_PARAM: ['Expected a comma separated list of fields.']}
+        )
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise serializers.ValidationError({FIELDS_PARAM: [
+            f'Unknown fields: {", ".join(unknown)}. '
+            f'Expected any of: {", ".join(available)}.'
+        ]})
+    return tuple(dict.fromkeys(names))
+
+
+class SparseFieldsMixin:
+    """Serializer that outputs only the fields named in ``fields``"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields).difference(fields):
+                self.fields.pop(name)
+
+
+class SparseFieldsetMixin:
+    """Let read actions return a subset of fields with ``?fields=a,b``.
+
+    The serializer drops the other fields, and ``narrow_queryset`` loads
+    only the columns and relations the remaining ones need.
+    """
+    sparse_fieldset_actions = ('list', 'retrieve')
+
+    def get_sparse_fields(self):
+        """Return the requested field names, or None for all of them"""
+        if self.action not in self.sparse_fieldset_actions:
+            return None
+        value = self.request.query_params.get(FIELDS_PARAM)
+        if value is None:
+            return None
+        if not hasattr(self, '_sparse_fields'):
+            available = list(self.get_serializer_class()().fields)
+            self._sparse_fields = parse_fields(value, available)
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def narrow_queryset(self, queryset, prefetch=()):
+        """Prefetch ``prefetch`` and defer columns no requested field uses.
+
+        Related rows are prefetched in primary key order.
+
+        Fields that do not map onto a model field, such as method fields,
+        may read anything, so their presence keeps every column.
+        """
+        fields = self.get_sparse_fields()
+        model = queryset.model
+        if fields is None:
+            return queryset.prefetch_related(
+                *ordered_prefetch(model, prefetch)
+            )
+
+        opts = model._meta
+        columns = {opts.pk.name}
+        # Ordering columns are read back by the cursor paginator.
+        ordering = list(queryset.query.order_by)
+        paginator = self.paginator
+        if paginator is not None:
+            ordering.append(getattr(paginator, 'ordering', None) or '')
+        for name in ordering:
+            if isinstance(name, str) and name.lstrip('-') in {
+                    field.name for field in opts.concrete_fields}:
+                columns.add(name.lstrip('-'))
+
+        relations = []
+        serializer = self.get_serializer_class()(fields=fields)
+        for field in serializer.fields.values():
+            if field.source in prefetch:
+                relations.append(field.source)
+                continue
+            try:
+                model_field = opts.get_field(field.source)
+            except FieldDoesNotExist:
+                model_field = None
+            if model_field is None or not model_field.concrete or \
+                    model_field.many_to_many:
+                return queryset.prefetch_related(
+                    *ordered_prefetch(model, prefetch)
+                )
+            columns.add(model_field.name)
+        return queryset.only(*columns).prefetch_related(
+            *ordered_prefetch(model, relations)
+        )
@@ -0,0 +1,368 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from core.models import Ingredient, Recipe, Tag, UserRecipeStats
+
+# Upper bounds of the price buckets; the last bucket has no upper bound.
+# Existing statistics must be rebuilt after changing them.
+PRICE_BOUNDS = tuple(
+    Decimal(str(bound)) for bound in
+    getattr(settings, 'RECIPE_STATS_PRICE_BOUNDS', (5, 10, 20, 50, 100))
+)
+RELATIONS = {'tags': Tag, 'ingredients': Ingredient}
+# Recipe fields the statistics are computed from.
+STATS_FIELDS = ('user', 'time_minutes', 'price')
+REBUILD_BATCH_SIZE = 500
+
+_suspended = ContextVar('recipe_stats_suspended', default=False)
+
+
+def price_bucket(price):
+    """Return the index of the bucket a price falls in"""
+    for index, bound in enumerate(PRICE_BOUNDS):
+        if price < bound:
+            return index
+    return len(PRICE_BOUNDS)
+
+
+class StatsDelta:
+    """Changes to the statistics of one user"""
+
+    def __init__(self):
+        self.recipes = 0
+        self.time_total = 0
+        self.times = Counter()
+        self.price_total = Decimal(0)
+        self.prices = Counter()
+        self.related = {relation: Counter() for relation in RELATIONS}
+
+    def add_recipe(self, time_minutes, price, sign=1):
+        self.recipes += sign
+        self.time_total += sign * time_minutes
+        self.times[str(time_minutes)] += sign
+        self.price_total += sign * Decimal(price)
+        self.prices[price_bucket(Decimal(price))] += sign
+
+    def add_related(self, relation, related_id, sign=1):
+        self.related[relation][str(related_id)] += sign
+
+    def __bool__(self):
+        return bool(
+            self.recipes or self.time_total or self.price_total or
+            any(self.times.values()) or any(self.prices.values()) or
+            any(any(counts.values()) for counts in self.related.values())
+        )
+
+    def apply_to(self, stats):
+        stats.recipe_count += self.recipes
+        stats.time_minutes_total += self.time_total
+        _merge(stats.time_minutes, self.times)
+        stats.price_total += self.price_total
+        buckets = list(stats.price_buckets)
+        buckets += [0] * (len(PRICE_BOUNDS) + 1 - len(buckets))
+        for index, change in self.prices.items():
+            buckets[index] += change
+        stats.price_buckets = buckets
+        for relation, counts in self.related.items():
+            _merge(getattr(stats, relation), counts)
+
+
+def _merge(counts, changes):
+    for key, change in changes.items():
+        value = counts.get(key, 0) + change
+        if value > 0:
+            counts[key] = value
+        else:
+            counts.pop(key, None)
+
+
+def stats_suspended():
+    """Whether signal handlers should leave the statistics alone"""
+    return _suspended.get()
+
+
+@contextmanager
+def suspend_stats():
+    """Ignore recipe signals in the block.
+
+    Bulk writes use this and update the statistics themselves, once for
+    all the recipes they touch.
+    """
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def lock_recipes(recipe_ids):
+    """Lock recipe rows until the end of the transaction.
+
+    Writers lock the recipes they change, in id order, before reading what
+    the recipes contribute, so concurrent changes to one recipe are
+    counted one after the other.
+    """
+    list(Recipe.objects.select_for_update().filter(
+        id__in=recipe_ids
+    ).order_by('id').values_list('id', flat=True))
+
+
+def recipe_contributions(recipe_ids, relations=tuple(RELATIONS),
+                         lock=False):
+    """Return what ``recipe_ids`` add to their users' statistics.
+
+    One query for the recipes and one per relation in ``relations``,
+    however many recipes there are. With ``lock`` the recipe rows are
+    locked as by ``lock_recipes``.
+    """
+    deltas = {}
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return deltas
+    rows = Recipe.objects.filter(id__in=recipe_ids).order_by('id')
+    if lock:
+        rows = rows.select_for_update()
+    rows = rows.values_list('user_id', 'time_minutes', 'price')
+    for user_id, time_minutes, price in rows:
+        deltas.setdefault(user_id, StatsDelta()).add_recipe(
+            time_minutes, price
+        )
+    for relation in relations:
+        field = Recipe._meta.get_field(relation)
+        target = f'{field.m2m_reverse_field_name()}_id'
+        rows = field.remote_field.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe__user_id', target)
+        for user_id, related_id in rows:
+            deltas.setdefault(user_id, StatsDelta()).add_related(
+                relation, related_id
+            )
+    return deltas
+
+
+def subtract(deltas, removed):
+    """Return ``deltas`` minus ``removed``, both keyed by user"""
+    result = dict(deltas)
+    for user_id, delta in removed.items():
+        negated = StatsDelta()
+        negated.recipes = -delta.recipes
+        negated.time_total = -delta.time_total
+        negated.times = Counter({k: -v for k, v in delta.times.items()})
+        negated.price_total = -delta.price_total
+        negated.prices = Counter({k: -v for k, v in delta.prices.items()})
+        negated.related = {
+            relation: Counter({k: -v for k, v in counts.items()})
+            for relation, counts in delta.related.items()
+        }
+        if user_id in result:
+            negated = _combine(result[user_id], negated)
+        result[user_id] = negated
+    return result
+
+
+def _combine(first, second):
+    combined = StatsDelta()
+    combined.recipes = first.recipes + second.recipes
+    combined.time_total = first.time_total + second.time_total
+    combined.times = Counter(first.times)
+    combined.times.update(second.times)
+    combined.price_total = first.price_total + second.price_total
+    combined.prices = Counter(first.prices)
+    combined.prices.update(second.prices)
+    for relation in RELATIONS:
+        combined.related[relation].update(first.related[relation])
+        combined.related[relation].update(second.related[relation])
+    return combined
+
+
+def apply_deltas(deltas):
+    """Apply per user changes to the stored statistics.
+
+    Rows are locked in user order, so concurrent writers queue up instead
+    of deadlocking. Users without statistics yet are skipped; theirs are
+    built in full when first read.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        rows = UserRecipeStats.objects.select_for_update().filter(
+            user_id__in=deltas
+        ).order_by('user_id')
+        for stats in rows:
+            deltas[stats.user_id].apply_to(stats)
+            stats.save()
+
+
+def forget_related(user_id, relation, related_id):
+    """Drop a deleted tag or ingredient from its owner's statistics"""
+    with transaction.atomic():
+        stats = UserRecipeStats.objects.select_for_update().filter(
+            user_id=user_id
+        ).first()
+        if stats is not None and \
+                getattr(stats, relation).pop(str(related_id), None):
+            stats.save()
+
+
+def rebuild_stats(user_ids, batch_size=REBUILD_BATCH_SIZE):
+    """Recompute the statistics of ``user_ids`` from their recipes.
+
+    Users are rebuilt ``batch_size`` at a time, each batch in its own
+    transaction. The rows are created and locked before reading the
+    recipes, so a concurrent writer either commits before and is counted
+    here, or applies its change on top of the rebuilt row afterwards.
+    """
+    user_ids = sorted(set(user_ids))
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        with transaction.atomic():
+            UserRecipeStats.objects.bulk_create(
+                [UserRecipeStats(user_id=user_id) for user_id in batch],
+                ignore_conflicts=True
+            )
+            rows = list(UserRecipeStats.objects.select_for_update().filter(
+                user_id__in=batch
+            ).order_by('user_id'))
+            computed = _aggregate(batch)
+            # bulk_update does not fill in auto_now fields.
+            now = timezone.now()
+            for stats in rows:
+                stats.updated = now
+                stats.recipe_count = 0
+                stats.time_minutes_total = 0
+                stats.time_minutes = {}
+                stats.price_total = Decimal(0)
+                stats.price_buckets = [0] * (len(PRICE_BOUNDS) + 1)
+                for relation in RELATIONS:
+                    setattr(stats, relation, {})
+                delta = computed.get(stats.user_id)
+                if delta is not None:
+                    delta.apply_to(stats)
+            UserRecipeStats.objects.bulk_update(rows, [
+                'recipe_count', 'time_minutes_total', 'time_minutes',
+                'price_total', 'price_buckets', *RELATIONS, 'updated',
+            ])
+
+
+def _aggregate(user_ids):
+    """Compute the statistics of users with aggregate queries"""
+    deltas = {}
+
+    def delta(user_id):
+        return deltas.setdefault(user_id, StatsDelta())
+
+    recipes = Recipe.objects.filter(user_id__in=user_ids).order_by()
+    for row in recipes.values('user_id').annotate(
+            count=Count('id'), time=Sum('time_minutes'), price=Sum('price')):
+        item = delta(row['user_id'])
+        item.recipes = row['count']
+        item.time_total = row['time']
+        item.price_total = row['price']
+    for row in recipes.values('user_id', 'time_minutes').annotate(
+            count=Count('id')):
+        delta(row['user_id']).times[str(row['time_minutes'])] = row['count']
+    bucket = Case(
+        *[When(price__lt=bound, then=Value(index))
+          for index, bound in enumerate(PRICE_BOUNDS)],
+        default=Value(len(PRICE_BOUNDS)),
+        output_field=IntegerField()
+    )
+    for row in recipes.annotate(bucket=bucket).values(
+            'user_id', 'bucket').annotate(count=Count('id')):
+        delta(row['user_id']).prices[row['bucket']] = row['count']
+    for relation in RELATIONS:
+        field = Recipe._meta.get_field(relation)
+        target = f'{field.m2m_reverse_field_name()}_id'
+        rows = field.remote_field.through.objects.filter(
+            recipe__user_id__in=user_ids
+        ).values('recipe__user_id', target).annotate(
+            count=Count('id')
+        ).order_by()
+        for row in rows:
+            delta(row['recipe__user_id']).related[relation][
+                str(row[target])
+            ] = row['count']
+    return deltas
+
+
+def _median(histogram, count):
+    """Return the median of a ``{value: count}`` histogram"""
+    if not count:
+        return None
+    middle = []
+    seen = 0
+    for value, times in sorted((int(k), v) for k, v in histogram.items()):
+        seen += times
+        while len(middle) < 2 and seen > (count - 1) // 2 + len(middle):
+            middle.append(value)
+    if count % 2:
+        return middle[0]
+    return (middle[0] + middle[1]) / 2
+
+
+def _top(user_id, relation, counts, limit):
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], int(item[0])))
+    names = dict(RELATIONS[relation].objects.filter(
+        user_id=user_id, id__in=[int(key) for key, _ in ranked[:limit * 2]]
+    ).values_list('id', 'name'))
+    top = [
+        {'id': int(key), 'name': names[int(key)], 'count': count}
+        for key, count in ranked if int(key) in names
+    ]
+    return top[:limit]
+
+
+def get_user_stats(user_id):
+    """Return the statistics row of a user, building it when missing"""
+    stats = UserRecipeStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        rebuild_stats([user_id])
+        stats = UserRecipeStats.objects.get(user_id=user_id)
+    return stats
+
+
+def summarize(stats, top=10):
+    """Return the JSON representation of a user's statistics"""
+    count = stats.recipe_count
+    times = [int(minutes) for minutes in stats.time_minutes]
+    buckets = list(stats.price_buckets)
+    buckets += [0] * (len(PRICE_BOUNDS) + 1 - len(buckets))
+    lower = (None,) + PRICE_BOUNDS
+    upper = PRICE_BOUNDS + (None,)
+    return {
+        'recipe_count': count,
+        'time_minutes': {
+            'average': stats.time_minutes_total / count if count else None,
+            'median': _median(stats.time_minutes, count),
+            'min': min(times, default=None),
+            'max': max(times, default=None),
+        },
+        'price': {
+            'average': (
+                f'{stats.price_total / count:.2f}' if count else None
+            ),
+            'total': f'{stats.price_total:.2f}',
+            'distribution': [
+                {
+                    'min': None if low is None else f'{low:.2f}',
+                    'max': None if high is None else f'{high:.2f}',
+                    'count': buckets[index],
+                }
+                for index, (low, high) in enumerate(zip(lower, upper))
+            ],
+        },
+        **{
+            f'top_{relation}': _top(
+                stats.user_id, relation, getattr(stats, relation), top
+            )
+            for relation in RELATIONS
+        },
+    }
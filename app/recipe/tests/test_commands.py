@@ -0,0 +1,153 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.management.commands.explain_queries import CASES
+
+
+class CommandTests(TestCase):
+
+    def test_benchmark_recipe_filters(self):
+        """Test the filter benchmark reports every case and cleans up"""
+        out = StringIO()
+        call_command(
+            'benchmark_recipe_filters', recipes=20, tags=15, min_tags=2,
+            max_tags=5, repeat=1, stdout=out
+        )
+
+        output = out.getvalue()
+        self.assertIn('match=any', output)
+        self.assertIn('match=all', output)
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_benchmark_serializers(self):
+        """Test the serializer benchmark compares both paths"""
+        out = StringIO()
+        call_command(
+            'benchmark_serializers', rows=[4], repeat=1, stdout=out
+        )
+
+        output = out.getvalue()
+        self.assertIn('list 4 speedup', output)
+        self.assertIn('detail 4 speedup', output)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_explain_queries(self):
+        """Test a plan is printed for every endpoint query"""
+        out = StringIO()
+        call_command('explain_queries', stdout=out)
+
+        for name, *_ in CASES:
+            self.assertIn(name, out.getvalue())
+
+    # Planners pick indexes by table statistics, and PostgreSQL scans the
+    # near empty test tables instead; SQLite plans by schema alone.
+    @skipUnless(connection.vendor == 'sqlite', 'Plans depend on table size')
+    def test_explain_queries_use_indexes(self):
+        """Test every endpoint query is planned on an index"""
+        out = StringIO()
+        call_command('explain_queries', check=True, stdout=out)
+
+        self.assertIn('core_recipe_user_id_idx', out.getvalue())
+
+    def test_seed_data(self):
+        """Test seeding creates users with related recipes"""
+        call_command(
+            'seed_data', users=3, recipes=4, tags=5, ingredients=8,
+            users_per_batch=2, stdout=StringIO()
+        )
+
+        users = get_user_model().objects.filter(email__startswith='seed-')
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(Tag.objects.count(), 15)
+        self.assertEqual(Ingredient.objects.count(), 24)
+        for recipe in Recipe.objects.all():
+            tags = recipe.tags.all()
+            self.assertTrue(1 <= len(tags) <= 5)
+            self.assertTrue(3 <= recipe.ingredients.count() <= 8)
+            self.assertEqual({tag.user_id for tag in tags}, {recipe.user_id})
+            names = recipe.search_terms.split(' ')
+            for tag in tags:
+                self.assertIn(tag.name, names)
+
+    def test_seed_data_adds_users(self):
+        """Test seeding again adds new users instead of failing"""
+        call_command('seed_data', users=1, recipes=1, stdout=StringIO())
+        call_command('seed_data', users=1, recipes=1, stdout=StringIO())
+
+        self.assertEqual(get_user_model().objects.count(), 2)
+
+    def test_seed_data_invalid_range(self):
+        """Test an invalid per recipe range is rejected"""
+        with self.assertRaises(CommandError):
+            call_command(
+                'seed_data', users=1, tags_per_recipe='5-2',
+                stdout=StringIO()
+            )
+
+    def test_run_benchmarks(self):
+        """Test the benchmark reports every endpoint and rolls back"""
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        call_command(
+            'seed_data', users=1, recipes=5, tags=4, ingredients=6,
+            stdout=StringIO()
+        )
+        Recipe.objects.create(
+            user=get_user_model().objects.get(), title='Guaranteed',
+            time_minutes=5, price=1
+        )
+        recipes = Recipe.objects.count()
+        out = StringIO()
+
+        with override_settings(MEDIA_ROOT=media):
+            call_command(
+                'run_benchmarks', repeat=2, warmup=0, stdout=out,
+                stderr=StringIO()
+            )
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['recipes'], recipes)
+        self.assertEqual(set(report['endpoints']), {
+            'list', 'list (cached)', 'list page', 'filter any',
+            'filter all', 'retrieve', 'create', 'upload_image',
+        })
+        for result in report['endpoints'].values():
+            self.assertEqual(result['runs'], 2)
+            for key in ('p50', 'p95', 'p99', 'throughput', 'queries'):
+                self.assertIn(key, result)
+        self.assertLess(report['endpoints']['list (cached)']['queries'],
+                        report['endpoints']['list']['queries'])
+        self.assertEqual(Recipe.objects.count(), recipes)
+
+    def test_run_benchmarks_without_data(self):
+        """Test the benchmark asks for data when there is none"""
+        with self.assertRaises(CommandError):
+            call_command('run_benchmarks', stdout=StringIO())
+
+
+class AsgiBenchmarkTests(TransactionTestCase):
+
+    def test_benchmark_asgi(self):
+        """Test the ASGI benchmark serves every request and cleans up"""
+        out = StringIO()
+        call_command(
+            'benchmark_asgi', requests=4, concurrency=2, recipes=3,
+            stdout=out
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        for line in lines:
+            self.assertTrue(line.endswith('errors 0'), line)
+        self.assertFalse(get_user_model().objects.exists())
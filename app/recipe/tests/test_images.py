@@ -0,0 +1,208 @@
+import io
+import shutil
+import tempfile
+import time
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import Recipe
+from recipe import images
+from recipe.serializers import RecipeImageSerializer
+
+
+def image_file(size=(2000, 1000), mode='RGB', image_format='JPEG'):
+    """Return the bytes of a generated image"""
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x010f] = 'Camera maker'
+    Image.new(mode, size).save(buffer, image_format, exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+class ImageProcessingTests(TestCase):
+    """Test creating recipe image renditions"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Biryani', time_minutes=10, price=5
+        )
+        self.recipe.image.save('photo.jpg', ContentFile(image_file()))
+
+    def test_create_renditions(self):
+        """Test renditions are resized, re-encoded and stripped"""
+        renditions = images.create_renditions(
+            default_storage, self.recipe.image.name
+        )
+
+        self.assertEqual(set(renditions), set(images.RENDITIONS))
+        thumb = renditions['thumb']
+        self.assertEqual((thumb['width'], thumb['height']), (160, 80))
+        for extension, image_format, _ in images.output_formats():
+            with default_storage.open(thumb[extension]) as stored:
+                with Image.open(stored) as image:
+                    self.assertEqual(image.format, image_format)
+                    self.assertEqual(image.size, (160, 80))
+                    self.assertEqual(len(image.getexif()), 0)
+
+    def test_small_images_are_not_upscaled(self):
+        """Test renditions never exceed the original size"""
+        name = default_storage.save(
+            'small.png', ContentFile(image_file((100, 50), 'RGBA', 'PNG'))
+        )
+
+        renditions = images.create_renditions(default_storage, name)
+
+        self.assertEqual(renditions['full']['width'], 100)
+        self.assertEqual(renditions['full']['height'], 50)
+
+    def test_process_recipe_image(self):
+        """Test processing records the renditions on the recipe"""
+        renditions = images.process_recipe_image(
+            self.recipe.id, self.user.id, self.recipe.image.name
+        )
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.renditions, renditions)
+
+    def test_process_replaced_image(self):
+        """Test renditions of an image that was replaced are discarded"""
+        old_name = self.recipe.image.name
+        self.recipe.image.save(
+            'other.jpg', ContentFile(image_file((1000, 1000)))
+        )
+
+        result = images.process_recipe_image(
+            self.recipe.id, self.user.id, old_name
+        )
+
+        self.assertIsNone(result)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.renditions, {})
+
+    def test_generate_missing_renditions(self):
+        """Test the command processes images whose job was lost"""
+        processed = Recipe.objects.create(
+            user=self.user, title='Nihari', time_minutes=10, price=5,
+            image=self.recipe.image.name, renditions={'thumb': {}}
+        )
+        Recipe.objects.create(
+            user=self.user, title='Daal', time_minutes=10, price=5
+        )
+        out = io.StringIO()
+
+        call_command('generate_renditions', missing=True, stdout=out)
+
+        self.recipe.refresh_from_db()
+        processed.refresh_from_db()
+        self.assertEqual(set(self.recipe.renditions), set(images.RENDITIONS))
+        self.assertEqual(processed.renditions, {'thumb': {}})
+        self.assertIn('of 1 recipes, 0 failed', out.getvalue())
+
+    def test_shutdown_waits_for_jobs(self):
+        """Test queued jobs finish before the pool shuts down"""
+        done = []
+
+        def job():
+            time.sleep(0.1)
+            done.append(True)
+
+        images.get_executor().submit(job)
+        images.shutdown_executor()
+
+        self.assertEqual(done, [True])
+
+    @patch('recipe.images.get_executor')
+    @patch('recipe.images.transaction.on_commit', side_effect=lambda f: f())
+    def test_upload_schedules_processing(self, on_commit, get_executor):
+        """Test uploads are handed to the worker pool and not resized"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+        upload = ContentFile(image_file(), name='upload.jpg')
+
+        result = client.post(url, {'image': upload}, format='multipart')
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data['renditions'], {})
+        self.recipe.refresh_from_db()
+        get_executor.return_value.submit.assert_called_once_with(
+            images._process_in_worker,
+            self.recipe.id,
+            self.user.id,
+            self.recipe.image.name
+        )
+
+    def test_renditions_urls(self):
+        """Test the image serializer exposes absolute rendition URLs"""
+        images.process_recipe_image(
+            self.recipe.id, self.user.id, self.recipe.image.name
+        )
+        self.recipe.refresh_from_db()
+        request = APIRequestFactory().get('/')
+
+        data = RecipeImageSerializer(
+            self.recipe, context={'request': request}
+        ).data
+
+        thumb = self.recipe.renditions['thumb']
+        self.assertEqual(data['renditions']['thumb'], {
+            'width': 160,
+            'height': 80,
+            **{
+                extension: request.build_absolute_uri(
+                    default_storage.url(thumb[extension])
+                )
+                for extension, _, _ in images.output_formats()
+            },
+        })
+
+    def test_read_renditions_after_processing(self):
+        """Test recipe reads return the rendition URLs once processed"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        detail = reverse('recipe:recipe-detail', args=[self.recipe.id])
+        self.assertEqual(client.get(detail).data['renditions'], {})
+
+        images.process_recipe_image(
+            self.recipe.id, self.user.id, self.recipe.image.name
+        )
+        self.recipe.refresh_from_db()
+        thumb = self.recipe.renditions['thumb']
+        expected = {
+            'width': 160,
+            'height': 80,
+            **{
+                extension: 'http://testserver' +
+                default_storage.url(thumb[extension])
+                for extension, _, _ in images.output_formats()
+            },
+        }
+
+        for url in (detail, reverse('recipe:recipe-list')):
+            result = client.get(url)
+            data = result.data if url == detail else result.data[0]
+
+            self.assertEqual(result.status_code, status.HTTP_200_OK)
+            self.assertEqual(set(data['renditions']), set(images.RENDITIONS))
+            self.assertEqual(data['renditions']['thumb'], expected)
@@ -10,6 +10,7 @@ from recipe.serializers import IngredientSerializer
 
 
 INGREDIENT_URL = reverse('recipe:ingredient-list')
+UPSERT_INGREDIENT_URL = reverse('recipe:ingredient-upsert')
 
 
 class PublicIngredientApiTest(TestCase):
@@ -97,3 +98,18 @@ class PrivateIngredientApiTest(TestCase):
 
         self.assertIn(serializer1.data, result.data)
         self.assertNotIn(serializer2.data, result.data)
+
+    def test_upsert_ingredients(self):
+        """Test upserting ingredient names returns an id for each name"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        payload = {'names': ['Salt', 'Pepper']}
+
+        result = self.client.post(
+            UPSERT_INGREDIENT_URL, payload, format='json'
+        )
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data[0], {'id': salt.id, 'name': 'Salt'})
+        self.assertTrue(
+            Ingredient.objects.filter(user=self.user, name='Pepper').exists()
+        )
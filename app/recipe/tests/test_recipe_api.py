@@ -1,9 +1,14 @@
 import tempfile
 import os
+import re
+import json
+from unittest.mock import patch
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -14,6 +19,8 @@ from core.models import Recipe, Tag, Ingredient
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+BULK_URL = reverse('recipe:recipe-bulk')
 
 def image_upload_url(recipe_id):
     """Return URL for recipe image uplaod"""
@@ -279,3 +286,657 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn(serializer1.data, result.data)
         self.assertIn(serializer2.data, result.data)
         self.assertNotIn(serializer3.data, result.data)
+
+
+class RecipeFilterTests(TestCase):
+    """Test filtering recipes by tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='usman@gmail.com',
+            password='123456'
+        )
+        self.client.force_authenticate(self.user)
+        self.spicy = sample_tag(user=self.user, name='Spicy')
+        self.vegan = sample_tag(user=self.user, name='Vegan')
+        self.both = sample_recipe(user=self.user, title='Chana masala')
+        self.both.tags.add(self.spicy, self.vegan)
+        self.one = sample_recipe(user=self.user, title='Karahi')
+        self.one.tags.add(self.spicy)
+        sample_recipe(user=self.user, title='Kheer')
+
+    def filter_ids(self, params):
+        result = self.client.get(RECIPES_URL, params)
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in result.data]
+
+    def test_match_any_returns_each_recipe_once(self):
+        """Test recipes matching several tags are not duplicated"""
+        ids = self.filter_ids(
+            {'tags': f'{self.spicy.id},{self.vegan.id}'}
+        )
+
+        self.assertEqual(sorted(ids), [self.both.id, self.one.id])
+
+    def test_match_all(self):
+        """Test match=all returns recipes carrying every tag"""
+        ids = self.filter_ids({
+            'tags': f'{self.spicy.id},{self.vegan.id},{self.vegan.id}',
+            'match': 'all',
+        })
+
+        self.assertEqual(ids, [self.both.id])
+
+    def test_match_all_combines_tags_and_ingredients(self):
+        """Test match=all applies to tags and ingredients together"""
+        chickpeas = sample_ingredient(user=self.user, name='Chickpeas')
+        self.one.ingredients.add(chickpeas)
+
+        ids = self.filter_ids({
+            'tags': f'{self.spicy.id}',
+            'ingredients': f'{chickpeas.id}',
+            'match': 'all',
+        })
+
+        self.assertEqual(ids, [self.one.id])
+
+    def test_invalid_filters(self):
+        """Test malformed ids or match modes are rejected"""
+        result = self.client.get(RECIPES_URL, {'tags': '1,spicy'})
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', result.data)
+
+        result = self.client.get(
+            RECIPES_URL, {'tags': f'{self.spicy.id}', 'match': 'some'}
+        )
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('match', result.data)
+
+    def test_filter_query_has_no_join_or_distinct(self):
+        """Test the recipe rows are filtered with a semi-join"""
+        with CaptureQueriesContext(connection) as queries:
+            self.filter_ids(
+                {'tags': f'{self.spicy.id},{self.vegan.id}', 'match': 'all'}
+            )
+
+        sql = next(
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT "core_recipe"."id"')
+        )
+        self.assertNotIn('DISTINCT', sql)
+        self.assertNotIn('JOIN', sql)
+
+
+class RecipeQueryCountTests(TestCase):
+    """Test the recipe read endpoints run a fixed number of queries"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='usman@gmail.com',
+            password='123456'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = sample_tag(user=self.user, name='Spicy')
+        self.ingredient = sample_ingredient(user=self.user, name='Chicken')
+
+    def create_recipes(self, count):
+        """Create recipes with a few tags and ingredients each"""
+        recipes = []
+        for i in range(count):
+            recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                self.tag,
+                sample_tag(self.user, f'Tag {recipe.id}')
+            )
+            recipe.ingredients.add(
+                self.ingredient,
+                sample_ingredient(self.user, f'Ingredient {recipe.id}')
+            )
+            recipes.append(recipe)
+        return recipes
+
+    def test_list_query_count_is_constant(self):
+        """Test listing recipes does not query once per recipe"""
+        self.create_recipes(2)
+        with self.assertNumQueries(3):
+            result = self.client.get(RECIPES_URL)
+        self.assertEqual(len(result.data), 2)
+
+        self.create_recipes(10)
+        with self.assertNumQueries(3):
+            result = self.client.get(RECIPES_URL)
+        self.assertEqual(len(result.data), 12)
+
+    def test_filtered_list_query_count_is_constant(self):
+        """Test filtering recipes by tags and ingredients"""
+        self.create_recipes(10)
+        with self.assertNumQueries(3):
+            result = self.client.get(RECIPES_URL, {
+                'tags': f'{self.tag.id}',
+                'ingredients': f'{self.ingredient.id}',
+            })
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(result.data), 10)
+
+    def test_retrieve_query_count(self):
+        """Test retrieving a recipe loads its relations in bulk"""
+        recipe = self.create_recipes(1)[0]
+        with self.assertNumQueries(3):
+            result = self.client.get(detail_url(recipe.id))
+        self.assertEqual(len(result.data['tags']), 2)
+        self.assertEqual(len(result.data['ingredients']), 2)
+
+
+class RecipePaginationTests(TestCase):
+    """Test the opt-in cursor pagination of recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='usman@gmail.com',
+            password='123456'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_unpaginated_without_page_size(self):
+        """Test recipes are returned as a plain list by default"""
+        sample_recipe(user=self.user)
+
+        result = self.client.get(RECIPES_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(result.data, list)
+
+    def test_walk_pages_with_cursor(self):
+        """Test following the cursors returns every recipe once in order"""
+        recipes = [
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+
+        result = self.client.get(RECIPES_URL, {'page_size': 2})
+        seen = []
+        while True:
+            self.assertEqual(result.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(result.data['results']), 2)
+            seen.extend(recipe['id'] for recipe in result.data['results'])
+            if not result.data['next']:
+                break
+            result = self.client.get(result.data['next'])
+
+        self.assertEqual(seen, [recipe.id for recipe in recipes])
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is rejected"""
+        result = self.client.get(
+            RECIPES_URL,
+            {'page_size': 2, 'cursor': 'garbage'}
+        )
+
+        self.assertEqual(result.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecipeSparseFieldsetTests(TestCase):
+    """Test selecting recipe fields with ?fields="""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='usman@gmail.com',
+            password='123456'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user, title='Karahi')
+        self.recipe.tags.add(sample_tag(user=self.user))
+
+    def test_list_selected_fields(self):
+        """Test only the requested columns are loaded and returned"""
+        with CaptureQueriesContext(connection) as queries:
+            result = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            result.data, [{'id': self.recipe.id, 'title': 'Karahi'}]
+        )
+        self.assertEqual(len(queries), 1)
+        recipe_select = queries[0]['sql']
+        self.assertIn('"core_recipe"."title"', recipe_select)
+        self.assertNotIn('"core_recipe"."search_terms"', recipe_select)
+        self.assertNotIn('"core_recipe"."renditions"', recipe_select)
+
+    def test_list_prefetches_requested_relations(self):
+        """Test only requested relations are prefetched"""
+        with self.assertNumQueries(2):
+            result = self.client.get(RECIPES_URL, {'fields': 'title,tags'})
+
+        self.assertEqual(result.data, [{
+            'title': 'Karahi', 'tags': [self.recipe.tags.get().id],
+        }])
+
+    def test_retrieve_selected_fields(self):
+        """Test the detail view keeps nested objects for selected fields"""
+        tag = self.recipe.tags.get()
+
+        result = self.client.get(
+            detail_url(self.recipe.id), {'fields': 'title, tags'}
+        )
+
+        self.assertEqual(result.data, {
+            'title': 'Karahi', 'tags': [{'id': tag.id, 'name': tag.name}],
+        })
+
+    def test_paginate_selected_fields(self):
+        """Test cursors work when the ordering column is not requested"""
+        second = sample_recipe(user=self.user, title='Biryani')
+
+        result = self.client.get(
+            RECIPES_URL, {'fields': 'title', 'page_size': 1}
+        )
+        self.assertEqual(result.data['results'], [{'title': 'Karahi'}])
+        result = self.client.get(result.data['next'])
+
+        self.assertEqual(result.data['results'], [{'title': second.title}])
+
+    def test_unknown_field(self):
+        """Test requesting a field recipes do not have fails"""
+        result = self.client.get(RECIPES_URL, {'fields': 'title,secret'})
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('secret', result.data['fields'][0])
+
+    def test_fields_ignored_on_write(self):
+        """Test creating a recipe returns every field"""
+        result = self.client.post(RECIPES_URL + '?fields=id', {
+            'title': 'Daal', 'time_minutes': 20, 'price': '3.00',
+        })
+
+        self.assertEqual(result.status_code, status.HTTP_201_CREATED)
+        self.assertIn('title', result.data)
+
+
+class RecipeExportTests(TestCase):
+    """Test streaming the recipe library"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='usman@gmail.com',
+            password='123456'
+        )
+        self.client.force_authenticate(self.user)
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        for i in range(5):
+            recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+    def expected_records(self):
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        serializer = RecipeDetailSerializer(recipes, many=True)
+        return json.loads(json.dumps(serializer.data))
+
+    def test_export_ndjson(self):
+        """Test exporting recipes one JSON document per line"""
+        other = get_user_model().objects.create_user(
+            email='usman1@gmail.com',
+            password='123456'
+        )
+        sample_recipe(user=other)
+
+        result = self.client.get(EXPORT_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertTrue(result.streaming)
+        self.assertTrue(
+            result['Content-Type'].startswith('application/x-ndjson')
+        )
+        lines = b''.join(result.streaming_content).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(records, self.expected_records())
+
+    def test_export_json_array(self):
+        """Test exporting recipes as a single JSON array"""
+        result = self.client.get(EXPORT_URL, {'format': 'json'})
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        content = b''.join(result.streaming_content)
+        self.assertEqual(json.loads(content), self.expected_records())
+
+    @patch('recipe.views.RecipeViewSet.export_chunk_size', 2)
+    def test_export_queries_per_chunk(self):
+        """Test relations are loaded once per chunk, not per recipe"""
+        result = self.client.get(EXPORT_URL)
+
+        # Three chunks of at most two recipes, each with two prefetches.
+        with self.assertNumQueries(9):
+            content = b''.join(result.streaming_content)
+        self.assertEqual(len(content.splitlines()), 5)
+
+
+class RecipeBulkApiTests(TestCase):
+    """Test creating, updating and deleting recipes in bulk"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='usman@gmail.com',
+            password='123456'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_recipes(self):
+        """Test creating many recipes with their relations"""
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {
+                'title': 'Lime cheesecake',
+                'price': '5.00',
+                'time_minutes': 10,
+                'tags': [tag1.id, tag2.id],
+                'ingredients': [ingredient.id],
+            },
+            {
+                'title': 'Plain cheesecake',
+                'price': '4.00',
+                'time_minutes': 20,
+                'tags': [tag2.id],
+                'ingredients': [],
+            },
+        ]
+
+        result = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(result.data), 2)
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(
+            [recipe.title for recipe in recipes],
+            ['Lime cheesecake', 'Plain cheesecake']
+        )
+        self.assertEqual(
+            set(recipes[0].tags.values_list('id', flat=True)),
+            {tag1.id, tag2.id}
+        )
+        self.assertEqual(recipes[0].ingredients.get(), ingredient)
+        self.assertEqual(recipes[1].tags.get(), tag2)
+        serializer = RecipeSerializer(recipes, many=True)
+        self.assertEqual(result.data, serializer.data)
+
+    def test_bulk_create_reports_errors_per_item(self):
+        """Test an invalid item rejects the whole batch"""
+        item = {'price': '5.00', 'time_minutes': 10,
+                'tags': [], 'ingredients': []}
+        payload = [{'title': 'Good', **item}, {'title': '', **item}]
+
+        result = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(result.data[0], {})
+        self.assertIn('title', result.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_partial_update_recipes(self):
+        """Test updating many recipes only touches the given fields"""
+        old_tag = sample_tag(user=self.user, name='Old')
+        new_tag = sample_tag(user=self.user, name='New')
+        recipe1 = sample_recipe(user=self.user, title='Biryani')
+        recipe2 = sample_recipe(user=self.user, title='Pulao')
+        recipe1.tags.add(old_tag)
+        recipe2.tags.add(old_tag)
+        payload = [
+            {'id': recipe1.id, 'title': 'Chicken biryani'},
+            {'id': recipe2.id, 'tags': [new_tag.id]},
+        ]
+
+        result = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertEqual(recipe1.title, 'Chicken biryani')
+        self.assertEqual(recipe2.title, 'Pulao')
+        self.assertEqual(recipe1.tags.get(), old_tag)
+        self.assertEqual(recipe2.tags.get(), new_tag)
+        self.assertEqual(result.data[1]['tags'], [new_tag.id])
+
+    def test_bulk_update_unknown_recipe(self):
+        """Test updating another user's recipe is reported per item"""
+        other = get_user_model().objects.create_user(
+            email='usman1@gmail.com',
+            password='123456'
+        )
+        recipe = sample_recipe(user=self.user)
+        foreign = sample_recipe(user=other)
+        payload = [
+            {'id': recipe.id, 'title': 'Changed'},
+            {'id': foreign.id, 'title': 'Changed'},
+            {'title': 'No id'},
+        ]
+
+        result = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(result.data[0], {})
+        self.assertIn('id', result.data[1])
+        self.assertIn('id', result.data[2])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'sample recipe')
+
+    def test_bulk_delete_recipes(self):
+        """Test deleting many recipes at once"""
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        keep = sample_recipe(user=self.user)
+        recipe1.tags.add(sample_tag(user=self.user))
+
+        result = self.client.delete(
+            BULK_URL, [recipe1.id, recipe2.id], format='json'
+        )
+
+        self.assertEqual(result.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(Recipe.objects.values_list('id', flat=True)), [keep.id]
+        )
+
+    def test_bulk_delete_unknown_recipe(self):
+        """Test nothing is deleted when one of the ids is not found"""
+        recipe = sample_recipe(user=self.user)
+
+        result = self.client.delete(
+            BULK_URL, [recipe.id, recipe.id + 100], format='json'
+        )
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(result.data[0], {})
+        self.assertIn('id', result.data[1])
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_bulk_requires_a_list(self):
+        """Test a single object is not accepted by the bulk endpoint"""
+        payload = {'title': 'Biryani', 'price': '5.00', 'time_minutes': 10}
+
+        result = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeRelationValidationTests(TestCase):
+    """Test validating the tags and ingredients of a recipe"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='usman@gmail.com',
+            password='123456'
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_payload(self, count):
+        """Return a recipe payload with ``count`` tags and ingredients"""
+        return {
+            'title': 'Karahi',
+            'price': '5.00',
+            'time_minutes': 10,
+            'tags': [
+                sample_tag(self.user, f'Tag {count}.{i}').id
+                for i in range(count)
+            ],
+            'ingredients': [
+                sample_ingredient(self.user, f'Ingredient {count}.{i}').id
+                for i in range(count)
+            ],
+        }
+
+    def count_queries(self, method, url, payload):
+        with CaptureQueriesContext(connection) as queries:
+            result = method(url, payload, format='json')
+        self.assertLess(result.status_code, 300, result.data)
+        return len(queries)
+
+    def test_create_query_count_constant(self):
+        """Test create cost does not grow with the number of relations"""
+        few = self.count_queries(
+            self.client.post, RECIPES_URL, self.create_payload(2)
+        )
+        many = self.count_queries(
+            self.client.post, RECIPES_URL, self.create_payload(40)
+        )
+
+        self.assertEqual(few, many)
+
+    def test_update_query_count_constant(self):
+        """Test update cost does not grow with the number of relations"""
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        few = self.count_queries(
+            self.client.put, detail_url(recipe1.id), self.create_payload(2)
+        )
+        many = self.count_queries(
+            self.client.put, detail_url(recipe2.id), self.create_payload(40)
+        )
+
+        self.assertEqual(few, many)
+
+    def test_relations_limited_to_user(self):
+        """Test tags of another user can not be attached to a recipe"""
+        other = get_user_model().objects.create_user(
+            email='usman1@gmail.com',
+            password='123456'
+        )
+        payload = self.create_payload(1)
+        payload['tags'].append(sample_tag(other, 'Foreign').id)
+
+        result = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', result.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_missing_relations_reported_together(self):
+        """Test every unknown id is listed in a single error"""
+        payload = self.create_payload(1)
+        payload['ingredients'] += [9998, 9999]
+
+        result = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(result.data['ingredients']), 1)
+        self.assertIn('9998', result.data['ingredients'][0])
+        self.assertIn('9999', result.data['ingredients'][0])
+
+    def test_invalid_relation_type(self):
+        """Test a non numeric id is rejected"""
+        payload = self.create_payload(1)
+        payload['tags'] = ['abc']
+
+        result = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', result.data)
+
+
+class RecipeRelationUpdateTests(TestCase):
+    """Test recipe updates only write the relation rows that changed"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='usman@gmail.com',
+            password='123456'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag1 = sample_tag(user=self.user, name='Spicy')
+        self.tag2 = sample_tag(user=self.user, name='Sweet')
+        self.tag3 = sample_tag(user=self.user, name='Sour')
+        self.recipe = sample_recipe(user=self.user)
+        self.recipe.tags.add(self.tag1, self.tag2)
+        self.recipe.ingredients.add(sample_ingredient(user=self.user))
+
+    def through_queries(self, queries, table):
+        """Return the statements that read or write ``table`` directly"""
+        pattern = re.compile(rf'(FROM|INTO|UPDATE) "{table}"')
+        return [
+            query['sql'] for query in queries.captured_queries
+            if pattern.search(query['sql'])
+        ]
+
+    def test_patch_without_relations_skips_through_tables(self):
+        """Test a PATCH of plain fields leaves the through tables alone"""
+        with CaptureQueriesContext(connection) as queries:
+            result = self.client.patch(
+                detail_url(self.recipe.id), {'title': 'Karahi'}
+            )
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.through_queries(queries, 'core_recipe_tags'), []
+        )
+        self.assertEqual(
+            self.through_queries(queries, 'core_recipe_ingredients'), []
+        )
+
+    def test_patch_writes_only_the_difference(self):
+        """Test changing one tag issues one DELETE and one INSERT"""
+        payload = {'tags': [self.tag2.id, self.tag3.id]}
+        with CaptureQueriesContext(connection) as queries:
+            result = self.client.patch(
+                detail_url(self.recipe.id), payload, format='json'
+            )
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        statements = self.through_queries(queries, 'core_recipe_tags')
+        self.assertEqual(
+            [sql.split()[0] for sql in statements
+             if not sql.startswith('SELECT')],
+            ['DELETE', 'INSERT']
+        )
+        self.assertEqual(
+            [sql for sql in
+             self.through_queries(queries, 'core_recipe_ingredients')
+             if not sql.startswith('SELECT')],
+            []
+        )
+        self.assertEqual(
+            set(self.recipe.tags.values_list('id', flat=True)),
+            {self.tag2.id, self.tag3.id}
+        )
+
+    def test_patch_with_unchanged_relations(self):
+        """Test resubmitting the same tags does not write through rows"""
+        payload = {'tags': [self.tag1.id, self.tag2.id]}
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(
+                detail_url(self.recipe.id), payload, format='json'
+            )
+
+        statements = self.through_queries(queries, 'core_recipe_tags')
+        self.assertEqual(
+            [sql.split()[0] for sql in statements
+             if not sql.startswith('SELECT')],
+            []
+        )
@@ -0,0 +1,129 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+UPSERT_TAGS_URL = reverse('recipe:tag-upsert')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    default = {'title': 'sample recipe', 'price': 5.00, 'time_minutes': 10}
+    default.update(params)
+    return Recipe.objects.create(user=user, **default)
+
+
+class ResponseCacheTests(TestCase):
+    """Test the per user response cache of the recipe API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='usman@gmail.com',
+            password='123456'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_repeated_list_served_from_cache(self):
+        """Test an unchanged list is answered without queries"""
+        sample_recipe(user=self.user)
+        first = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPES_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_if_none_match_returns_not_modified(self):
+        """Test a matching ETag gets a 304 without touching the ORM"""
+        first = self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            result = self.client.get(
+                TAGS_URL, HTTP_IF_NONE_MATCH=first['ETag']
+            )
+
+        self.assertEqual(result.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(result['ETag'], first['ETag'])
+        self.assertEqual(result.content, b'')
+
+    def test_write_expires_cached_list(self):
+        """Test creating a tag changes the list and its ETag"""
+        first = self.client.get(TAGS_URL)
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        result = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(result['ETag'], first['ETag'])
+        self.assertEqual(len(result.data), 1)
+
+    def test_relation_change_expires_cached_detail(self):
+        """Test adding a tag to a recipe changes its detail"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(detail_url(recipe.id))
+
+        recipe.tags.add(tag)
+        result = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(
+            result.data['tags'], [{'id': tag.id, 'name': 'Vegan'}]
+        )
+
+    def test_bulk_writes_expire_cache(self):
+        """Test bulk endpoints expire the cached lists"""
+        self.client.get(RECIPES_URL)
+        self.client.get(TAGS_URL)
+        payload = [{
+            'title': 'Biryani', 'price': '5.00', 'time_minutes': 10,
+            'tags': [], 'ingredients': [],
+        }]
+
+        self.client.post(BULK_URL, payload, format='json')
+        self.client.post(UPSERT_TAGS_URL, {'names': ['Vegan']}, format='json')
+
+        self.assertEqual(len(self.client.get(RECIPES_URL).data), 1)
+        self.assertEqual(len(self.client.get(TAGS_URL).data), 1)
+
+    def test_query_string_is_part_of_key(self):
+        """Test different filters are cached separately"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        sample_recipe(user=self.user)
+
+        everything = self.client.get(RECIPES_URL)
+        filtered = self.client.get(RECIPES_URL, {'tags': str(tag.id)})
+
+        self.assertEqual(len(everything.data), 2)
+        self.assertEqual(len(filtered.data), 1)
+        self.assertNotEqual(everything['ETag'], filtered['ETag'])
+
+    def test_cache_is_per_user(self):
+        """Test users never see each other's cached responses"""
+        sample_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+        other = get_user_model().objects.create_user(
+            email='usman1@gmail.com',
+            password='123456'
+        )
+        self.client.force_authenticate(other)
+
+        result = self.client.get(RECIPES_URL)
+
+        self.assertEqual(result.data, [])
@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.rows import RowSerializer, ordered_prefetch
+from recipe.serializers import RecipeDetailSerializer, \
+    RecipeImageSerializer, RecipeSerializer, TagSerializer
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RowSerializerTests(TestCase):
+    """Test serializing recipes from values() rows"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass'
+        )
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dinner', 'Spicy')
+        ]
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        self.recipes = [
+            Recipe.objects.create(
+                user=self.user, title='Daal', time_minutes=30, price='4.50'
+            ),
+            Recipe.objects.create(
+                user=self.user, title='Pulao', time_minutes=45, price='7.00',
+                link='https://example.com/pulao'
+            ),
+            Recipe.objects.create(
+                user=self.user, title='Toast', time_minutes=5, price='1.00'
+            ),
+        ]
+        self.recipes[0].tags.add(tags[2], tags[0])
+        self.recipes[0].ingredients.add(ingredient)
+        self.recipes[1].tags.add(tags[1])
+
+    def assert_same_output(self, serializer_class):
+        queryset = Recipe.objects.order_by('id')
+        expected = serializer_class(
+            queryset.prefetch_related(
+                *ordered_prefetch(Recipe, ('tags', 'ingredients'))
+            ),
+            many=True
+        ).data
+        rows = RowSerializer.compile(serializer_class())
+
+        self.assertIsNotNone(rows)
+        self.assertEqual(
+            rows.serialize(rows.queryset(queryset)),
+            [dict(item) for item in expected]
+        )
+
+    def test_list_output(self):
+        """Test rows serialize like RecipeSerializer"""
+        self.assert_same_output(RecipeSerializer)
+
+    def test_detail_output(self):
+        """Test nested tags and ingredients serialize like the detail"""
+        self.assert_same_output(RecipeDetailSerializer)
+
+    def test_sparse_fields(self):
+        """Test only the requested fields are loaded and returned"""
+        rows = RowSerializer.compile(RecipeSerializer(fields=('title',)))
+
+        self.assertEqual(rows.columns(), ['id', 'title'])
+        self.assertEqual(
+            rows.serialize(rows.queryset(Recipe.objects.order_by('id'))),
+            [{'title': 'Daal'}, {'title': 'Pulao'}, {'title': 'Toast'}]
+        )
+
+    def test_unsupported_fields(self):
+        """Test serializers with files or custom output do not compile"""
+        self.assertIsNone(RowSerializer.compile(RecipeImageSerializer()))
+
+        class UpperTagSerializer(TagSerializer):
+            def to_representation(self, instance):
+                return {'name': instance.name.upper()}
+
+        self.assertIsNone(RowSerializer.compile(UpperTagSerializer()))
+
+    def test_list_endpoint(self):
+        """Test the list endpoint returns relations in key order"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        result = client.get(RECIPES_URL)
+
+        first = result.data[0]
+        self.assertEqual(first['tags'], sorted(first['tags']))
+        self.assertEqual(len(first['tags']), 2)
+        self.assertEqual(result.data[2]['tags'], [])
@@ -0,0 +1,151 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'sample recipe',
+        'price': 5.00,
+        'time_minutes': 10
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeSearchTests(TestCase):
+    """Test searching recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, text):
+        res = self.client.get(RECIPES_URL, {'search': text})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in res.data]
+
+    def test_search_title_tags_and_ingredients(self):
+        """Test search matches titles, tag names and ingredient names"""
+        curry = sample_recipe(self.user, title='Thai curry')
+        soup = sample_recipe(self.user, title='Tomato soup')
+        soup.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        salad = sample_recipe(self.user, title='Salad')
+        salad.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Curry leaves')
+        )
+
+        self.assertEqual(self.search('curry'), [curry.id, salad.id])
+        self.assertEqual(self.search('vegan'), [soup.id])
+        self.assertEqual(self.search('tomato vegan'), [soup.id])
+        self.assertEqual(self.search('tomato curry'), [])
+
+    def test_search_limited_to_user(self):
+        """Test search only returns the user's own recipes"""
+        other = get_user_model().objects.create_user(
+            'other@test.com',
+            'testpass'
+        )
+        sample_recipe(other, title='Thai curry')
+        recipe = sample_recipe(self.user, title='Green curry')
+
+        self.assertEqual(self.search('curry'), [recipe.id])
+
+    def test_search_follows_relation_changes(self):
+        """Test stored search terms follow relation changes and renames"""
+        recipe = sample_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Spicy')
+        recipe.tags.add(tag)
+        self.assertEqual(self.search('spicy'), [recipe.id])
+
+        tag.name = 'Mild'
+        tag.save()
+        self.assertEqual(self.search('spicy'), [])
+        self.assertEqual(self.search('mild'), [recipe.id])
+
+        tag.recipe_set.clear()
+        self.assertEqual(self.search('mild'), [])
+
+        recipe.tags.add(tag)
+        tag.delete()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.search_terms, '')
+
+    def test_search_after_update(self):
+        """Test updating a recipe's relations through the API"""
+        recipe = sample_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+
+        self.client.patch(
+            reverse('recipe:recipe-detail', args=[recipe.id]),
+            {'tags': [tag.id]}
+        )
+
+        self.assertEqual(self.search('breakfast'), [recipe.id])
+
+    def test_search_after_bulk_create(self):
+        """Test bulk created recipes are searchable by their relations"""
+        tag = Tag.objects.create(user=self.user, name='Dessert')
+        ingredient = Ingredient.objects.create(user=self.user, name='Sugar')
+        payload = [
+            {'title': 'Cake', 'price': 3, 'time_minutes': 30,
+             'tags': [tag.id], 'ingredients': [ingredient.id]},
+            {'title': 'Toast', 'price': 1, 'time_minutes': 5,
+             'tags': [], 'ingredients': []},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        cake = Recipe.objects.get(title='Cake')
+        self.assertEqual(cake.search_terms, 'Dessert Sugar')
+        self.assertEqual(self.search('sugar'), [cake.id])
+
+    def test_search_ranks_title_matches_first(self):
+        """Test recipes matching in the title rank above other matches"""
+        tagged = sample_recipe(self.user, title='Stew')
+        tagged.tags.add(Tag.objects.create(user=self.user, name='Lentil'))
+        titled = sample_recipe(self.user, title='Lentil soup')
+
+        self.assertEqual(self.search('lentil'), [titled.id, tagged.id])
+
+    def test_paginated_search_keeps_ranking(self):
+        """Test search pages follow relevance, ties in id order"""
+        tagged = []
+        for title in ('Stew', 'Dal', 'Soup'):
+            recipe = sample_recipe(self.user, title=title)
+            recipe.tags.add(
+                Tag.objects.get_or_create(user=self.user, name='Lentil')[0]
+            )
+            tagged.append(recipe.id)
+        titled = [
+            sample_recipe(self.user, title=f'Lentil {name}').id
+            for name in ('curry', 'salad')
+        ]
+        sample_recipe(self.user, title='Toast')
+
+        ids = []
+        params = {'search': 'lentil', 'page_size': 2}
+        url = RECIPES_URL
+        while url:
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+            url, params = res.data['next'], None
+
+        self.assertEqual(ids, titled + tagged)
+        self.assertEqual(self.search('lentil'), titled + tagged)
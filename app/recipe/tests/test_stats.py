@@ -0,0 +1,361 @@
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag, UserRecipeStats
+from recipe.stats import rebuild_stats
+
+STATS_URL = reverse('recipe:recipe-stats')
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+STATS_COLUMNS = (
+    'recipe_count', 'time_minutes_total', 'time_minutes', 'price_total',
+    'price_buckets', 'tags', 'ingredients',
+)
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    default = {'title': 'Karahi', 'price': '12.50', 'time_minutes': 30}
+    default.update(params)
+    return Recipe.objects.create(user=user, **default)
+
+
+class RecipeStatsTests(TestCase):
+    """Test the per user recipe statistics"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'usman@gmail.com', '123456'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag1 = Tag.objects.create(user=self.user, name='Dinner')
+        self.tag2 = Tag.objects.create(user=self.user, name='Spicy')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Chicken'
+        )
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(self.tag1)
+        rebuild_stats([self.user.pk])
+
+    def stored(self, user=None):
+        """Return the stored statistics of ``user``"""
+        stats = UserRecipeStats.objects.get(user=user or self.user)
+        return {name: getattr(stats, name) for name in STATS_COLUMNS}
+
+    def assertStatsRebuildable(self, user=None):
+        """Assert the incremental statistics equal a full rebuild"""
+        user = user or self.user
+        incremental = self.stored(user)
+        rebuild_stats([user.pk])
+        self.assertEqual(incremental, self.stored(user))
+
+    def test_stats_built_on_first_read(self):
+        """Test the statistics of a user without any are computed"""
+        UserRecipeStats.objects.all().delete()
+        sample_recipe(self.user, time_minutes=10, price='4.00')
+
+        result = self.client.get(STATS_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data['recipe_count'], 2)
+        self.assertEqual(result.data['time_minutes'], {
+            'average': 20, 'median': 20, 'min': 10, 'max': 30,
+        })
+        self.assertEqual(result.data['price']['average'], '8.25')
+        self.assertEqual(result.data['price']['total'], '16.50')
+        self.assertEqual(
+            [item['count'] for item in result.data['price']['distribution']],
+            [1, 0, 1, 0, 0, 0]
+        )
+        self.assertEqual(result.data['price']['distribution'][0], {
+            'min': None, 'max': '5.00', 'count': 1,
+        })
+        self.assertEqual(result.data['top_tags'], [
+            {'id': self.tag1.id, 'name': 'Dinner', 'count': 1},
+        ])
+        self.assertEqual(result.data['top_ingredients'], [])
+
+    def test_stats_without_recipes(self):
+        """Test the statistics of a user without recipes"""
+        Recipe.objects.all().delete()
+
+        result = self.client.get(STATS_URL)
+
+        self.assertEqual(result.data['recipe_count'], 0)
+        self.assertIsNone(result.data['time_minutes']['median'])
+        self.assertIsNone(result.data['price']['average'])
+        self.assertEqual(result.data['price']['total'], '0.00')
+
+    def test_stats_limited_to_user(self):
+        """Test recipes of other users are not counted"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', '123456'
+        )
+        sample_recipe(other)
+
+        result = self.client.get(STATS_URL)
+
+        self.assertEqual(result.data['recipe_count'], 1)
+
+    def test_top_limit(self):
+        """Test ``top`` limits the tags and breaks ties by id"""
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(self.tag1, self.tag2)
+
+        result = self.client.get(STATS_URL, {'top': 1})
+
+        self.assertEqual(
+            [tag['name'] for tag in result.data['top_tags']], ['Dinner']
+        )
+
+    def test_invalid_top(self):
+        """Test an out of range ``top`` is rejected"""
+        for value in ('0', '101', 'many'):
+            result = self.client.get(STATS_URL, {'top': value})
+
+            self.assertEqual(
+                result.status_code, status.HTTP_400_BAD_REQUEST
+            )
+            self.assertIn('top', result.data)
+
+    def test_create_recipe(self):
+        """Test creating a recipe through the API updates the stats"""
+        self.client.post(RECIPES_URL, {
+            'title': 'Nihari', 'price': '60.00', 'time_minutes': 240,
+            'tags': [self.tag1.id, self.tag2.id],
+            'ingredients': [self.ingredient.id],
+        }, format='json')
+
+        self.assertEqual(self.stored()['recipe_count'], 2)
+        self.assertEqual(self.stored()['tags'], {
+            str(self.tag1.id): 2, str(self.tag2.id): 1,
+        })
+        self.assertStatsRebuildable()
+
+    def test_update_recipe(self):
+        """Test changing the fields and relations of a recipe"""
+        recipe = Recipe.objects.get()
+        self.client.patch(detail_url(recipe.id), {
+            'price': '120.00', 'time_minutes': 45,
+            'tags': [self.tag2.id], 'ingredients': [self.ingredient.id],
+        }, format='json')
+
+        self.assertEqual(self.stored()['time_minutes'], {'45': 1})
+        self.assertEqual(self.stored()['tags'], {str(self.tag2.id): 1})
+        self.assertStatsRebuildable()
+
+    def test_update_deferred_recipe(self):
+        """Test saving a recipe loaded without its counted fields"""
+        recipe = Recipe.objects.only('id', 'title').get()
+        recipe.price = 1
+        recipe.save()
+
+        self.assertEqual(self.stored()['price_buckets'], [1, 0, 0, 0, 0, 0])
+        self.assertStatsRebuildable()
+
+    def test_interleaved_updates(self):
+        """Test an update counts from the stored values, not loaded ones"""
+        first = Recipe.objects.get()
+        second = Recipe.objects.get()
+        first.price = 1
+        first.time_minutes = 10
+        first.save()
+
+        second.price = 60
+        second.time_minutes = 45
+        second.save()
+
+        self.assertEqual(self.stored()['time_minutes'], {'45': 1})
+        self.assertEqual(self.stored()['price_buckets'], [0, 0, 0, 0, 1, 0])
+        self.assertStatsRebuildable()
+
+    def test_move_recipe_to_other_user(self):
+        """Test a recipe changing owner moves its counts along"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', '123456'
+        )
+        rebuild_stats([other.pk])
+        recipe = Recipe.objects.get()
+        recipe.user = other
+        recipe.save()
+
+        self.assertEqual(self.stored()['recipe_count'], 0)
+        self.assertEqual(self.stored()['tags'], {})
+        self.assertEqual(self.stored(other)['tags'], {str(self.tag1.id): 1})
+        self.assertStatsRebuildable()
+        self.assertStatsRebuildable(other)
+
+    def test_reverse_relation_changes(self):
+        """Test changing recipes from the tag side"""
+        recipe = sample_recipe(self.user)
+        self.tag2.recipe_set.add(recipe, Recipe.objects.first())
+        self.assertStatsRebuildable()
+
+        self.tag2.recipe_set.remove(recipe)
+        self.assertStatsRebuildable()
+
+        self.tag1.recipe_set.clear()
+        self.assertEqual(self.stored()['tags'], {str(self.tag2.id): 1})
+        self.assertStatsRebuildable()
+
+    def test_delete_recipe(self):
+        """Test deleting a recipe removes its counts"""
+        self.client.delete(detail_url(Recipe.objects.get().id))
+
+        self.assertEqual(self.stored()['recipe_count'], 0)
+        self.assertEqual(self.stored()['tags'], {})
+        self.assertStatsRebuildable()
+
+    def test_delete_tag(self):
+        """Test a deleted tag drops out of the statistics"""
+        self.tag1.delete()
+
+        result = self.client.get(STATS_URL)
+
+        self.assertEqual(result.data['top_tags'], [])
+        self.assertStatsRebuildable()
+
+    def test_bulk_changes(self):
+        """Test bulk creates, updates and deletes keep the stats exact"""
+        result = self.client.post(BULK_URL, [
+            {'title': 'Nihari', 'price': '60.00', 'time_minutes': 240,
+             'tags': [self.tag1.id, self.tag2.id], 'ingredients': []},
+            {'title': 'Haleem', 'price': '8.00', 'time_minutes': 180,
+             'tags': [], 'ingredients': [self.ingredient.id]},
+        ], format='json')
+        ids = [item['id'] for item in result.data]
+        self.assertEqual(self.stored()['recipe_count'], 3)
+        self.assertStatsRebuildable()
+
+        self.client.patch(BULK_URL, [
+            {'id': ids[0], 'price': '7.00', 'tags': [self.tag2.id]},
+            {'id': ids[1], 'time_minutes': 20},
+        ], format='json')
+        self.assertEqual(self.stored()['time_minutes'], {
+            '20': 1, '30': 1, '240': 1,
+        })
+        self.assertStatsRebuildable()
+
+        self.client.delete(BULK_URL, ids, format='json')
+        self.assertEqual(self.stored()['recipe_count'], 1)
+        self.assertStatsRebuildable()
+
+    def test_median_of_even_count(self):
+        """Test the median averages the two middle times"""
+        sample_recipe(self.user, time_minutes=10)
+        sample_recipe(self.user, time_minutes=10)
+        sample_recipe(self.user, time_minutes=60)
+
+        result = self.client.get(STATS_URL)
+
+        self.assertEqual(result.data['time_minutes']['median'], 20)
+
+    def test_rebuild_sets_updated(self):
+        """Test a rebuild records when it happened"""
+        old = timezone.now() - timedelta(days=1)
+        UserRecipeStats.objects.filter(user=self.user).update(updated=old)
+
+        rebuild_stats([self.user.pk])
+
+        stats = UserRecipeStats.objects.get(user=self.user)
+        self.assertGreater(stats.updated, old)
+
+    def test_rebuild_command(self):
+        """Test the command recomputes stale statistics"""
+        UserRecipeStats.objects.filter(user=self.user).update(recipe_count=9)
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', '123456'
+        )
+        out = StringIO()
+
+        call_command('rebuild_recipe_stats', email=[self.user.email],
+                     stdout=out)
+
+        self.assertEqual(self.stored()['recipe_count'], 1)
+        self.assertFalse(UserRecipeStats.objects.filter(user=other).exists())
+        self.assertIn('1 users', out.getvalue())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs row level locks')
+class ConcurrentStatsTests(TransactionTestCase):
+    """Test concurrent recipe updates in separate transactions"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'usman@gmail.com', '123456'
+        )
+        sample_recipe(self.user)
+        rebuild_stats([self.user.pk])
+
+    def start(self, target):
+        def run():
+            try:
+                target()
+            finally:
+                connection.close()
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_concurrent_updates(self):
+        """Test the second update waits for and counts from the first"""
+        first = Recipe.objects.get()
+        second = Recipe.objects.get()
+        saved = threading.Event()
+        commit = threading.Event()
+        finished = []
+
+        def update_first():
+            with transaction.atomic():
+                first.price = 1
+                first.time_minutes = 10
+                first.save()
+                saved.set()
+                commit.wait(5)
+            finished.append('first')
+
+        def update_second():
+            saved.wait(5)
+            second.price = 60
+            second.time_minutes = 45
+            second.save()
+            finished.append('second')
+
+        threads = [self.start(update_first), self.start(update_second)]
+        # Give the second save time to block on the row lock.
+        time.sleep(0.2)
+        commit.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(finished, ['first', 'second'])
+        stats = UserRecipeStats.objects.get(user=self.user)
+        self.assertEqual(stats.time_minutes, {'45': 1})
+        self.assertEqual(stats.price_buckets, [0, 0, 0, 0, 1, 0])
+        incremental = {name: getattr(stats, name) for name in STATS_COLUMNS}
+        rebuild_stats([self.user.pk])
+        stats.refresh_from_db()
+        self.assertEqual(
+            incremental,
+            {name: getattr(stats, name) for name in STATS_COLUMNS}
+        )
@@ -8,6 +8,7 @@ from core.models import Tag, Recipe
 from recipe.serializers import TagSerializer
 
 TAGS_URL = reverse('recipe:tag-list')
+UPSERT_TAGS_URL = reverse('recipe:tag-upsert')
 
 
 class PublicTagsApiTests(TestCase):
@@ -91,3 +92,88 @@ class PrivateTagsApiTests(TestCase):
 
         self.assertIn(serializer1.data, result.data)
         self.assertNotIn(serializer2.data, result.data)
+
+    def test_retrieve_assigned_tags_unique(self):
+        """Test assigned_only lists a tag once however many recipes use it"""
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Lunch')
+        for title in ('Paratha', 'Omelette'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=10,
+                price=5.0,
+                user=self.user,
+            )
+            recipe.tags.add(tag)
+
+        result = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(result.data, [TagSerializer(tag).data])
+
+    def test_paginate_tags_by_name(self):
+        """Test tags are paginated in name order with stable cursors"""
+        for name in ('Vegan', 'Butter', 'Spicy', 'Sweet'):
+            Tag.objects.create(user=self.user, name=name)
+
+        result = self.client.get(TAGS_URL, {'page_size': 3})
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        first_page = result.data['results']
+        result = self.client.get(result.data['next'])
+        second_page = result.data['results']
+
+        tags = Tag.objects.order_by('-name')
+        serializer = TagSerializer(tags, many=True)
+        self.assertEqual(first_page + second_page, serializer.data)
+        self.assertIsNone(result.data['next'])
+
+    def test_retrieve_tag_names_only(self):
+        """Test listing only the names of tags"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        result = self.client.get(TAGS_URL, {'fields': 'name'})
+
+        self.assertEqual(result.data, [{'name': 'Vegan'}, {'name': 'Dessert'}])
+
+    def test_create_duplicate_tag(self):
+        """Test creating a tag with a name the user already has fails"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        result = self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_upsert_tags(self):
+        """Test upserting names creates the missing tags only"""
+        existing = Tag.objects.create(user=self.user, name='Vegan')
+        other = get_user_model().objects.create(
+            email='usman1@gmail.com',
+            password='123456'
+        )
+        Tag.objects.create(user=other, name='Spicy')
+        payload = {'names': ['Spicy', 'Vegan', 'Spicy', 'Dessert']}
+
+        with self.assertNumQueries(2):
+            result = self.client.post(UPSERT_TAGS_URL, payload, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag['name'] for tag in result.data],
+            ['Spicy', 'Vegan', 'Dessert']
+        )
+        self.assertEqual(result.data[1]['id'], existing.id)
+        tags = Tag.objects.filter(user=self.user)
+        self.assertEqual(tags.count(), 3)
+        self.assertEqual(
+            sorted(tag['id'] for tag in result.data),
+            sorted(tags.values_list('id', flat=True))
+        )
+
+    def test_upsert_tags_invalid(self):
+        """Test upserting requires a non empty list of names"""
+        result = self.client.post(
+            UPSERT_TAGS_URL, {'names': []}, format='json'
+        )
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
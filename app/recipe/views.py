@@ -1,32 +1,87 @@
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
+from rest_framework import viewsets, mixins, status, \
+    serializers as drf_serializers
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 
+from core.authentication import CachedTokenAuthentication
 from core.models import Tag, Ingredient, Recipe
 from recipe import serializers
+from recipe.cache import CachedResponseMixin, invalidate_user_responses
+from recipe.export import NDJSONRenderer, iter_records, stream_json, \
+    stream_ndjson
+from recipe.filters import filter_assigned, filter_by_related, \
+    parse_ids, parse_match
+from recipe.pagination import RecipeAttrCursorPagination, \
+    RecipeCursorPagination, RecipeSearchCursorPagination
+from recipe.rows import RowListMixin, RowRetrieveMixin
+from recipe.search import search_recipes
+from recipe.sparse import SparseFieldsetMixin
+from recipe.stats import apply_deltas, get_user_stats, \
+    recipe_contributions, subtract, summarize, suspend_stats
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
-                         mixins.ListModelMixin,
-                         mixins.CreateModelMixin):
-    authentication_classes = (TokenAuthentication,)
+class BaseRecipeAttrViewSet(CachedResponseMixin,
+                            SparseFieldsetMixin,
+                            RowListMixin,
+                            viewsets.GenericViewSet,
+                            mixins.ListModelMixin,
+                            mixins.CreateModelMixin):
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttrCursorPagination
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
         assigned_only = bool(self.request.query_params.get('assigned_only'))
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = filter_assigned(queryset)
 
-        return queryset.filter(user=self.request.user).order_by('-name')
+        queryset = queryset.filter(user=self.request.user).order_by('-name')
+        return self.narrow_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
 
     def perform_create(self, serializer):
         """serializer is not a keyword"""
         """Create a new tag"""
-        return serializer.save(user=self.request.user)
+        try:
+            with transaction.atomic():
+                return serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise drf_serializers.ValidationError(
+                {'name': ['This name already exists.']}
+            )
+
+    @action(methods=['POST'], detail=False)
+    def upsert(self, request):
+        """Return the objects for a list of names, creating missing ones"""
+        serializer = serializers.NameListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        names = list(dict.fromkeys(serializer.validated_data['names']))
+
+        model = self.queryset.model
+        # Conflicting inserts are skipped by the (user, name) constraint,
+        # so concurrent imports of the same names converge on one row.
+        model.objects.bulk_create(
+            [model(user=request.user, name=name) for name in names],
+            batch_size=serializers.BULK_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        invalidate_user_responses(request.user.pk)
+        objects = {
+            obj.name: obj for obj in
+            model.objects.filter(user=request.user, name__in=names)
+        }
+        serializer = self.get_serializer(
+            [objects[name] for name in names], many=True
+        )
+        return Response(serializer.data)
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
@@ -41,29 +96,61 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedResponseMixin, SparseFieldsetMixin,
+                    RowRetrieveMixin, viewsets.ModelViewSet):
     """Manage recipes in the database"""
     """below 4 attribute ordering does not matter as per my testing."""
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
-
-    def _params_to_ints(self, qs):
-        return [int(str_id) for str_id in qs.split(',')]
+    pagination_class = RecipeCursorPagination
+    search_pagination_class = RecipeSearchCursorPagination
+    export_chunk_size = 500
+    bulk_max_items = 1000
+    stats_default_top = 10
+    stats_max_top = 100
 
     def get_queryset(self):
         """Retrieve the recipes for the authenticated user"""
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
+        params = self.request.query_params
+        match = parse_match(params.get('match'))
         queryset = self.queryset
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-        return queryset.filter(user=self.request.user)
+        for relation in ('tags', 'ingredients'):
+            if params.get(relation):
+                ids = parse_ids(params[relation], relation)
+                queryset = filter_by_related(queryset, relation, ids, match)
+        queryset = queryset.filter(user=self.request.user)
+        search = params.get('search')
+        if search is not None and self.action in ('list', 'export'):
+            queryset = search_recipes(queryset, search)
+        if self.action in ('list', 'retrieve', 'export'):
+            # Load the related rows in one query per relation instead of
+            # one per recipe, whatever the size of the result, and only
+            # for the relations a sparse fieldset asks for.
+            queryset = self.narrow_queryset(
+                queryset, ('tags', 'ingredients')
+            )
+        return queryset
+
+    @property
+    def paginator(self):
+        """Page searches in relevance order rather than by id"""
+        if not hasattr(self, '_paginator'):
+            request = getattr(self, 'request', None)
+            if getattr(self, 'action', None) == 'list' and \
+                    request is not None and \
+                    request.query_params.get('search') is not None:
+                self._paginator = self.search_pagination_class()
+        return super().paginator
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -77,6 +164,112 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
+    def _validate_bulk_payload(self, data, child):
+        """Validate the list shape of a bulk request body"""
+        field = drf_serializers.ListField(
+            child=child,
+            allow_empty=False,
+            max_length=self.bulk_max_items
+        )
+        return field.run_validation(data)
+
+    def _get_bulk_instances(self, ids):
+        """Return the user's recipes for ``ids`` and per item errors"""
+        recipes = self.get_queryset().in_bulk(
+            [pk for pk in ids if isinstance(pk, int)]
+        )
+        errors = []
+        seen = set()
+        for pk in ids:
+            if not isinstance(pk, int) or pk not in recipes:
+                errors.append({'id': ['Recipe not found.']})
+            elif pk in seen:
+                errors.append({'id': ['Duplicate recipe.']})
+            else:
+                errors.append({})
+            seen.add(pk)
+        return [recipes.get(pk) for pk in ids], errors
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False)
+    def bulk(self, request):
+        """Create, update or delete many recipes in one transaction"""
+        if request.method == 'DELETE':
+            ids = self._validate_bulk_payload(
+                request.data, drf_serializers.IntegerField()
+            )
+            recipes, errors = self._get_bulk_instances(ids)
+            if any(errors):
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            with transaction.atomic(), suspend_stats():
+                # One set based update of the statistics instead of one
+                # per deleted recipe.
+                removed = recipe_contributions(ids, lock=True)
+                self.get_queryset().filter(id__in=ids).delete()
+                apply_deltas(subtract({}, removed))
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        items = self._validate_bulk_payload(
+            request.data, drf_serializers.DictField()
+        )
+        if request.method == 'POST':
+            serializer = self.get_serializer(data=items, many=True)
+            save_kwargs = {'user': request.user}
+            status_code = status.HTTP_201_CREATED
+        else:
+            recipes, errors = self._get_bulk_instances(
+                [item.get('id') for item in items]
+            )
+            if any(errors):
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            serializer = self.get_serializer(
+                recipes, data=items, many=True, partial=True
+            )
+            save_kwargs = {}
+            status_code = status.HTTP_200_OK
+
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save(**save_kwargs)
+            # Bulk writes bypass the model signals that expire the cache.
+            invalidate_user_responses(request.user.pk)
+        return Response(serializer.data, status=status_code)
+
+    @action(methods=['GET'], detail=False,
+            renderer_classes=(NDJSONRenderer, JSONRenderer))
+    def export(self, request):
+        """Stream every recipe of the user as NDJSON or a JSON array"""
+        records = iter_records(
+            self.get_queryset(),
+            self.export_chunk_size
+        )
+        renderer = request.accepted_renderer
+        if renderer.format == 'json':
+            stream = stream_json(records)
+        else:
+            stream = stream_ndjson(records)
+        response = StreamingHttpResponse(
+            stream,
+            content_type=f'{renderer.media_type}; charset=utf-8'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{renderer.format}"'
+        )
+        return response
+
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        """Return summary statistics of the user's recipes"""
+        top = drf_serializers.IntegerField(
+            min_value=1, max_value=self.stats_max_top
+        )
+        try:
+            limit = top.run_validation(
+                request.query_params.get('top', self.stats_default_top)
+            )
+        except drf_serializers.ValidationError as exc:
+            raise drf_serializers.ValidationError({'top': exc.detail})
+        return Response(summarize(get_user_stats(request.user.pk), limit))
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload an image to a recipe"""